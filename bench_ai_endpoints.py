@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Benchmark the AI endpoints against a local LLM stand-in.
+
+Starts livestock.mock_llm (canned, or replaying recorded fixtures), serves the
+project with GROQ_API_URL pointed at it, and drives generate_insights and
+parse_voice_input with concurrent clients. Reports p50/p95/p99 latency per
+endpoint and how saturated the server workers were: the most LLM calls they
+had in flight against the client concurrency, and how much of each request
+was spent waiting in the server rather than on the model.
+
+Needs the seed data (``manage.py seed_data``). Examples::
+
+    python bench_ai_endpoints.py --concurrency 32 --requests 400 --workers 2
+    python bench_ai_endpoints.py --replay fixtures/llm --output bench.json
+    python bench_ai_endpoints.py --base-url http://localhost:8000 --mock-port 8765
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+from livestock.mock_llm import MockLLMServer
+
+VOICE_TRANSCRIPTS = [
+    ("yield_record", "cow 1 gave 14 litres of milk today"),
+    ("yield_record", "the jersey in the back pen gave a bucket and a half"),
+    ("feed_record", "we bought new feed for the herd and gave them all a mix"),
+    ("health", "cow 9 limping since the rain, vet suspects an abscess on the hoof"),
+    ("livestock", "new cow tag 14 holstein born march 2023 female"),
+]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--requests", type=int, default=200, help="Requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--email", default="owner@greenpastures.com")
+    parser.add_argument("--password", default="testpass123")
+    parser.add_argument(
+        "--use-cache", action="store_true",
+        help="Let generate_insights answer from the LLM cache (default: force_refresh)",
+    )
+    server = parser.add_argument_group("server under test")
+    server.add_argument(
+        "--base-url",
+        help="Drive an already running server instead of starting one; point its "
+             "GROQ_API_URL at --mock-port",
+    )
+    server.add_argument("--server", choices=["uvicorn", "runserver"], default="uvicorn")
+    server.add_argument("--port", type=int, default=0, help="Port for the started server")
+    server.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    mock = parser.add_argument_group("LLM stand-in")
+    mock.add_argument("--mock-port", type=int, default=0)
+    mock.add_argument("--latency", type=float, default=0.5, help="Seconds per LLM answer")
+    mock.add_argument("--jitter", type=float, default=0.2)
+    mock.add_argument("--delay", type=float, default=0.0, help="Seconds per streamed word")
+    mock.add_argument("--error-rate", type=float, default=0.0)
+    mock.add_argument("--rate-limit-rate", type=float, default=0.0)
+    mock.add_argument("--seed", type=int, default=1)
+    mock.add_argument("--replay", metavar="DIR", help="Answer from fixtures recorded in DIR")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    return parser.parse_args()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(args, mock_url):
+    port = args.port or free_port()
+    env = {**os.environ, "GROQ_API_URL": mock_url, "GROQ_API_KEY": os.environ.get("GROQ_API_KEY", "bench")}
+    if args.server == "uvicorn":
+        command = [
+            sys.executable, "-m", "uvicorn", "farm.asgi:application",
+            "--host", "127.0.0.1", "--port", str(port),
+            "--workers", str(args.workers), "--log-level", "warning",
+        ]
+    else:
+        command = [sys.executable, "manage.py", "runserver", f"127.0.0.1:{port}", "--noreload"]
+    process = subprocess.Popen(
+        command, env=env, cwd=os.path.dirname(os.path.abspath(__file__)),
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            sys.exit(f"{args.server} exited with status {process.returncode}")
+        try:
+            httpx.get(base_url, timeout=1)
+            return process, base_url
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.terminate()
+    sys.exit(f"{args.server} did not start within 30s")
+
+
+def login(base_url, email, password):
+    response = httpx.post(
+        f"{base_url}/auth/jwt/create/", json={"email": email, "password": password}, timeout=10
+    )
+    if response.status_code != 200:
+        sys.exit(f"Login failed: {response.status_code} - {response.text}")
+    return response.json()["access"]
+
+
+def livestock_ids(base_url, headers):
+    response = httpx.get(f"{base_url}/api/livestock/", headers=headers, timeout=10)
+    response.raise_for_status()
+    data = response.json()
+    rows = data["results"] if isinstance(data, dict) else data
+    if not rows:
+        sys.exit("The farm has no livestock; run manage.py seed_data first.")
+    return [row["id"] for row in rows]
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+def summarize(samples, elapsed):
+    latencies = [s["seconds"] for s in samples]
+    statuses = {}
+    sources = {}
+    for sample in samples:
+        statuses[sample["status"]] = statuses.get(sample["status"], 0) + 1
+        if sample.get("source"):
+            sources[sample["source"]] = sources.get(sample["source"], 0) + 1
+    return {
+        "requests": len(samples),
+        "errors": sum(1 for s in samples if s["status"] != 200 or s.get("error")),
+        "statuses": statuses,
+        "error_messages": sorted({str(s["error"])[:120] for s in samples if s.get("error")}),
+        "sources": sources,
+        "throughput_per_s": round(len(samples) / elapsed, 2) if elapsed else None,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1) if latencies else None,
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1) if latencies else None,
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1) if latencies else None,
+    }
+
+
+async def drive(base_url, headers, jobs, concurrency):
+    samples = []
+    queue = asyncio.Queue()
+    for job in jobs:
+        queue.put_nowait(job)
+
+    async def client(http):
+        while not queue.empty():
+            path, body = queue.get_nowait()
+            start = time.perf_counter()
+            try:
+                response = await http.post(path, json=body)
+                sample = {"status": response.status_code, "source": response.headers.get("X-Parse-Source")}
+                payload = response.json() if response.status_code == 200 else {}
+                if isinstance(payload, dict) and "error" in payload:
+                    sample["error"] = payload["error"]
+                elif isinstance(payload, dict) and str(payload.get("insights", "")).startswith("Error"):
+                    sample["error"] = payload["insights"]
+            except httpx.HTTPError as e:
+                sample = {"status": type(e).__name__}
+            sample["seconds"] = time.perf_counter() - start
+            samples.append(sample)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(
+        base_url=base_url, headers=headers, limits=limits, timeout=120
+    ) as http:
+        start = time.perf_counter()
+        await asyncio.gather(*(client(http) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return samples, elapsed
+
+
+def run_phase(name, base_url, headers, jobs, args, mock):
+    if mock:
+        mock.reset_stats()
+    samples, elapsed = asyncio.run(drive(base_url, headers, jobs, args.concurrency))
+    result = summarize(samples, elapsed)
+    if mock:
+        upstream = mock.stats()
+        service = upstream["service_times"]
+        result["llm_calls"] = upstream["requests"]
+        result["max_llm_in_flight"] = upstream["max_in_flight"]
+        # ~1.0: every concurrent request reached the model at once; lower
+        # means requests queued for a worker first.
+        result["saturation"] = round(upstream["max_in_flight"] / args.concurrency, 3)
+        if service and result["p50_ms"] is not None:
+            result["llm_p50_ms"] = round(statistics.median(service) * 1000, 1)
+            result["server_overhead_p50_ms"] = round(result["p50_ms"] - result["llm_p50_ms"], 1)
+    print(f"\n{name}")
+    for key, value in result.items():
+        print(f"  {key}: {value}")
+    return result
+
+
+def main():
+    args = parse_args()
+    mock = MockLLMServer(
+        port=args.mock_port,
+        delay=args.delay,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        seed=args.seed,
+        fixtures=args.replay,
+        replay=bool(args.replay),
+    ).start()
+    print(f"LLM stand-in on {mock.url}")
+
+    process = None
+    base_url = args.base_url
+    if not base_url:
+        process, base_url = start_server(args, mock.url)
+        print(f"Started {args.server} on {base_url}")
+    try:
+        headers = {"Authorization": f"JWT {login(base_url, args.email, args.password)}"}
+        ids = livestock_ids(base_url, headers)
+        rng = random.Random(args.seed)
+
+        insight_jobs = [
+            ("/api/amu-insights/generate/",
+             {"livestock_id": rng.choice(ids), "force_refresh": not args.use_cache})
+            for _ in range(args.requests)
+        ]
+        voice_jobs = []
+        for _ in range(args.requests):
+            form_type, transcript = rng.choice(VOICE_TRANSCRIPTS)
+            voice_jobs.append(
+                ("/api/amu-insights/parse-voice/", {"transcript": transcript, "form_type": form_type})
+            )
+
+        report = {
+            "server": "external" if args.base_url else args.server,
+            "workers": None if args.base_url else args.workers,
+            "concurrency": args.concurrency,
+            "llm_latency_s": args.latency,
+            "replay": args.replay,
+            "generate_insights": run_phase("generate_insights", base_url, headers, insight_jobs, args, mock),
+            "parse_voice_input": run_phase("parse_voice_input", base_url, headers, voice_jobs, args, mock),
+        }
+    finally:
+        if process:
+            process.terminate()
+            process.wait()
+        mock.shutdown()
+
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump(report, fh, indent=2)
+        print(f"\nReport written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,10 @@
 ASGI config for farm project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Serve it with ASGI workers so the async LLM views in livestock.views_llm do
+not tie up a worker while they wait on the model, e.g.::
+
+    gunicorn farm.asgi:application -k uvicorn.workers.UvicornWorker
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
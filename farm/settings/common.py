@@ -13,6 +13,8 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 from datetime import timedelta
+import os
+import tempfile
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -114,6 +116,53 @@ STATIC_URL = "static/"
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+# Caches
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+#
+# "insights" holds chart-data responses and their per-animal/per-farm data
+# versions. It is file based so every worker process on a host sees the same
+# versions; point it at Redis/Memcached when running several hosts. A culled
+# version key is re-minted as a new version, never read back as an old one.
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "insights": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.environ.get(
+            "INSIGHTS_CACHE_DIR",
+            os.path.join(tempfile.gettempdir(), "farmsense-insights-cache"),
+        ),
+        "TIMEOUT": 60 * 60 * 24,
+        "OPTIONS": {"MAX_ENTRIES": 20000},
+    },
+}
+
+# Generated AMU insights, stored in livestock.LLMResponseCache. Entries older
+# than the TTL are regenerated; past the cap the least recently used go first.
+
+LLM_CACHE_TTL = int(os.environ.get("LLM_CACHE_TTL", 60 * 60 * 24 * 7))
+LLM_CACHE_MAX_ENTRIES = int(os.environ.get("LLM_CACHE_MAX_ENTRIES", 5000))
+
+# parse-voice answers from livestock.voice_rules when its confidence reaches
+# this threshold and only asks the LLM below it (1.1 disables the rules).
+
+VOICE_RULES_MIN_CONFIDENCE = float(os.environ.get("VOICE_RULES_MIN_CONFIDENCE", 0.8))
+
+# Estimated input tokens an AMU insight prompt may use; older health history
+# is left out beyond it (see livestock.prompts).
+
+LLM_PROMPT_TOKEN_BUDGET = int(os.environ.get("LLM_PROMPT_TOKEN_BUDGET", 1500))
+
+# Revenue per unit of yield (e.g. ₦ per litre of milk) used for margins in the
+# profitability insights when the request gives no ``price``; unset leaves
+# margins out.
+
+YIELD_PRICE_PER_UNIT = (
+    float(os.environ["YIELD_PRICE_PER_UNIT"]) if os.environ.get("YIELD_PRICE_PER_UNIT") else None
+)
+
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
         "rest_framework_simplejwt.authentication.JWTAuthentication",
@@ -0,0 +1,251 @@
+"""
+Vectorized feed-conversion and profitability analytics.
+
+A farm's feed and yield history over a window is loaded into dense
+(animal x day) NumPy arrays: one GROUP BY query per record type sums each
+animal's day in the database, and one small query reads the herd that
+indexes the rows. Every metric is then whole-array arithmetic, so an
+animal-day costs a few machine operations instead of a Python loop step.
+
+Margins are revenue (yield x price per unit) minus feed cost; feed is the
+only cost the records carry, so they are margins over feed cost.
+"""
+
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Optional
+
+import numpy as np
+from django.db.models import FloatField, Max, Sum
+from django.db.models.functions import Cast
+
+from .models import FeedRecord, Livestock, YieldRecord
+from .rollups import feed_cost_expression
+
+DEFAULT_ROLLING_DAYS = 30
+
+# Largest animals x days a request may load: 1,000 animals over a year,
+# about 3 MB per float64 array and three arrays per request, which a web
+# worker can hold alongside its neighbours. Larger herds narrow the window.
+MAX_CELLS = 365_000
+
+
+@dataclass
+class HerdSeries:
+    """Daily totals per animal; row i of each array is ``pks[i]``."""
+
+    start: date
+    pks: np.ndarray
+    tags: list
+    species: list
+    feed_kg: np.ndarray
+    feed_cost: np.ndarray
+    yield_qty: np.ndarray
+    unit: Optional[str] = None
+
+    @property
+    def days(self):
+        return self.feed_kg.shape[1]
+
+    def dates(self):
+        return [self.start + timedelta(days=i) for i in range(self.days)]
+
+
+def _fill(pks, start, shape, rows, columns):
+    """Scatter (livestock_id, date, *values) rows into ``columns`` dense arrays."""
+    arrays = [np.zeros(shape) for _ in range(columns)]
+    if not rows or not len(pks):
+        return arrays
+    ids, days, *values = zip(*rows)
+    ids = np.fromiter(ids, dtype=np.int64, count=len(ids))
+    position = np.searchsorted(pks, ids).clip(max=len(pks) - 1)
+    # Rows for animals outside the herd snapshot (moved or added since) are dropped.
+    keep = pks[position] == ids
+    # Far faster than np.array(days, dtype="datetime64[D]") on date objects.
+    offset = np.fromiter(map(date.toordinal, days), dtype=np.int64, count=len(days))
+    offset -= start.toordinal()
+    for array, column in zip(arrays, values):
+        array[position[keep], offset[keep]] = np.fromiter(column, dtype=float, count=len(column))[keep]
+    return arrays
+
+
+def load_series(farm_id, start, end, yield_type=None):
+    """
+    ``HerdSeries`` for ``farm_id`` from ``start`` to ``end`` inclusive.
+
+    ``yield_type`` matches case-insensitively; without it every yield counts.
+    """
+    herd = list(
+        Livestock.objects.filter(farm_id=farm_id)
+        .order_by("pk")
+        .values_list("pk", "tag_id", "species")
+    )
+    pks = np.array([row[0] for row in herd], dtype=np.int64)
+    shape = (len(herd), (end - start).days + 1)
+    window = {"farm_id": farm_id, "date__gte": start, "date__lte": end}
+
+    feed_rows = list(
+        FeedRecord.objects.filter(**window)
+        .values_list("livestock_id", "date")
+        .annotate(
+            kg=Cast(Sum("quantity_kg"), FloatField()),
+            cost=Cast(Sum(feed_cost_expression()), FloatField()),
+        )
+        .order_by()
+    )
+    yields = YieldRecord.objects.filter(**window)
+    if yield_type:
+        yields = yields.filter(yield_type__iexact=yield_type)
+    yield_rows = list(
+        yields.values_list("livestock_id", "date")
+        .annotate(quantity=Cast(Sum("quantity"), FloatField()), unit=Max("unit"))
+        .order_by()
+    )
+
+    feed_kg, feed_cost = _fill(pks, start, shape, feed_rows, 2)
+    (yield_qty,) = _fill(pks, start, shape, [row[:3] for row in yield_rows], 1)
+    return HerdSeries(
+        start=start,
+        pks=pks,
+        tags=[row[1] for row in herd],
+        species=[row[2] for row in herd],
+        feed_kg=feed_kg,
+        feed_cost=feed_cost,
+        yield_qty=yield_qty,
+        unit=next((row[3] for row in yield_rows if row[3]), None),
+    )
+
+
+def ratio(numerator, denominator):
+    """Elementwise numerator / denominator, NaN where the denominator is 0."""
+    numerator = np.asarray(numerator, dtype=float)
+    denominator = np.asarray(denominator, dtype=float)
+    out = np.full(np.broadcast(numerator, denominator).shape, np.nan)
+    np.divide(numerator, denominator, out=out, where=denominator > 0)
+    return out
+
+
+def rolling_sum(values, days):
+    """Trailing ``days``-day sums along the last axis (shorter at the start)."""
+    totals = np.cumsum(values, axis=-1)
+    if days < totals.shape[-1]:
+        totals[..., days:] -= totals[..., :-days].copy()
+    return totals
+
+
+@dataclass
+class Profitability:
+    """Per-animal totals and ratios over the window, plus the farm's daily margin."""
+
+    feed_kg: np.ndarray
+    feed_cost: np.ndarray
+    yield_qty: np.ndarray
+    price: Optional[float]
+    rolling_days: int
+    # Margin over the last ``rolling_days`` days per animal, and the farm's
+    # trailing margin for every day of the window.
+    rolling_margin: Optional[np.ndarray]
+    farm_rolling_margin: Optional[np.ndarray]
+
+    @property
+    def feed_conversion_ratio(self):
+        """kg of feed per unit of yield."""
+        return ratio(self.feed_kg, self.yield_qty)
+
+    @property
+    def yield_per_kg_feed(self):
+        return ratio(self.yield_qty, self.feed_kg)
+
+    @property
+    def cost_per_unit(self):
+        return ratio(self.feed_cost, self.yield_qty)
+
+    @property
+    def revenue(self):
+        return None if self.price is None else self.yield_qty * self.price
+
+    @property
+    def margin(self):
+        return None if self.price is None else self.revenue - self.feed_cost
+
+
+def profitability(series, price=None, rolling_days=DEFAULT_ROLLING_DAYS):
+    """
+    Feed conversion, cost per unit and margins for every animal in ``series``.
+
+    Margins need ``price`` (revenue per unit of yield) and are None without it.
+    """
+    rolling_margin = farm_rolling_margin = None
+    if price is not None:
+        recent = slice(max(0, series.days - rolling_days), None)
+        rolling_margin = (
+            series.yield_qty[:, recent].sum(axis=1) * price
+            - series.feed_cost[:, recent].sum(axis=1)
+        )
+        # Margins are linear, so the farm's daily margin is the margin of the
+        # herd's daily totals; no (animal x day) margin array is needed.
+        farm_daily = series.yield_qty.sum(axis=0) * price - series.feed_cost.sum(axis=0)
+        farm_rolling_margin = rolling_sum(farm_daily, rolling_days)
+    return Profitability(
+        feed_kg=series.feed_kg.sum(axis=1),
+        feed_cost=series.feed_cost.sum(axis=1),
+        yield_qty=series.yield_qty.sum(axis=1),
+        price=price,
+        rolling_days=rolling_days,
+        rolling_margin=rolling_margin,
+        farm_rolling_margin=farm_rolling_margin,
+    )
+
+
+def group_totals(result, groups):
+    """
+    ``Profitability`` summed over animals sharing a label in ``groups``
+    (one label per animal). Returns the labels, animal counts and result.
+    """
+    labels, codes = np.unique(np.asarray(groups, dtype=object), return_inverse=True)
+    size = len(labels)
+
+    def total(values):
+        return None if values is None else np.bincount(codes, weights=values, minlength=size)
+
+    grouped = Profitability(
+        feed_kg=total(result.feed_kg),
+        feed_cost=total(result.feed_cost),
+        yield_qty=total(result.yield_qty),
+        price=result.price,
+        rolling_days=result.rolling_days,
+        rolling_margin=total(result.rolling_margin),
+        farm_rolling_margin=result.farm_rolling_margin,
+    )
+    return labels.tolist(), np.bincount(codes, minlength=size).tolist(), grouped
+
+
+def to_list(array, digits):
+    """JSON-ready list: rounded, with NaN as None."""
+    if array is None:
+        return None
+    rounded = np.round(array, digits)
+    return [None if value != value else value for value in rounded.tolist()]
+
+
+def metric_columns(result):
+    """Each metric of ``result`` as a list, keyed by its response name."""
+    return {
+        "feed_kg": to_list(result.feed_kg, 2),
+        "feed_cost": to_list(result.feed_cost, 2),
+        "yield": to_list(result.yield_qty, 2),
+        "feed_conversion_ratio": to_list(result.feed_conversion_ratio, 3),
+        "yield_per_kg_feed": to_list(result.yield_per_kg_feed, 3),
+        "cost_per_unit": to_list(result.cost_per_unit, 2),
+        "revenue": to_list(result.revenue, 2),
+        "margin": to_list(result.margin, 2),
+        "rolling_margin": to_list(result.rolling_margin, 2),
+    }
+
+
+def rows(columns, count):
+    """Transpose ``metric_columns`` output into one dict per entry."""
+    return [
+        {name: (values[i] if values is not None else None) for name, values in columns.items()}
+        for i in range(count)
+    ]
@@ -0,0 +1,162 @@
+"""
+Incremental yield anomaly detection per (livestock, yield type).
+
+Each YieldRecord is one reading (a milking, or a day's total where that is
+what gets recorded). A YieldAnomalyState row holds the series' running
+mean and variance (Welford) and an exponentially weighted mean and
+variance. A new reading is scored against both before it is folded in, in
+O(1) without reading any history. The series is flagged while its latest
+reading sits at least ``Z_THRESHOLD`` standard deviations from the running
+mean, or ``EWMA_THRESHOLD`` from the EWMA. The z-score catches departures
+from the animal's long-run level, and the EWMA catches sudden changes
+against its recent one.
+
+Readings that arrive in date order take that O(1) path. Edits, deletions
+and back-dated readings cannot be undone from running statistics, so they
+replay that one series from its records (an index range scan on
+(livestock, date)).
+"""
+
+import math
+
+from django.db import transaction
+
+from .models import YieldAnomalyState, YieldRecord
+
+# Readings needed before a series is scored.
+MIN_HISTORY = 7
+Z_THRESHOLD = 3.0
+EWMA_ALPHA = 0.2
+EWMA_THRESHOLD = 3.0
+# Floor for the standard deviation as a fraction of the mean, so a series
+# that has barely varied is not flagged for an ordinary small change.
+MIN_RELATIVE_STD = 0.05
+
+
+def _score(value, mean, variance):
+    std = max(math.sqrt(max(variance, 0.0)), MIN_RELATIVE_STD * abs(mean), 1e-9)
+    return (value - mean) / std
+
+
+def observe(state, value, day):
+    """Score ``value`` read on ``day`` against ``state``, then fold it in."""
+    z_score = ewma_score = None
+    if state.count >= MIN_HISTORY:
+        z_score = _score(value, state.mean, state.m2 / (state.count - 1))
+        ewma_score = _score(value, state.ewma, state.ewm_var)
+    anomalous = (z_score is not None and abs(z_score) >= Z_THRESHOLD) or (
+        ewma_score is not None and abs(ewma_score) >= EWMA_THRESHOLD
+    )
+
+    state.count += 1
+    delta = value - state.mean
+    state.mean += delta / state.count
+    state.m2 += delta * (value - state.mean)
+    if state.count == 1:
+        state.ewma, state.ewm_var = value, 0.0
+    else:
+        diff = value - state.ewma
+        increment = EWMA_ALPHA * diff
+        state.ewma += increment
+        state.ewm_var = (1 - EWMA_ALPHA) * (state.ewm_var + diff * increment)
+
+    state.last_date = day
+    state.last_quantity = value
+    state.z_score = z_score
+    state.ewma_score = ewma_score
+    if anomalous:
+        state.flagged_since = state.flagged_since if state.flagged else day
+        state.flagged = True
+    else:
+        state.flagged = False
+        state.flagged_since = None
+    return anomalous
+
+
+def direction(state):
+    """"drop" or "rise" for a flagged state, by its strongest score."""
+    scores = [s for s in (state.z_score, state.ewma_score) if s is not None]
+    if not scores:
+        return None
+    return "drop" if max(scores, key=abs) < 0 else "rise"
+
+
+def rebuild_series(livestock_id, yield_type):
+    """Replay one series from its records; removes the state if none are left."""
+    records = (
+        YieldRecord.objects.filter(livestock_id=livestock_id, yield_type=yield_type)
+        .order_by("date", "pk")
+        .values_list("farm_id", "unit", "quantity", "date")
+    )
+    state = YieldAnomalyState(livestock_id=livestock_id, yield_type=yield_type)
+    for farm_id, unit, quantity, day in records.iterator():
+        state.farm_id, state.unit = farm_id, unit
+        observe(state, float(quantity), day)
+
+    with transaction.atomic():
+        existing = YieldAnomalyState.objects.filter(
+            livestock_id=livestock_id, yield_type=yield_type
+        )
+        if not state.count:
+            existing.delete()
+            return None
+        state.pk = existing.values_list("pk", flat=True).first()
+        state.save()
+    return state
+
+
+def record_readings(records):
+    """
+    Fold new YieldRecords into their series' states. Readings in date order
+    cost O(1) each; a series given a back-dated reading, or with records but
+    no state yet, is replayed instead.
+    """
+    by_series = {}
+    for record in sorted(records, key=lambda r: (r.date, r.pk or 0)):
+        by_series.setdefault((record.livestock_id, record.yield_type), []).append(record)
+
+    for (livestock_id, yield_type), readings in by_series.items():
+        with transaction.atomic():
+            state, created = YieldAnomalyState.objects.select_for_update().get_or_create(
+                livestock_id=livestock_id,
+                yield_type=yield_type,
+                defaults={"farm_id": readings[0].farm_id, "unit": readings[0].unit},
+            )
+            # A series with no state but older records (its state was never
+            # seeded, or was removed) is rebuilt from them.
+            has_history = created and (
+                YieldRecord.objects.filter(livestock_id=livestock_id, yield_type=yield_type)
+                .exclude(pk__in=[record.pk for record in readings])
+                .exists()
+            )
+            if has_history or (state.last_date and readings[0].date < state.last_date):
+                rebuild_series(livestock_id, yield_type)
+                continue
+            for record in readings:
+                state.farm_id, state.unit = record.farm_id, record.unit
+                observe(state, float(record.quantity), record.date)
+            state.save()
+
+
+def rebuild_series_many(series):
+    """Replay each (livestock_id, yield_type) pair in ``series``."""
+    for livestock_id, yield_type in set(series):
+        rebuild_series(livestock_id, yield_type)
+
+
+def rebuild_anomalies(farm_id=None):
+    """Recompute every series' state from the raw records."""
+    records = YieldRecord.objects.all()
+    states = YieldAnomalyState.objects.all()
+    if farm_id is not None:
+        records = records.filter(farm_id=farm_id)
+        states = states.filter(farm_id=farm_id)
+    series = set(records.values_list("livestock_id", "yield_type").distinct())
+    stale = [
+        pk
+        for pk, livestock_id, yield_type in states.values_list("pk", "livestock_id", "yield_type")
+        if (livestock_id, yield_type) not in series
+    ]
+    YieldAnomalyState.objects.filter(pk__in=stale).delete()
+    rebuild_series_many(series)
+    return len(series)
@@ -0,0 +1,221 @@
+"""
+Time buckets for the insights charts.
+
+Chart endpoints take ``start`` and ``end`` (YYYY-MM-DD, default the last 365
+days) and ``granularity=day|week|month|quarter`` (default month). Rows are
+grouped into buckets by the database (a Trunc in the GROUP BY) and placed on
+a dense axis of bucket start dates through a dict index, so every bucket in
+the window is present and each row costs O(1) whatever the window's length.
+
+Month and quarter buckets are summed from the monthly rollup tables; day and
+week buckets need finer data than the rollups hold and aggregate the raw
+records instead, through the (livestock, date) and (farm, date) indexes.
+"""
+
+from dataclasses import dataclass
+from datetime import date, timedelta
+
+from django.db.models import Count, DateField, Sum
+from django.db.models.functions import Trunc
+from rest_framework.exceptions import ValidationError
+
+from .models import (
+    AMUMonthlyRollup,
+    AMURecord,
+    FeedMonthlyRollup,
+    FeedRecord,
+    YieldMonthlyRollup,
+    YieldRecord,
+)
+from .rollups import feed_cost_expression, feed_label_expression, month_start, next_month
+
+GRANULARITIES = ("day", "week", "month", "quarter")
+DEFAULT_WINDOW = timedelta(days=365)
+# About ten years of daily buckets.
+MAX_BUCKETS = 3700
+
+
+def bucket_start(day, granularity):
+    if granularity == "day":
+        return day
+    if granularity == "week":
+        # Monday, as TruncWeek does.
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return month_start(day)
+    return day.replace(month=(day.month - 1) // 3 * 3 + 1, day=1)
+
+
+def next_bucket(start, granularity):
+    if granularity == "day":
+        return start + timedelta(days=1)
+    if granularity == "week":
+        return start + timedelta(days=7)
+    if granularity == "month":
+        return next_month(start)
+    return next_month(next_month(next_month(start)))
+
+
+def bucket_label(start, granularity):
+    if granularity == "month":
+        return start.strftime("%b %Y")
+    if granularity == "quarter":
+        return f"Q{(start.month - 1) // 3 + 1} {start.year}"
+    return start.strftime("%d %b %Y")
+
+
+@dataclass(frozen=True)
+class Window:
+    """A chart's date range, widened to whole buckets."""
+
+    start: date
+    end: date
+    granularity: str
+
+    @property
+    def uses_rollups(self):
+        return self.granularity in ("month", "quarter")
+
+    def axis(self):
+        """Start date of every bucket in the window, oldest first."""
+        buckets = []
+        current = self.start
+        while current <= self.end:
+            buckets.append(current)
+            current = next_bucket(current, self.granularity)
+        return buckets
+
+    def labels(self, axis):
+        return [bucket_label(start, self.granularity) for start in axis]
+
+    def trunc(self, field):
+        return Trunc(field, self.granularity, output_field=DateField())
+
+    def as_dict(self):
+        return {
+            "start": self.start.isoformat(),
+            "end": self.end.isoformat(),
+            "granularity": self.granularity,
+        }
+
+
+def _parse_date(params, name):
+    value = params.get(name)
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ValidationError({"error": f"{name} must be a date in YYYY-MM-DD format"})
+
+
+def parse_window(params):
+    """Build the Window from query params; raises a 400 ValidationError."""
+    granularity = params.get("granularity") or "month"
+    if granularity not in GRANULARITIES:
+        raise ValidationError(
+            {"error": f"granularity must be one of: {', '.join(GRANULARITIES)}"}
+        )
+    end = _parse_date(params, "end") or date.today()
+    start = _parse_date(params, "start") or end - DEFAULT_WINDOW
+    if start > end:
+        raise ValidationError({"error": "start must not be after end"})
+
+    window = Window(bucket_start(start, granularity), end, granularity)
+    # Count without building the axis: days per bucket is at least 1/7/28/90.
+    min_days = {"day": 1, "week": 7, "month": 28, "quarter": 90}[granularity]
+    if (end - window.start).days // min_days + 1 > MAX_BUCKETS:
+        raise ValidationError(
+            {"error": f"At most {MAX_BUCKETS} buckets; use a coarser granularity"}
+        )
+    return window
+
+
+class BucketSource:
+    """
+    One chart metric, readable from its monthly rollup or its raw records.
+
+    Filters and dimensions are written against the rollup's field names
+    (``livestock_id``, ``livestock__species``, ``drug__name``...); names
+    starting with ``livestock`` are re-rooted at ``livestock_path`` on the
+    raw records.
+    """
+
+    def __init__(self, rollup_model, rollup_total, raw_queryset, date_field, raw_total,
+                 livestock_path="livestock", aliases=None):
+        self.rollup_model = rollup_model
+        self.rollup_total = rollup_total
+        self.raw_queryset = raw_queryset
+        self.date_field = date_field
+        self.raw_total = raw_total
+        self.livestock_path = livestock_path
+        self.aliases = aliases or {}
+
+    def _raw_name(self, name):
+        if name.startswith("livestock"):
+            return self.livestock_path + name[len("livestock"):]
+        return name
+
+    def rows(self, window, dimensions=(), **filters):
+        """(bucket, *dimensions, total) tuples grouped in SQL, oldest first."""
+        if window.uses_rollups:
+            queryset = self.rollup_model.objects.filter(**filters)
+            date_field, total = "month", self.rollup_total
+        else:
+            queryset = self.raw_queryset().annotate(**self.aliases).filter(
+                **{self._raw_name(k): v for k, v in filters.items()}
+            )
+            dimensions = [self._raw_name(d) for d in dimensions]
+            date_field, total = self.date_field, self.raw_total
+        return (
+            queryset.filter(
+                **{f"{date_field}__gte": window.start, f"{date_field}__lte": window.end}
+            )
+            .annotate(bucket=window.trunc(date_field))
+            .values_list("bucket", *dimensions)
+            .annotate(total=total)
+            .order_by("bucket", *dimensions)
+        )
+
+
+AMU_SOURCE = BucketSource(
+    AMUMonthlyRollup,
+    Sum("treatments"),
+    AMURecord.objects.all,
+    "health_record__event_date",
+    Count("id"),
+    livestock_path="health_record__livestock",
+)
+
+FEED_SOURCE = BucketSource(
+    FeedMonthlyRollup,
+    Sum("total_spend"),
+    FeedRecord.objects.all,
+    "date",
+    Sum(feed_cost_expression()),
+    aliases={"feed_name": feed_label_expression()},
+)
+
+YIELD_SOURCE = BucketSource(
+    YieldMonthlyRollup,
+    Sum("total_quantity"),
+    YieldRecord.objects.all,
+    "date",
+    Sum("quantity"),
+)
+
+
+def dense_series(axis, rows, name=lambda row: None, cast=float):
+    """
+    Spread ``rows`` over ``axis`` as {series name: [value per bucket]}; the
+    series are in order of first appearance and missing buckets are 0.
+    """
+    index = {start: i for i, start in enumerate(axis)}
+    series = {}
+    for row in rows:
+        position = index.get(row[0])
+        if position is None:
+            continue
+        values = series.setdefault(name(row), [cast(0)] * len(axis))
+        values[position] += cast(row[-1] or 0)
+    return series
@@ -0,0 +1,226 @@
+import copy
+
+from django.db import transaction
+from django.db.models.functions import Upper
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.exceptions import PermissionDenied
+from rest_framework.response import Response
+
+from .membership import get_membership
+from .permissions import IsFarmMember
+from .serializers import PreloadedPrimaryKeyRelatedField
+from .signals import bulk_delete, records_bulk_changed
+
+
+class BulkWriteMixin:
+    """
+    Adds ``<prefix>/bulk/`` to a record viewset:
+
+    - POST   a list of records to create them,
+    - PATCH  a list of partial records (each with a distinct ``id``) to update them,
+    - DELETE a list of ids to delete them.
+
+    The batch is checked against the caller's farm once, related rows are
+    fetched in one query per relation, and all writes happen in a single
+    transaction with bulk_create/bulk_update. If any item is invalid nothing
+    is written and ``errors`` holds one entry per input item ({} when valid).
+    """
+
+    bulk_max_items = 1000
+    # Relations that voice-parsed records name instead of giving a pk, as
+    # {field: (model, name field, required)}; see commit_voice. Livestock
+    # tags need no entry: the serializers' LivestockTagField resolves them.
+    voice_lookups = {}
+
+    @action(detail=False, methods=["post", "patch", "delete"], url_path="bulk")
+    def bulk(self, request):
+        farm_id = self.get_bulk_farm(request)
+
+        items = request.data
+        invalid = self.check_bulk_items(items)
+        if invalid:
+            return invalid
+
+        if request.method == "POST":
+            return self.bulk_create(items, farm_id)
+        if request.method == "PATCH":
+            return self.bulk_update(items, farm_id)
+        return self.bulk_destroy(items)
+
+    @action(detail=False, methods=["post"], url_path="commit-voice")
+    def commit_voice(self, request):
+        """
+        Create the records from a batch parse-voice answer, given as its
+        ``{"records": [...]}`` body or the bare list. ``voice_lookups`` are
+        resolved to pks with one query per relation and tags through the
+        farm's tag index, then the records go through bulk_create in one
+        transaction.
+        """
+        farm_id = self.get_bulk_farm(request)
+
+        items = request.data
+        if isinstance(items, dict):
+            items = items.get("records")
+        invalid = self.check_bulk_items(items)
+        if invalid:
+            return invalid
+
+        items, errors = self.resolve_voice_lookups(items, farm_id)
+        if any(errors):
+            return Response({"errors": errors}, status=status.HTTP_400_BAD_REQUEST)
+        return self.bulk_create(items, farm_id)
+
+    def check_bulk_items(self, items):
+        """Return a 400 Response if ``items`` is not a usable batch."""
+        if not isinstance(items, list) or not items:
+            return Response(
+                {"detail": "Expected a non-empty list."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if len(items) > self.bulk_max_items:
+            return Response(
+                {"detail": f"At most {self.bulk_max_items} items per request."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return None
+
+    def resolve_voice_lookups(self, items, farm_id):
+        """Swap names for pks; returns (items, per-item errors)."""
+        items = [dict(item) if isinstance(item, dict) else item for item in items]
+        errors = [
+            {} if isinstance(item, dict) else {"non_field_errors": ["Expected an object."]}
+            for item in items
+        ]
+        for name, (model, name_field, required) in self.voice_lookups.items():
+            wanted = {
+                str(item[name]).strip().upper()
+                for item in items
+                if isinstance(item, dict) and isinstance(item.get(name), str)
+            }
+            queryset = model.objects.annotate(_voice_key=Upper(name_field))
+            if "farm" in {f.name for f in model._meta.get_fields()}:
+                queryset = queryset.filter(farm_id=farm_id)
+            pks = dict(queryset.filter(_voice_key__in=wanted).values_list("_voice_key", "pk"))
+            for item, error in zip(items, errors):
+                if not isinstance(item, dict) or not isinstance(item.get(name), str):
+                    continue
+                pk = pks.get(item[name].strip().upper())
+                if pk is None and required:
+                    error[name] = [f'Unknown {name_field} "{item[name]}".']
+                item[name] = pk
+        return items, errors
+
+    def get_bulk_farm(self, request):
+        """Return the caller's farm id if they may perform this bulk write on it."""
+        membership = get_membership(request)
+        if membership.is_owner:
+            return membership.farm_id
+        if membership.is_approved and IsFarmMember().labourer_has_permission(request, self):
+            return membership.farm_id
+        raise PermissionDenied("You do not have permission to perform this action.")
+
+    def get_bulk_context(self, items, farm_id):
+        """Serializer context with every related row referenced by the batch."""
+        context = self.get_serializer_context()
+        preloaded = {}
+        for name, field in self.get_serializer_class()().fields.items():
+            if field.read_only or not isinstance(field, PreloadedPrimaryKeyRelatedField):
+                continue
+            pks = set()
+            for item in items:
+                value = item.get(name) if isinstance(item, dict) else None
+                pk = field.lookup_pk(value, farm_id)
+                if pk is not None:
+                    pks.add(pk)
+            queryset = field.get_queryset()
+            if "farm" in {f.name for f in queryset.model._meta.get_fields()}:
+                queryset = queryset.filter(farm_id=farm_id)
+            preloaded[queryset.model] = queryset.in_bulk(pks)
+        context["preloaded"] = preloaded
+        return context
+
+    def bulk_create(self, items, farm_id):
+        serializer_class = self.get_serializer_class()
+        context = self.get_bulk_context(items, farm_id)
+        serializers = [serializer_class(data=item, context=context) for item in items]
+        errors = [{} if s.is_valid() else s.errors for s in serializers]
+        if any(errors):
+            return Response({"errors": errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        model = serializer_class.Meta.model
+        objs = [model(**s.validated_data) for s in serializers]
+        for obj in objs:
+            obj.sync_farm()
+        with transaction.atomic():
+            model.objects.bulk_create(objs)
+            records_bulk_changed.send(sender=model, instances=objs, created=True)
+        return Response(self.bulk_response_data(objs), status=status.HTTP_201_CREATED)
+
+    def bulk_update(self, items, farm_id):
+        serializer_class = self.get_serializer_class()
+        ids = [item.get("id") if isinstance(item, dict) else None for item in items]
+        instances = self.get_queryset().in_bulk(
+            [pk for pk in ids if isinstance(pk, int) and not isinstance(pk, bool)]
+        )
+        context = self.get_bulk_context(items, farm_id)
+
+        errors = []
+        objs = []
+        previous = []
+        changed_fields = set()
+        seen = set()
+        for pk, item in zip(ids, items):
+            instance = instances.get(pk)
+            if instance is None:
+                errors.append({"id": ["Not found."]})
+                continue
+            if pk in seen:
+                errors.append({"id": ["Duplicate id."]})
+                continue
+            seen.add(pk)
+            serializer = serializer_class(instance, data=item, partial=True, context=context)
+            if not serializer.is_valid():
+                errors.append(serializer.errors)
+                continue
+            errors.append({})
+            previous.append(copy.copy(instance))
+            for attr, value in serializer.validated_data.items():
+                setattr(instance, attr, value)
+                changed_fields.add(attr)
+            objs.append(instance)
+        if any(errors):
+            return Response({"errors": errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        model = serializer_class.Meta.model
+        if changed_fields:
+            if "livestock" in changed_fields:
+                for obj in objs:
+                    obj.sync_farm()
+                changed_fields.add("farm")
+            with transaction.atomic():
+                model.objects.bulk_update(objs, sorted(changed_fields))
+                records_bulk_changed.send(sender=model, instances=objs, previous=previous)
+        return Response(self.bulk_response_data(objs), status=status.HTTP_200_OK)
+
+    def bulk_destroy(self, ids):
+        valid_ids = [pk for pk in ids if isinstance(pk, int) and not isinstance(pk, bool)]
+        model = self.get_serializer_class().Meta.model
+        found = model.objects.filter(
+            pk__in=self.get_queryset().filter(pk__in=valid_ids).values("pk")
+        ).in_bulk()
+        errors = [{} if pk in found else {"id": ["Not found."]} for pk in ids]
+        if any(errors):
+            return Response({"errors": errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        # The per-row post_delete handlers (for cascaded AMU records and
+        # withdrawal intervals too) are held back and run once per batch.
+        with transaction.atomic(), bulk_delete():
+            model.objects.filter(pk__in=found).delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    def bulk_response_data(self, objs):
+        # Re-read through get_queryset() so the response uses the viewset's
+        # select_related/prefetch_related instead of lazy-loading per row.
+        fetched = self.get_queryset().in_bulk([obj.pk for obj in objs])
+        return self.get_serializer([fetched[obj.pk] for obj in objs], many=True).data
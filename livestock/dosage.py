@@ -0,0 +1,237 @@
+"""
+Numeric dosages for AMU records.
+
+AMURecord.dosage is free text ("12.5 ml", "2 tabs", "0.5mg/kg"). It is
+parsed once, when the record is saved, into ``dosage_value`` and
+``dosage_unit``. The unit goes through UNITS to a canonical unit, so
+"5 cc" and "0.005 L" both become 5 ml, and "/kg" carries through as
+"ml/kg".
+
+Drug.recommended_dosage_min/max are per kg of body weight, in Drug.unit.
+``check_dose`` compares a treatment with them using the animal's
+current_weight_kg, with no LLM involved.
+"""
+
+import re
+from decimal import Decimal, InvalidOperation
+
+from .models import AMURecord
+
+PER_KG = "/kg"
+
+# Spelling -> (canonical unit, multiplier into the canonical unit).
+UNITS = {}
+for _canonical, _factor, _aliases in [
+    ("ml", "1", ["ml", "mls", "millilitre", "millilitres", "milliliter", "milliliters", "cc", "cm3"]),
+    ("ml", "1000", ["l", "litre", "litres", "liter", "liters", "ltr"]),
+    ("mg", "1", ["mg", "mgs", "milligram", "milligrams"]),
+    ("mg", "1000", ["g", "gm", "gms", "gram", "grams"]),
+    ("mg", "0.001", ["mcg", "ug", "µg", "microgram", "micrograms"]),
+    ("iu", "1", ["iu", "i.u.", "unit", "units", "u"]),
+    ("tablet", "1", ["tablet", "tablets", "tab", "tabs", "caplet", "caplets"]),
+    ("bolus", "1", ["bolus", "boluses"]),
+    ("dose", "1", ["dose", "doses"]),
+]:
+    for _alias in _aliases:
+        UNITS[_alias] = (_canonical, Decimal(_factor))
+
+# "1,000" or "12,500.5": a comma before exactly three digits groups
+# thousands. Any other comma is a decimal point ("0,5 ml"). A number never
+# starts inside another, so "1,000,5 ml" is not read at all.
+_GROUPED = r"[1-9]\d{0,2}(?:,\d{3})+(?![\d,])(?:\.\d+)?"
+_DOSAGE = re.compile(
+    rf"(?<![\d.,])(?P<value>{_GROUPED}|\d+(?:[.,]\d+)?|[.,]\d+)\s*"
+    r"(?P<unit>[a-zµ][a-zµ0-9.]*)?\s*"
+    r"(?P<per_kg>(?:/|per\s+)\s*kg\b(?:\s*(?:bw|b\.w\.|body\s*weight))?)?",
+    re.IGNORECASE,
+)
+
+_PLACES = Decimal("0.0001")
+# AMURecord.dosage_value holds 12 digits, 4 after the point.
+_MAX_VALUE = Decimal("99999999.9999")
+
+STATUSES = ("ok", "under", "over", "unknown")
+
+
+def _decimal(value):
+    return value if isinstance(value, Decimal) else Decimal(str(value))
+
+
+def normalize_unit(unit):
+    """(canonical unit, multiplier, per kg) for a unit spelling, or None."""
+    if not unit:
+        return None
+    text = " ".join(unit.lower().split())
+    per_kg = False
+    for suffix in ("/kg bw", "/kg", " per kg"):
+        if text.endswith(suffix):
+            text, per_kg = text[: -len(suffix)].strip(), True
+            break
+    known = UNITS.get(text.rstrip("."), UNITS.get(text))
+    if known is None:
+        return None
+    return known[0], known[1], per_kg
+
+
+def _reading(match):
+    """(value, canonical unit) from one _DOSAGE match, or None if its unit is unknown."""
+    text = match["value"]
+    text = text.replace(",", "") if re.fullmatch(_GROUPED, text) else text.replace(",", ".")
+    try:
+        value = Decimal(text)
+    except InvalidOperation:
+        return None
+    unit = None
+    if match["unit"]:
+        normalized = normalize_unit(match["unit"])
+        if normalized is None:
+            return None
+        unit, factor, per_kg = normalized
+        value *= factor
+        if per_kg or match["per_kg"]:
+            unit += PER_KG
+    value = value.quantize(_PLACES)
+    if value > _MAX_VALUE:
+        return None
+    return value, unit
+
+
+def parse_dosage(text):
+    """
+    (value, canonical unit) read from a free-text dosage, or (None, None).
+
+    The first number followed by a known unit wins, so "20% solution, 5 ml"
+    reads as 5 ml. A dosage that is only a number keeps a None unit and is
+    read in the drug's unit.
+    """
+    text = text or ""
+    for match in _DOSAGE.finditer(text):
+        if match["unit"] or match["per_kg"]:
+            reading = _reading(match)
+            if reading is not None:
+                return reading
+    match = _DOSAGE.fullmatch(text.strip())
+    if match is not None and not match["unit"]:
+        return _reading(match)
+    return None, None
+
+
+def check_dose(dosage_value, dosage_unit, weight_kg, dose_min, dose_max, drug_unit):
+    """
+    Compare one treatment with its drug's recommended range per kg.
+
+    Returns a dict with ``status`` (ok, under, over or unknown), the dose
+    per kg and the range in the same canonical unit, and for unknown the
+    ``reason`` the check could not be made.
+    """
+    result = {
+        "status": "unknown",
+        "dose_per_kg": None,
+        "recommended_min": None,
+        "recommended_max": None,
+        "unit": None,
+        "reason": None,
+    }
+    if dosage_value is None:
+        result["reason"] = "dosage could not be read"
+        return result
+    if dose_min is None and dose_max is None:
+        result["reason"] = "drug has no recommended range"
+        return result
+
+    drug = normalize_unit(drug_unit)
+    if drug_unit and drug is None:
+        result["reason"] = f"unknown drug unit {drug_unit!r}"
+        return result
+    per_kg = bool(dosage_unit) and dosage_unit.endswith(PER_KG)
+    base = dosage_unit[: -len(PER_KG)] if per_kg else dosage_unit
+    if drug and base and drug[0] != base:
+        result["reason"] = f"dosage is in {base}, the drug's range in {drug[0]}"
+        return result
+    factor = drug[1] if drug else Decimal(1)
+    unit = base or (drug[0] if drug else None)
+
+    dose = _decimal(dosage_value)
+    if not base:
+        # A bare number is in the drug's own unit.
+        dose *= factor
+    if per_kg:
+        dose_per_kg = dose
+    elif not weight_kg:
+        result["reason"] = "animal has no recorded weight"
+        return result
+    else:
+        dose_per_kg = dose / _decimal(weight_kg)
+
+    low = _decimal(dose_min) * factor if dose_min is not None else None
+    high = _decimal(dose_max) * factor if dose_max is not None else None
+    if low is not None and dose_per_kg < low:
+        status = "under"
+    elif high is not None and dose_per_kg > high:
+        status = "over"
+    else:
+        status = "ok"
+    result.update(
+        status=status,
+        dose_per_kg=round(dose_per_kg, 6),
+        recommended_min=low,
+        recommended_max=high,
+        unit=f"{unit}{PER_KG}" if unit else PER_KG,
+    )
+    return result
+
+
+def check_amu(amu, weight_kg):
+    """``check_dose`` for an AMURecord with its drug loaded."""
+    drug = amu.drug
+    return check_dose(
+        amu.dosage_value,
+        amu.dosage_unit,
+        weight_kg,
+        drug.recommended_dosage_min if drug else None,
+        drug.recommended_dosage_max if drug else None,
+        drug.unit if drug else None,
+    )
+
+
+CHECK_FIELDS = (
+    "pk",
+    "health_record_id",
+    "health_record__event_date",
+    "health_record__livestock_id",
+    "health_record__livestock__tag_id",
+    "health_record__livestock__current_weight_kg",
+    "drug__name",
+    "dosage",
+    "dosage_value",
+    "dosage_unit",
+    "drug__recommended_dosage_min",
+    "drug__recommended_dosage_max",
+    "drug__unit",
+)
+
+
+def farm_dose_checks(farm_id, livestock_id=None):
+    """Every treatment on the farm, newest first, checked against its drug: one query."""
+    records = AMURecord.objects.filter(farm_id=farm_id)
+    if livestock_id is not None:
+        records = records.filter(health_record__livestock_id=livestock_id)
+    rows = records.order_by("-health_record__event_date", "-pk").values_list(*CHECK_FIELDS)
+
+    checks = []
+    for (pk, health_record_id, event_date, livestock_id, tag_id, weight, drug_name,
+         dosage, value, unit, dose_min, dose_max, drug_unit) in rows.iterator():
+        checks.append({
+            "amu_record": pk,
+            "health_record": health_record_id,
+            "event_date": event_date,
+            "livestock_id": livestock_id,
+            "tag_id": tag_id,
+            "weight_kg": weight,
+            "drug": drug_name,
+            "dosage": dosage,
+            "dosage_value": value,
+            "dosage_unit": unit,
+            **check_dose(value, unit, weight, dose_min, dose_max, drug_unit),
+        })
+    return checks
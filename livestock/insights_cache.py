@@ -0,0 +1,146 @@
+"""
+Versioned response cache for the insights chart-data endpoints.
+
+Cache keys embed a data version per animal and per farm. Record writes bump
+those versions (see livestock.signals) instead of deleting keys, so stale
+entries are simply never read again and age out with the cache TIMEOUT.
+
+A version is a fresh time-based token rather than a counter. The cache may
+cull a version key like any other, and a counter read back from nothing
+would start again at a value that old entries were stored under; a token
+minted on the miss is newer than every version handed out before it.
+"""
+
+import hashlib
+import threading
+import time
+from datetime import date
+from functools import wraps
+
+from django.core.cache import caches
+from rest_framework.response import Response
+
+from .membership import get_membership
+
+CACHE_ALIAS = "insights"
+CATALOG = "catalog"
+
+# Hit and miss counts for this process. Kept in memory so serving a cached
+# response costs no extra cache write.
+_stats = {"hits": 0, "misses": 0}
+_stats_lock = threading.Lock()
+
+
+def _cache():
+    return caches[CACHE_ALIAS]
+
+
+def _version_key(scope, pk):
+    return f"insights:version:{scope}:{pk}"
+
+
+def _new_version():
+    return f"{time.time_ns():x}"
+
+
+def get_versions(keys):
+    """Current version of each key, minting one for keys the cache lacks."""
+    cache = _cache()
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            version = _new_version()
+            # add() keeps a version another worker minted first.
+            if not cache.add(key, version, timeout=None):
+                version = cache.get(key, version)
+            versions[key] = version
+    return versions
+
+
+def bump_version(key):
+    """Replace the version at ``key``: a plain set, so workers never race on it."""
+    _cache().set(key, _new_version(), timeout=None)
+
+
+def bump_versions(livestock_ids=(), farm_ids=(), catalog=False):
+    """Invalidate cached responses for these animals and farms."""
+    for pk in set(livestock_ids):
+        bump_version(_version_key("livestock", pk))
+    for pk in set(farm_ids):
+        bump_version(_version_key("farm", pk))
+    if catalog:
+        # Drug and feed names/prices appear in every chart.
+        bump_version(_version_key(CATALOG, "all"))
+
+
+def _count(outcome):
+    with _stats_lock:
+        _stats[outcome] += 1
+
+
+def cache_stats():
+    """Hits and misses served by this process."""
+    with _stats_lock:
+        hits, misses = _stats["hits"], _stats["misses"]
+    total = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": round(hits / total, 4) if total else None,
+    }
+
+
+def versioned_cache(namespace, scope="livestock"):
+    """
+    Cache a chart-data action's 200 responses.
+
+    The key combines the caller, the animal (``livestock_id`` param) or the
+    caller's farm, that scope's data version, the catalog version, today's
+    date (the window is relative to today) and the query params. Keying on
+    the caller means each view's own permission checks still run for anyone
+    who has not already been served the response.
+    """
+
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(self, request, *args, **kwargs):
+            if scope == "livestock":
+                pk = request.query_params.get("livestock_id")
+            else:
+                pk = get_membership(request).approved_farm_id
+            if not pk:
+                return view_func(self, request, *args, **kwargs)
+
+            cache = _cache()
+            version_key, catalog_key = _version_key(scope, pk), _version_key(CATALOG, "all")
+            versions = get_versions([version_key, catalog_key])
+            params = hashlib.md5(
+                repr(sorted(request.query_params.lists())).encode()
+            ).hexdigest()
+            key = ":".join(
+                [
+                    "insights",
+                    namespace,
+                    f"user{request.user.pk}",
+                    f"{scope}{pk}",
+                    f"v{versions[version_key]}",
+                    f"c{versions[catalog_key]}",
+                    date.today().isoformat(),
+                    params,
+                ]
+            )
+
+            data = cache.get(key)
+            if data is not None:
+                _count("hits")
+                return Response(data)
+
+            _count("misses")
+            response = view_func(self, request, *args, **kwargs)
+            if response.status_code == 200:
+                cache.set(key, response.data)
+            return response
+
+        return wrapper
+
+    return decorator
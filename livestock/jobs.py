@@ -0,0 +1,134 @@
+"""
+DB-backed queue for AMU insight generation.
+
+The generate endpoint enqueues an InsightJob and returns at once; the
+``run_insight_jobs`` command claims and runs jobs. A job is claimed with a
+conditional UPDATE (``status = queued``), so any number of workers can poll
+the same table without handing a job out twice. A job whose worker died is
+reclaimed once it has been running for ``STALE_AFTER``.
+"""
+
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import llm, llm_cache
+from .models import InsightJob
+
+STALE_AFTER = timedelta(minutes=10)
+MAX_ATTEMPTS = 3
+
+
+def enqueue_insight_job(livestock, key, model, messages, params, user=None):
+    """
+    Return the in-flight job for ``key``, creating it if there is none.
+
+    The partial unique constraint on in-flight cache keys makes concurrent
+    callers converge on one row.
+    """
+    for _ in range(3):
+        job = InsightJob.objects.filter(
+            cache_key=key, status__in=InsightJob.IN_FLIGHT
+        ).first()
+        if job is not None:
+            return job
+        try:
+            with transaction.atomic():
+                return InsightJob.objects.create(
+                    farm_id=livestock.farm_id,
+                    livestock=livestock,
+                    requested_by=user,
+                    cache_key=key,
+                    model_name=model,
+                    request={"messages": messages, "params": params},
+                )
+        except IntegrityError:
+            continue
+    raise RuntimeError("Could not enqueue insight job.")
+
+
+def _claimable():
+    return Q(status="queued") | Q(
+        status="running", started_at__lt=timezone.now() - STALE_AFTER
+    )
+
+
+def claim_next_job():
+    """Atomically take the oldest runnable job, or return None."""
+    while True:
+        candidate = (
+            InsightJob.objects.filter(_claimable())
+            .order_by("created_at", "id")
+            .values("pk", "status", "attempts")
+            .first()
+        )
+        if candidate is None:
+            return None
+        if candidate["attempts"] >= MAX_ATTEMPTS:
+            InsightJob.objects.filter(
+                pk=candidate["pk"], status=candidate["status"]
+            ).update(
+                status="failed",
+                error="Gave up after repeated worker failures.",
+                finished_at=timezone.now(),
+            )
+            continue
+        # Only one worker's UPDATE can match the status/attempts it read.
+        claimed = InsightJob.objects.filter(
+            pk=candidate["pk"],
+            status=candidate["status"],
+            attempts=candidate["attempts"],
+        ).update(status="running", started_at=timezone.now(), attempts=F("attempts") + 1)
+        if claimed:
+            return InsightJob.objects.get(pk=candidate["pk"])
+
+
+def _finish(job, **fields):
+    InsightJob.objects.filter(pk=job.pk, status="running").update(
+        finished_at=timezone.now(), **fields
+    )
+
+
+def _requeue(job):
+    InsightJob.objects.filter(pk=job.pk, status="running").update(
+        status="queued", started_at=None, attempts=F("attempts") - 1
+    )
+
+
+async def run_job(job):
+    """Call the LLM for a claimed job and record the outcome."""
+    try:
+        insights = await llm.chat_completion(
+            job.request["messages"], model=job.model_name, **job.request["params"]
+        )
+    except llm.LLMCircuitOpen:
+        # The provider is down; hand the job back untouched for a later try.
+        await sync_to_async(_requeue)(job)
+        return
+    except llm.LLMEmptyResponse:
+        await sync_to_async(_finish)(
+            job, status="failed", error="AI generated an empty response."
+        )
+        return
+    except Exception as e:
+        await sync_to_async(_finish)(
+            job, status="failed", error=f"Error generating insights: {str(e)}"
+        )
+        return
+
+    await sync_to_async(llm_cache.store_response)(job.cache_key, job.model_name, insights)
+    await sync_to_async(_finish)(job, status="succeeded", result=insights)
+
+
+def job_data(job):
+    return {
+        "job_id": job.pk,
+        "status": job.status,
+        "insights": job.result,
+        "error": job.error,
+        "created_at": job.created_at.isoformat(),
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
@@ -0,0 +1,405 @@
+"""
+Async client for the Groq chat-completions API.
+
+One pooled ``httpx.AsyncClient`` is kept per event loop, so under ASGI every
+request reuses the same keep-alive TLS connections, and a request waiting on
+the model only holds a coroutine rather than a whole worker. Under WSGI, Django
+runs each async view in a fresh loop, so the pool just lives for that request
+and is closed as the loop shuts down.
+
+Every outbound call passes a process-wide circuit breaker and a process-wide
+concurrency cap (LLM_BREAKER_THRESHOLD, LLM_BREAKER_RESET_SECONDS,
+LLM_MAX_CONCURRENCY), whichever loop or thread it runs in, and retries back
+off exponentially; ``stats()`` reports on all three.
+"""
+
+import asyncio
+import contextlib
+import json
+import math
+import os
+import random
+import threading
+import time
+import weakref
+from email.utils import parsedate_to_datetime
+
+import httpx
+
+DEFAULT_URL = "https://api.groq.com/openai/v1/chat/completions"
+DEFAULT_MODEL = "llama-3.3-70b-versatile"
+
+_clients = weakref.WeakKeyDictionary()
+
+
+class LLMError(Exception):
+    """The completion could not be obtained."""
+
+
+class LLMNotConfigured(LLMError):
+    pass
+
+
+class LLMHTTPError(LLMError):
+    def __init__(self, status_code, text):
+        super().__init__(f"{status_code} - {text}")
+        self.status_code = status_code
+        self.text = text
+
+
+class LLMRequestError(LLMError):
+    pass
+
+
+class LLMEmptyResponse(LLMError):
+    pass
+
+
+class LLMInvalidResponse(LLMError):
+    """Every attempt returned content that the caller's ``parse`` rejected."""
+
+
+class LLMCircuitOpen(LLMError):
+    """Recent calls failed, so this one was not attempted."""
+
+
+def api_key():
+    return os.environ.get("GROQ_API_KEY", "").strip()
+
+
+def model_name():
+    return os.environ.get("GROQ_MODEL", DEFAULT_MODEL).strip()
+
+
+def api_url():
+    return os.environ.get("GROQ_API_URL", DEFAULT_URL).strip()
+
+
+async def _close_at_shutdown(client):
+    # Waits for the life of the loop. asyncio.run (which asgiref uses for
+    # each async view under WSGI) cancels leftover tasks and runs them to the
+    # end before closing the loop, so the pool is closed while it still can be.
+    loop = asyncio.get_running_loop()
+    try:
+        await loop.create_future()
+    finally:
+        # This task refers to the loop, so its entry must go for the loop
+        # to be freed.
+        if _clients.get(loop, (None,))[0] is client:
+            del _clients[loop]
+        await client.aclose()
+
+
+def get_client():
+    """The pooled AsyncClient for the running event loop."""
+    loop = asyncio.get_running_loop()
+    client, closer = _clients.get(loop, (None, None))
+    if client is None or client.is_closed:
+        if closer is not None:
+            closer.cancel()
+        client = httpx.AsyncClient(
+            timeout=httpx.Timeout(30.0, connect=5.0),
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+        )
+        # The task is kept with the client: the loop only holds tasks weakly.
+        _clients[loop] = (client, loop.create_task(_close_at_shutdown(client)))
+    return client
+
+
+class CircuitBreaker:
+    """
+    Process-wide breaker over the provider's health.
+
+    After ``threshold`` consecutive failures (transport errors, 429 and 5xx)
+    it opens and calls fail at once with LLMCircuitOpen. After
+    ``reset_timeout`` seconds one probe call is let through (half-open); its
+    success closes the breaker, its failure opens it again.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, threshold, reset_timeout, clock=time.monotonic):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self.probe_started = None
+        self.short_circuited = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return self.CLOSED
+        if self.clock() - self.opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def before_call(self):
+        with self._lock:
+            state = self.state
+            if state == self.CLOSED:
+                return
+            # A probe that never reported back (e.g. a dropped stream) is
+            # given up on after another reset_timeout.
+            probe_lost = (
+                self.probe_started is not None
+                and self.clock() - self.probe_started >= self.reset_timeout
+            )
+            if state == self.HALF_OPEN and (self.probe_started is None or probe_lost):
+                self.probe_started = self.clock()
+                return
+            self.short_circuited += 1
+            retry_in = max(0.0, self.reset_timeout - (self.clock() - self.opened_at))
+        raise LLMCircuitOpen(
+            f"LLM provider unavailable; retry in {math.ceil(retry_in)}s."
+        )
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probe_started = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.probe_started is not None or self.failures >= self.threshold:
+                self.opened_at = self.clock()
+            self.probe_started = None
+
+    def release_probe(self):
+        """A call ended with no verdict on the provider (it was cancelled)."""
+        with self._lock:
+            self.probe_started = None
+
+    def stats(self):
+        with self._lock:
+            retry_in = None
+            if self.state == self.OPEN:
+                retry_in = round(self.reset_timeout - (self.clock() - self.opened_at), 1)
+            return {
+                "state": self.state,
+                "consecutive_failures": self.failures,
+                "retry_in": retry_in,
+                "short_circuited": self.short_circuited,
+            }
+
+
+class _ConcurrencyLimit:
+    """
+    Caps outbound calls across the process with one threading semaphore,
+    whichever event loop or thread they run in, and counts in-flight and
+    waiting calls for the metrics. A call that finds every slot taken polls
+    with asyncio.sleep rather than blocking, so waiting never stalls its loop
+    and a cancelled wait never holds a slot.
+    """
+
+    POLL_MIN = 0.005
+    POLL_MAX = 0.1
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.in_flight = 0
+        self.waiting = 0
+        self._semaphore = threading.BoundedSemaphore(limit)
+        self._lock = threading.Lock()
+
+    async def _acquire(self):
+        delay = self.POLL_MIN
+        while not self._semaphore.acquire(blocking=False):
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.POLL_MAX)
+
+    @contextlib.asynccontextmanager
+    async def slot(self):
+        with self._lock:
+            self.waiting += 1
+        try:
+            await self._acquire()
+        finally:
+            with self._lock:
+                self.waiting -= 1
+        with self._lock:
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+            self._semaphore.release()
+
+
+breaker = CircuitBreaker(
+    threshold=int(os.environ.get("LLM_BREAKER_THRESHOLD", 5)),
+    reset_timeout=float(os.environ.get("LLM_BREAKER_RESET_SECONDS", 30)),
+)
+limiter = _ConcurrencyLimit(int(os.environ.get("LLM_MAX_CONCURRENCY", 16)))
+counters = {"calls": 0, "retries": 0, "failures": 0}
+
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 8.0
+RETRY_AFTER_CAP = 30.0
+_sleep = asyncio.sleep
+
+
+def stats():
+    """Breaker state, concurrency and call counters, for the metrics endpoint."""
+    return {
+        "breaker": breaker.stats(),
+        "max_concurrency": limiter.limit,
+        "in_flight": limiter.in_flight,
+        "queue_depth": limiter.waiting,
+        **counters,
+    }
+
+
+def _is_provider_failure(error):
+    if isinstance(error, LLMRequestError):
+        return True
+    return isinstance(error, LLMHTTPError) and (
+        error.status_code == 429 or error.status_code >= 500
+    )
+
+
+def _retry_after(response):
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            when = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        seconds = when.timestamp() - time.time()
+    return min(max(seconds, 0.0), RETRY_AFTER_CAP)
+
+
+def backoff_delay(attempt, retry_after=None):
+    """Full-jitter exponential backoff, or the server's Retry-After if longer."""
+    delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return delay
+
+
+async def chat_completion(messages, *, model=None, attempts=3, parse=None, **params):
+    """
+    POST ``messages`` and return the first choice's content.
+
+    Transport errors, 429s and 5xx responses are retried up to ``attempts``
+    times with jittered exponential backoff, waiting at least as long as any
+    ``Retry-After``; other 4xx responses are not retried. Every try goes
+    through the circuit breaker and the concurrency cap. If ``parse`` is
+    given it is applied to the content and its result returned; a ValueError
+    from it also counts as a failed attempt.
+    """
+    key = api_key()
+    if not key:
+        raise LLMNotConfigured("GROQ_API_KEY is not set.")
+
+    payload = {"model": model or model_name(), "messages": messages, **params}
+    headers = {"Authorization": f"Bearer {key}"}
+    error = LLMError("No attempts made.")
+    counters["calls"] += 1
+    for attempt in range(attempts):
+        if attempt:
+            counters["retries"] += 1
+        breaker.before_call()
+        retry_after = None
+        try:
+            async with limiter.slot():
+                try:
+                    response = await get_client().post(api_url(), json=payload, headers=headers)
+                except httpx.HTTPError as e:
+                    response = None
+                    error = LLMRequestError(str(e))
+        except BaseException:
+            breaker.release_probe()
+            raise
+        if response is not None and response.status_code != 200:
+            error = LLMHTTPError(response.status_code, response.text)
+            retry_after = _retry_after(response)
+
+        if response is None or response.status_code != 200:
+            if _is_provider_failure(error):
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+                break
+            if attempt < attempts - 1:
+                await _sleep(backoff_delay(attempt, retry_after))
+            continue
+
+        breaker.record_success()
+        try:
+            content = response.json()["choices"][0]["message"]["content"]
+        except (ValueError, KeyError, IndexError, TypeError):
+            raise LLMEmptyResponse("AI returned empty response")
+        if parse is None:
+            return content
+        try:
+            return parse(content)
+        except ValueError as e:
+            error = LLMInvalidResponse(str(e))
+    counters["failures"] += 1
+    raise error
+
+
+async def stream_chat_completion(messages, *, model=None, **params):
+    """
+    POST ``messages`` with ``stream: true`` and yield content deltas as the
+    server sends them (OpenAI-style ``data: {...}`` lines ending in
+    ``data: [DONE]``). Nothing is retried once the response has started.
+    """
+    key = api_key()
+    if not key:
+        raise LLMNotConfigured("GROQ_API_KEY is not set.")
+
+    payload = {"model": model or model_name(), "messages": messages, "stream": True, **params}
+    headers = {"Authorization": f"Bearer {key}", "Accept": "text/event-stream"}
+    counters["calls"] += 1
+    breaker.before_call()
+    recorded = False
+    try:
+        async with limiter.slot(), get_client().stream(
+            "POST", api_url(), json=payload, headers=headers
+        ) as response:
+            if response.status_code != 200:
+                body = await response.aread()
+                error = LLMHTTPError(response.status_code, body.decode(errors="replace"))
+                # As in chat_completion: only 429/5xx count against the
+                # provider; any other answer shows it is up.
+                if _is_provider_failure(error):
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+                recorded = True
+                counters["failures"] += 1
+                raise error
+            breaker.record_success()
+            recorded = True
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    return
+                try:
+                    delta = json.loads(data)["choices"][0]["delta"].get("content")
+                except (ValueError, KeyError, IndexError, TypeError, AttributeError):
+                    continue
+                if delta:
+                    yield delta
+    except httpx.HTTPError as e:
+        if not recorded:
+            breaker.record_failure()
+            recorded = True
+        counters["failures"] += 1
+        raise LLMRequestError(str(e))
+    finally:
+        if not recorded:
+            breaker.release_probe()
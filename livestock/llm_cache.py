@@ -0,0 +1,93 @@
+"""
+Persistent cache for generated LLM responses.
+
+An entry is addressed by a SHA-256 of the model name, the sampling parameters
+and the chat messages with whitespace normalized, so re-asking about an animal
+whose recent records have not changed finds the previous answer whatever
+request produced it. Entries expire after ``LLM_CACHE_TTL`` seconds and the
+table is trimmed to ``LLM_CACHE_MAX_ENTRIES``, least recently used first.
+"""
+
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from .models import LLMResponseCache
+
+
+def _normalize(text):
+    return "\n".join(" ".join(line.split()) for line in text.strip().splitlines())
+
+
+def cache_key(model, messages, **params):
+    """Hash of everything that determines the model's answer."""
+    payload = {
+        "model": model,
+        "messages": [
+            {"role": m["role"], "content": _normalize(m["content"])} for m in messages
+        ],
+        "params": params,
+    }
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def _fresh():
+    cutoff = timezone.now() - timedelta(seconds=settings.LLM_CACHE_TTL)
+    return LLMResponseCache.objects.filter(created_at__gte=cutoff)
+
+
+def get_cached_entry(key):
+    """
+    Return the unexpired LLMResponseCache row for ``key`` (only ``response``
+    and ``created_at`` loaded), or None.
+    """
+    entry = _fresh().filter(key=key).only("response", "created_at").first()
+    if entry is None:
+        return None
+    LLMResponseCache.objects.filter(pk=entry.pk).update(
+        last_used_at=timezone.now(), hits=F("hits") + 1
+    )
+    return entry
+
+
+def get_cached_response(key):
+    """Return the cached response for ``key``, or None if missing or expired."""
+    entry = get_cached_entry(key)
+    return entry.response if entry is not None else None
+
+
+def fresh_keys(keys):
+    """The subset of ``keys`` with an unexpired entry; does not count as a hit."""
+    return set(_fresh().filter(key__in=list(keys)).values_list("key", flat=True))
+
+
+def store_response(key, model, response):
+    now = timezone.now()
+    LLMResponseCache.objects.update_or_create(
+        key=key,
+        defaults={
+            "model_name": model,
+            "response": response,
+            "created_at": now,
+            "last_used_at": now,
+            "hits": 0,
+        },
+    )
+    _trim()
+
+
+def _trim():
+    # Drop the expired rows, then everything past the newest MAX_ENTRIES.
+    cutoff = timezone.now() - timedelta(seconds=settings.LLM_CACHE_TTL)
+    LLMResponseCache.objects.filter(created_at__lt=cutoff).delete()
+    stale = LLMResponseCache.objects.order_by("-last_used_at", "-id").values_list(
+        "pk", flat=True
+    )[settings.LLM_CACHE_MAX_ENTRIES:]
+    stale_ids = list(stale)
+    if stale_ids:
+        LLMResponseCache.objects.filter(pk__in=stale_ids).delete()
@@ -0,0 +1,87 @@
+from django.core.management.base import BaseCommand
+import json
+
+from livestock import withdrawal
+from livestock.models import AMURecord
+
+
+class Command(BaseCommand):
+    help = (
+        'Check every yield record against the drug withdrawal intervals and '
+        'report those logged while the animal was under withdrawal'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--farm', type=int, help='Only audit this farm id')
+        parser.add_argument(
+            '--rebuild', action='store_true',
+            help='First recompute the withdrawal intervals from the AMU records',
+        )
+        parser.add_argument(
+            '--fix', action='store_true',
+            help='Correct under_withdrawal on yields where it disagrees',
+        )
+        parser.add_argument('--output', help='Write the JSON report to this file')
+
+    def handle(self, *args, **options):
+        farm_id = options['farm']
+        if options['rebuild']:
+            amu_records = AMURecord.objects.all()
+            if farm_id:
+                amu_records = amu_records.filter(farm_id=farm_id)
+            changed = withdrawal.sync_intervals(amu_records, reflag=False)
+            self.stdout.write(f'{changed} withdrawal interval(s) written or removed.')
+
+        yields, mismatched = withdrawal.audit(farm_id)
+        mismatched_count = mismatched.count()
+        fixed = 0
+        if options['fix'] and mismatched_count:
+            withdrawal.reflag_all(farm_id)
+            fixed = mismatched_count
+
+        in_window = (
+            yields.filter(in_window=True)
+            .select_related('livestock')
+            .order_by('livestock__tag_id', 'date', 'pk')
+        )
+        report = {
+            'farm': farm_id,
+            'yields_checked': yields.count(),
+            'in_withdrawal': [],
+            'mismatched': mismatched_count,
+            'fixed': fixed,
+        }
+        for record in in_window.iterator():
+            report['in_withdrawal'].append({
+                'id': record.pk,
+                'tag_id': record.livestock.tag_id,
+                'date': record.date.isoformat(),
+                'yield_type': record.yield_type,
+                'quantity': str(record.quantity),
+                'unit': record.unit,
+            })
+
+        self.print_report(report)
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                json.dump(report, fh, indent=2)
+            self.stdout.write(f"Report written to {options['output']}")
+
+    def print_report(self, report):
+        flagged = report['in_withdrawal']
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"{len(flagged)} of {report['yields_checked']} yield record(s) logged under withdrawal"
+        ))
+        for row in flagged:
+            self.stdout.write(
+                f"  {row['tag_id']} {row['date']}: {row['quantity']} {row['unit']} {row['yield_type']}"
+            )
+        if report['mismatched']:
+            if report['fixed']:
+                self.stdout.write(self.style.SUCCESS(f"Fixed {report['fixed']} stale under_withdrawal flag(s)."))
+            else:
+                self.stdout.write(self.style.WARNING(
+                    f"{report['mismatched']} record(s) have a stale under_withdrawal flag; run with --fix."
+                ))
+        else:
+            self.stdout.write(self.style.SUCCESS('Every under_withdrawal flag is up to date.'))
@@ -0,0 +1,225 @@
+from django.core.management.base import BaseCommand
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from datetime import date, timedelta
+from decimal import Decimal
+import json
+import random
+import statistics
+import time
+
+import numpy as np
+
+from livestock import analytics
+from livestock.models import Farm, Feed, FeedRecord, Livestock, YieldRecord
+
+User = get_user_model()
+
+SPECIES = ['Cattle', 'Goat', 'Sheep']
+
+
+class Command(BaseCommand):
+    help = (
+        'Time the vectorized profitability analytics on a synthetic herd '
+        '(default 10k animals x 3 years) against a per-record Python loop, '
+        'and time loading the series from a seeded, rolled-back database'
+    )
+
+    # Computing and loading are measured separately: the compute phase runs
+    # at full size on arrays generated in memory, while seeding the database
+    # with tens of millions of rows would dominate the run, so the load phase
+    # seeds --db-animals animals and reports rows per second.
+
+    def add_arguments(self, parser):
+        parser.add_argument('--animals', type=int, default=10_000)
+        parser.add_argument('--days', type=int, default=3 * 365)
+        parser.add_argument(
+            '--baseline-animals', type=int, default=500,
+            help='Animals to run the Python loop over; its time is scaled up (0 skips it)',
+        )
+        parser.add_argument(
+            '--db-animals', type=int, default=200,
+            help='Animals seeded for the load phase (0 skips it)',
+        )
+        parser.add_argument('--price', type=float, default=350.0)
+        parser.add_argument('--repeat', type=int, default=3)
+        parser.add_argument('--output', help='Write the JSON report to this file')
+
+    def handle(self, *args, **options):
+        report = {
+            'animals': options['animals'],
+            'days': options['days'],
+            'compute': self.measure_compute(options),
+        }
+        if options['db_animals']:
+            report['load'] = self.measure_load(options)
+
+        self.print_report(report)
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                json.dump(report, fh, indent=2)
+            self.stdout.write(f"Report written to {options['output']}")
+
+    def synthetic_series(self, animals, days):
+        rng = np.random.default_rng(42)
+        feed_kg = rng.uniform(5, 15, size=(animals, days))
+        return analytics.HerdSeries(
+            start=date.today() - timedelta(days=days - 1),
+            pks=np.arange(1, animals + 1, dtype=np.int64),
+            tags=[f'BENCH-{i:05d}' for i in range(animals)],
+            species=[SPECIES[i % len(SPECIES)] for i in range(animals)],
+            feed_kg=feed_kg,
+            feed_cost=feed_kg * 30.0,
+            yield_qty=rng.uniform(10, 30, size=(animals, days)),
+        )
+
+    def vectorized(self, series, price):
+        result = analytics.profitability(series, price)
+        analytics.group_totals(result, series.species)
+        return analytics.metric_columns(result)
+
+    def python_loop(self, series, price, animals):
+        """What the numbers cost computed by hand: one Python step per record."""
+        totals = {}
+        feed_kg = series.feed_kg[:animals].tolist()
+        feed_cost = series.feed_cost[:animals].tolist()
+        yield_qty = series.yield_qty[:animals].tolist()
+        recent_from = series.days - analytics.DEFAULT_ROLLING_DAYS
+        for i in range(animals):
+            kg = cost = qty = recent = 0.0
+            for day in range(series.days):
+                kg += feed_kg[i][day]
+                cost += feed_cost[i][day]
+                qty += yield_qty[i][day]
+                if day >= recent_from:
+                    recent += yield_qty[i][day] * price - feed_cost[i][day]
+            totals[i] = {
+                'feed_conversion_ratio': kg / qty if qty else None,
+                'cost_per_unit': cost / qty if qty else None,
+                'margin': qty * price - cost,
+                'rolling_margin': recent,
+            }
+        return totals
+
+    def measure_compute(self, options):
+        animals, days, price = options['animals'], options['days'], options['price']
+        self.stdout.write(f'Generating {animals} animals x {days} days in memory...')
+        series = self.synthetic_series(animals, days)
+
+        timings = []
+        for _ in range(options['repeat']):
+            started = time.perf_counter()
+            columns = self.vectorized(series, price)
+            timings.append((time.perf_counter() - started) * 1000)
+        result = {
+            'cells': animals * days,
+            'vectorized_median_ms': round(statistics.median(timings), 3),
+            'vectorized_min_ms': round(min(timings), 3),
+        }
+
+        sample = min(options['baseline_animals'], animals)
+        if sample:
+            started = time.perf_counter()
+            loop = self.python_loop(series, price, sample)
+            loop_ms = (time.perf_counter() - started) * 1000
+            estimate = loop_ms * animals / sample
+            result['python_loop_animals'] = sample
+            result['python_loop_ms'] = round(loop_ms, 3)
+            result['python_loop_estimated_ms'] = round(estimate, 3)
+            result['speedup'] = round(estimate / result['vectorized_median_ms'], 1)
+            # The two must agree before the timings mean anything.
+            for i in range(sample):
+                expected = loop[i]['rolling_margin']
+                if not np.isclose(columns['rolling_margin'][i], expected, rtol=1e-6, atol=0.01):
+                    raise AssertionError(f'Animal {i}: rolling margin differs from the Python loop')
+        return result
+
+    def measure_load(self, options):
+        # Seed data is created in a transaction that is rolled back, so the
+        # benchmark never touches real data.
+        with transaction.atomic():
+            farm_id, start, end, rows = self.seed(options['db_animals'], options['days'])
+            timings = []
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                series = analytics.load_series(farm_id, start, end, 'Milk')
+                timings.append((time.perf_counter() - started) * 1000)
+            transaction.set_rollback(True)
+
+        median_ms = statistics.median(timings)
+        return {
+            'vendor': connection.vendor,
+            'animals': options['db_animals'],
+            'records': rows,
+            'loaded_cells': int(series.feed_kg.size),
+            'median_ms': round(median_ms, 3),
+            'records_per_s': round(rows / median_ms * 1000) if median_ms else None,
+            'estimated_full_size_ms': round(
+                median_ms * options['animals'] / options['db_animals'], 3
+            ),
+        }
+
+    def seed(self, animals, days):
+        """One farm with `animals` animals and a feed and a yield record per day"""
+        self.stdout.write(f'Seeding {animals} animals x {days} days...')
+        rng = random.Random(42)
+        owner = User(username='analytics_benchmark', email='analytics-benchmark@farm.invalid')
+        owner.set_unusable_password()
+        owner.save()
+        farm = Farm.objects.create(owner=owner, name='Analytics Benchmark Farm')
+        feed = Feed.objects.create(name='Analytics Benchmark Feed', cost_per_kg=Decimal('30.00'))
+        herd = Livestock.objects.bulk_create([
+            Livestock(
+                farm=farm,
+                tag_id=f'ANALYTICS-{i:05d}',
+                species=SPECIES[i % len(SPECIES)],
+                breed='Mixed',
+                date_of_birth=date(2020, 1, 1),
+                gender='F',
+            )
+            for i in range(animals)
+        ])
+
+        end = date.today()
+        start = end - timedelta(days=days - 1)
+        rows = 0
+        for animal in herd:
+            feed_rows = []
+            yield_rows = []
+            for offset in range(days):
+                day = start + timedelta(days=offset)
+                feed_rows.append(FeedRecord(
+                    farm=farm, livestock=animal, feed=feed, feed_type='concentrate',
+                    quantity_kg=Decimal(rng.randint(5, 15)), date=day,
+                ))
+                yield_rows.append(YieldRecord(
+                    farm=farm, livestock=animal, yield_type='Milk',
+                    quantity=Decimal(rng.randint(10, 30)), unit='Liters', date=day,
+                ))
+            FeedRecord.objects.bulk_create(feed_rows, batch_size=1000)
+            YieldRecord.objects.bulk_create(yield_rows, batch_size=1000)
+            rows += len(feed_rows) + len(yield_rows)
+        return farm.pk, start, end, rows
+
+    def print_report(self, report):
+        compute = report['compute']
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"compute ({report['animals']} animals x {report['days']} days)"
+        ))
+        self.stdout.write(f"  vectorized: {compute['vectorized_median_ms']} ms")
+        if 'python_loop_ms' in compute:
+            self.stdout.write(
+                f"  python loop: {compute['python_loop_ms']} ms for "
+                f"{compute['python_loop_animals']} animals, ~{compute['python_loop_estimated_ms']} ms "
+                f"for all ({compute['speedup']}x slower)"
+            )
+        load = report.get('load')
+        if load:
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f"load ({load['animals']} animals, {load['records']} records, {load['vendor']})"
+            ))
+            self.stdout.write(
+                f"  {load['median_ms']} ms ({load['records_per_s']} records/s), "
+                f"~{load['estimated_full_size_ms']} ms at {report['animals']} animals"
+            )
+        self.stdout.write(self.style.SUCCESS('Benchmark complete (all data rolled back).'))
@@ -0,0 +1,172 @@
+from django.core.management.base import BaseCommand
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from datetime import date, timedelta
+from decimal import Decimal
+import json
+import random
+import statistics
+import time
+
+from livestock.buckets import AMU_SOURCE, FEED_SOURCE, YIELD_SOURCE, parse_window
+from livestock.models import (
+    Farm, Livestock, Drug, Feed, HealthRecord,
+    AMURecord, FeedRecord, YieldRecord
+)
+from livestock.rollups import rebuild_rollups
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a large throwaway dataset and record EXPLAIN output and timings '
+        'for each insights query, with and without the record indexes'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--animals', type=int, default=200)
+        parser.add_argument('--days', type=int, default=3 * 365)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--output', help='Write the JSON report to this file')
+
+    def handle(self, *args, **options):
+        # Everything (seed data and index DDL) happens in one transaction
+        # that is rolled back, so the benchmark never touches real data.
+        # SQLite only allows schema changes inside atomic() with FK checks off.
+        with connection.constraint_checks_disabled(), transaction.atomic():
+            farm_id, livestock_id = self.seed(options['animals'], options['days'])
+            report = {
+                'vendor': connection.vendor,
+                'animals': options['animals'],
+                'days': options['days'],
+                'phases': {},
+            }
+            self.toggle_indexes(enabled=False)
+            report['phases']['without_indexes'] = self.measure(farm_id, livestock_id, options['repeat'])
+            self.toggle_indexes(enabled=True)
+            report['phases']['with_indexes'] = self.measure(farm_id, livestock_id, options['repeat'])
+            transaction.set_rollback(True)
+
+        self.print_report(report)
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                json.dump(report, fh, indent=2)
+            self.stdout.write(f"Report written to {options['output']}")
+
+    def toggle_indexes(self, enabled):
+        with connection.schema_editor(atomic=False) as editor:
+            for model in [HealthRecord, FeedRecord, YieldRecord]:
+                for index in model._meta.indexes:
+                    if enabled:
+                        editor.add_index(model, index)
+                    else:
+                        editor.remove_index(model, index)
+
+    def seed(self, animals, days):
+        """Create one farm with `animals` animals, `days` of history each and its rollups"""
+        self.stdout.write(f'Seeding {animals} animals x {days} days...')
+        rng = random.Random(42)
+        owner = User(username='benchmark_owner', email='benchmark@farm.invalid')
+        owner.set_unusable_password()
+        owner.save()
+        farm = Farm.objects.create(owner=owner, name='Benchmark Farm')
+        feed = Feed.objects.create(name='Benchmark Feed', cost_per_kg=Decimal('30.00'))
+        drug = Drug.objects.create(name='Benchmark Drug', unit='ml')
+
+        herd = Livestock.objects.bulk_create([
+            Livestock(
+                farm=farm,
+                tag_id=f'BENCH-{i:05d}',
+                species='Cattle',
+                breed='Holstein Friesian',
+                date_of_birth=date(2020, 1, 1),
+                gender='F',
+            )
+            for i in range(animals)
+        ])
+
+        today = date.today()
+        for animal in herd:
+            feed_rows = []
+            yield_rows = []
+            health_rows = []
+            for offset in range(days):
+                day = today - timedelta(days=offset)
+                feed_rows.append(FeedRecord(
+                    farm=farm, livestock=animal, feed=feed, feed_type='concentrate',
+                    quantity_kg=Decimal(rng.randint(5, 15)), date=day,
+                ))
+                # Twice-daily milking.
+                for _ in range(2):
+                    yield_rows.append(YieldRecord(
+                        farm=farm, livestock=animal, yield_type='Milk',
+                        quantity=Decimal(rng.randint(5, 15)), unit='Liters', date=day,
+                    ))
+                if offset % 30 == 0:
+                    health_rows.append(HealthRecord(
+                        farm=farm, livestock=animal, event_type='treatment', event_date=day,
+                    ))
+            FeedRecord.objects.bulk_create(feed_rows, batch_size=1000)
+            YieldRecord.objects.bulk_create(yield_rows, batch_size=1000)
+            health_rows = HealthRecord.objects.bulk_create(health_rows, batch_size=1000)
+            AMURecord.objects.bulk_create([
+                AMURecord(farm=farm, health_record=record, drug=drug, dosage='5 ml', withdrawal_period=7)
+                for record in health_rows
+            ], batch_size=1000)
+
+        # bulk_create sends no signals, so the rollups are built in one pass.
+        rebuild_rollups(farm.pk)
+        return farm.pk, herd[len(herd) // 2].pk
+
+    def insights_queries(self, farm_id, livestock_id):
+        """
+        The querysets built by the insights chart-data endpoints, through the
+        same BucketSources: month buckets read the rollups, day buckets the
+        raw records.
+        """
+        queries = {}
+        for granularity in ('month', 'day'):
+            window = parse_window({'granularity': granularity})
+            queries.update({
+                f'amu_{granularity}': AMU_SOURCE.rows(
+                    window, ['drug_id', 'drug__name'], livestock_id=livestock_id
+                ),
+                f'feed_{granularity}': FEED_SOURCE.rows(
+                    window, ['feed_name'], livestock_id=livestock_id
+                ),
+                f'yield_{granularity}': YIELD_SOURCE.rows(
+                    window, ['yield_type', 'unit'], livestock_id=livestock_id
+                ),
+                f'farm_yield_{granularity}': YIELD_SOURCE.rows(window, farm_id=farm_id),
+                f'farm_feed_by_species_{granularity}': FEED_SOURCE.rows(
+                    window, ['livestock__species'], farm_id=farm_id
+                ),
+            })
+        return queries
+
+    def measure(self, farm_id, livestock_id, repeat):
+        results = {}
+        for name, qs in self.insights_queries(farm_id, livestock_id).items():
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                list(qs.all())
+                timings.append((time.perf_counter() - started) * 1000)
+            results[name] = {
+                'median_ms': round(statistics.median(timings), 3),
+                'min_ms': round(min(timings), 3),
+                'explain': qs.explain(),
+            }
+        return results
+
+    def print_report(self, report):
+        before = report['phases']['without_indexes']
+        after = report['phases']['with_indexes']
+        for name in before:
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            self.stdout.write(f"  without indexes: {before[name]['median_ms']} ms")
+            self.stdout.write(f"    {before[name]['explain']}")
+            self.stdout.write(f"  with indexes:    {after[name]['median_ms']} ms")
+            self.stdout.write(f"    {after[name]['explain']}")
+        self.stdout.write(self.style.SUCCESS('Benchmark complete (all data rolled back).'))
@@ -0,0 +1,169 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+import asyncio
+import json
+import statistics
+import time
+
+from livestock import llm
+from livestock.prompts import voice_messages
+from livestock.voice_rules import parse_transcript
+from livestock.views_llm import _parse_json_object
+
+# A sample of the transcripts parse-voice receives, formulaic and not.
+DEFAULT_CORPUS = [
+    ('yield_record', 'cow 12 gave 14 litres of milk today'),
+    ('yield_record', 'COW-003 produced 22.5 liters of milk yesterday'),
+    ('yield_record', 'cow 1 gave twenty litres of milk this morning'),
+    ('yield_record', 'cow 4 milk 18 l grade A'),
+    ('yield_record', 'hen 4 laid six eggs'),
+    ('yield_record', 'chicken number 2 laid 1 egg on 3rd October'),
+    ('yield_record', 'CHK-005 gave 2 eggs yesterday'),
+    ('yield_record', 'cow 2 gave 11.5 litres 2 days ago'),
+    ('yield_record', 'milk was good today i think maybe cow five gave something like fourteen'),
+    ('yield_record', 'the jersey in the back pen gave a bucket and a half'),
+    ('feed_record', 'fed cow 3 10 kg of hay at 40 per kg'),
+    ('feed_record', 'gave cow 7 twelve kilos of maize silage yesterday at rs 15 per kg'),
+    ('feed_record', 'cow 2 ate 8 kg of dairy meal'),
+    ('feed_record', 'hen 1 got 0.2 kg of layer mash today'),
+    ('feed_record', 'cow 5 was fed 9 kg of napier grass on monday'),
+    ('feed_record', 'we bought new feed for the herd and gave them all a mix'),
+    ('health', 'vaccinated cow 7 yesterday'),
+    ('health', 'cow 5 is sick with mastitis'),
+    ('health', 'treated cow 4 for foot rot today, recovering'),
+    ('health', 'checkup for cow-002 on 12 october'),
+    ('health', 'hen 3 has a fever'),
+    ('health', 'the vet came and said the herd needs deworming next week'),
+    ('health', 'cow 9 limping since the rain, vet suspects an abscess on the hoof'),
+    ('livestock', 'new cow tag 14 holstein born march 2023 female'),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Run the voice transcript rules over a corpus and report how often '
+        'they answer without the LLM and how much latency that saves'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--corpus',
+            help='JSON lines file of {"form_type": ..., "transcript": ...}; '
+                 'defaults to a built-in sample',
+        )
+        parser.add_argument('--repeat', type=int, default=200)
+        parser.add_argument(
+            '--llm-latency', type=float, default=2.5,
+            help='Assumed seconds per LLM parse when not measuring (default 2.5)',
+        )
+        parser.add_argument(
+            '--measure-llm', type=int, default=0, metavar='N',
+            help='Time N real LLM parses from the corpus instead of assuming',
+        )
+        parser.add_argument('--output', help='Write the JSON report to this file')
+
+    def handle(self, *args, **options):
+        corpus = self.load_corpus(options['corpus'])
+        threshold = settings.VOICE_RULES_MIN_CONFIDENCE
+
+        rows = []
+        for form_type, transcript in corpus:
+            timings = []
+            for _ in range(options['repeat']):
+                start = time.perf_counter()
+                result = parse_transcript(transcript, form_type)
+                timings.append(time.perf_counter() - start)
+            confidence = result.confidence if result else 0.0
+            rows.append({
+                'form_type': form_type,
+                'transcript': transcript,
+                'confidence': confidence,
+                'hit': confidence >= threshold,
+                'rules_ms': round(statistics.median(timings) * 1000, 4),
+                'data': result.data if result else None,
+            })
+
+        llm_seconds = options['llm_latency']
+        measured = None
+        if options['measure_llm']:
+            measured = asyncio.run(self.measure_llm(corpus[: options['measure_llm']]))
+            llm_seconds = statistics.median(measured)
+
+        hits = [row for row in rows if row['hit']]
+        rules_seconds = sum(row['rules_ms'] for row in rows) / 1000
+        report = {
+            'threshold': threshold,
+            'transcripts': len(rows),
+            'hits': len(hits),
+            'hit_rate': round(len(hits) / len(rows), 3) if rows else 0.0,
+            'by_form_type': self.by_form_type(rows),
+            'median_rules_ms': round(statistics.median(row['rules_ms'] for row in rows), 4),
+            'llm_seconds_per_parse': round(llm_seconds, 3),
+            'llm_seconds_measured': measured,
+            # Every transcript pays for the rules; hits skip the LLM call.
+            'seconds_saved': round(len(hits) * llm_seconds - rules_seconds, 3),
+            'rows': rows,
+        }
+
+        self.print_report(report)
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                json.dump(report, fh, indent=2)
+            self.stdout.write(f"Report written to {options['output']}")
+
+    def load_corpus(self, path):
+        if not path:
+            return DEFAULT_CORPUS
+        corpus = []
+        try:
+            with open(path) as fh:
+                for line in fh:
+                    if line.strip():
+                        item = json.loads(line)
+                        corpus.append((item['form_type'], item['transcript']))
+        except (OSError, ValueError, KeyError) as e:
+            raise CommandError(f'Could not read corpus {path}: {e}')
+        return corpus
+
+    async def measure_llm(self, sample):
+        timings = []
+        for form_type, transcript in sample:
+            messages = voice_messages(transcript, form_type)
+            start = time.perf_counter()
+            try:
+                await llm.chat_completion(
+                    messages, parse=_parse_json_object, temperature=0.1,
+                    max_tokens=1000, response_format={'type': 'json_object'},
+                )
+            except llm.LLMError as e:
+                raise CommandError(f'LLM call failed: {e}')
+            timings.append(time.perf_counter() - start)
+        return timings
+
+    def by_form_type(self, rows):
+        summary = {}
+        for row in rows:
+            entry = summary.setdefault(row['form_type'], {'transcripts': 0, 'hits': 0})
+            entry['transcripts'] += 1
+            entry['hits'] += row['hit']
+        return summary
+
+    def print_report(self, report):
+        for row in report['rows']:
+            mark = self.style.SUCCESS('rules') if row['hit'] else self.style.WARNING('llm  ')
+            self.stdout.write(
+                f"{mark} {row['confidence']:.2f} {row['rules_ms']:.3f}ms "
+                f"[{row['form_type']}] {row['transcript']}"
+            )
+        self.stdout.write(self.style.MIGRATE_HEADING('Summary'))
+        for form_type, entry in report['by_form_type'].items():
+            self.stdout.write(f"  {form_type}: {entry['hits']}/{entry['transcripts']} handled by rules")
+        self.stdout.write(
+            f"  hit rate {report['hit_rate']:.0%} at threshold {report['threshold']}, "
+            f"median rules parse {report['median_rules_ms']} ms"
+        )
+        self.stdout.write(
+            f"  LLM parse {report['llm_seconds_per_parse']} s "
+            f"({'measured' if report['llm_seconds_measured'] else 'assumed'}); "
+            f"latency saved over the corpus: {report['seconds_saved']} s"
+        )
@@ -0,0 +1,85 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from livestock.llm import DEFAULT_URL
+from livestock.mock_llm import DEFAULT_REPLY, MockLLMServer
+
+
+class Command(BaseCommand):
+    help = (
+        'Serve a local mock of the chat-completions API (streaming included), '
+        'optionally recording or replaying real exchanges'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--reply', default=DEFAULT_REPLY, help='Text every completion returns')
+        parser.add_argument(
+            '--json-reply', type=json.loads, default=None,
+            help='JSON object returned when response_format is json_object',
+        )
+        parser.add_argument(
+            '--delay', type=float, default=0.05,
+            help='Seconds between streamed tokens (default 0.05)',
+        )
+        parser.add_argument(
+            '--latency', type=float, default=0.0,
+            help='Seconds to wait before answering each request',
+        )
+        parser.add_argument(
+            '--jitter', type=float, default=0.0,
+            help='Extra random wait of up to this many seconds',
+        )
+        parser.add_argument(
+            '--error-rate', type=float, default=0.0,
+            help='Fraction of requests answered with a 500',
+        )
+        parser.add_argument(
+            '--rate-limit-rate', type=float, default=0.0,
+            help='Fraction of requests answered with a 429',
+        )
+        parser.add_argument('--seed', type=int, help='Seed for latency and error injection')
+        parser.add_argument('--fixtures', help='Directory of recorded exchanges')
+        mode = parser.add_mutually_exclusive_group()
+        mode.add_argument(
+            '--record', metavar='URL', nargs='?', const=DEFAULT_URL,
+            help='Forward requests to URL (default: the Groq API) and save them to --fixtures',
+        )
+        mode.add_argument(
+            '--replay', action='store_true',
+            help='Answer only from the exchanges saved in --fixtures',
+        )
+
+    def handle(self, *args, **options):
+        if (options['record'] or options['replay']) and not options['fixtures']:
+            raise CommandError('--record and --replay need --fixtures.')
+        server = MockLLMServer(
+            host=options['host'],
+            port=options['port'],
+            reply=options['reply'],
+            json_reply=options['json_reply'],
+            delay=options['delay'],
+            verbose=True,
+            latency=options['latency'],
+            jitter=options['jitter'],
+            error_rate=options['error_rate'],
+            rate_limit_rate=options['rate_limit_rate'],
+            seed=options['seed'],
+            fixtures=options['fixtures'],
+            record_url=options['record'],
+            replay=options['replay'],
+        )
+        if options['record']:
+            self.stdout.write(f"Recording exchanges with {options['record']} to {options['fixtures']}")
+        elif options['replay']:
+            self.stdout.write(f"Replaying exchanges from {options['fixtures']}")
+        self.stdout.write(f'Mock LLM listening on {server.url}')
+        self.stdout.write(f'Use it with: GROQ_API_URL={server.url} GROQ_API_KEY=test')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,156 @@
+from asgiref.sync import sync_to_async
+from django.core.management.base import BaseCommand, CommandError
+import asyncio
+import json
+import statistics
+import time
+
+from livestock import llm, llm_cache, prompts
+from livestock.models import Livestock
+from livestock.views_llm import InsightRequest, load_amu_history
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate and cache AMU insights ahead of time for animals whose '
+        'health or AMU history changed, so generate_insights answers from cache'
+    )
+
+    # An animal counts as changed when the prompt built from its current
+    # history has no fresh entry in the LLM response cache. Results are
+    # stored as each one finishes, so an interrupted run simply picks up
+    # where it stopped the next time.
+
+    def add_arguments(self, parser):
+        parser.add_argument('--farm', type=int, help='Only this farm id')
+        parser.add_argument(
+            '--all-statuses', action='store_true',
+            help='Include healthy animals (default: sick and recovering only)',
+        )
+        parser.add_argument(
+            '--concurrency', type=int, default=4,
+            help='LLM requests to keep in flight at once (default 4)',
+        )
+        parser.add_argument('--limit', type=int, help='Generate at most this many')
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only report which animals would be generated',
+        )
+        parser.add_argument('--output', help='Write the JSON report to this file')
+
+    def handle(self, *args, **options):
+        if not llm.api_key() and not options['dry_run']:
+            raise CommandError('GROQ_API_KEY is not set.')
+
+        start = time.perf_counter()
+        selected, pending = self.select(options)
+        up_to_date = len(selected) - len(pending)
+        if options['limit'] is not None:
+            pending = pending[: options['limit']]
+        self.stdout.write(
+            f'{len(selected)} animal(s) selected, {up_to_date} up to date, '
+            f'{len(pending)} to generate.'
+        )
+
+        results = {'generated': [], 'failed': [], 'latencies': []}
+        interrupted = False
+        if pending and not options['dry_run']:
+            try:
+                asyncio.run(self.generate(pending, max(1, options['concurrency']), results))
+            except KeyboardInterrupt:
+                interrupted = True
+
+        elapsed = time.perf_counter() - start
+        generated = len(results['generated'])
+        report = {
+            'selected': len(selected),
+            'up_to_date': up_to_date,
+            'pending': len(pending),
+            'generated': generated,
+            'failed': len(results['failed']),
+            'interrupted': interrupted,
+            'elapsed_seconds': round(elapsed, 3),
+            'per_minute': round(generated / elapsed * 60, 2) if elapsed else 0.0,
+            'median_llm_seconds': (
+                round(statistics.median(results['latencies']), 3)
+                if results['latencies'] else None
+            ),
+            'failures': results['failed'],
+            'dry_run': options['dry_run'],
+            'animals': [insight.livestock.tag_id for insight in pending],
+        }
+
+        self.print_report(report)
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                json.dump(report, fh, indent=2)
+            self.stdout.write(f"Report written to {options['output']}")
+
+    def select(self, options):
+        animals = Livestock.objects.order_by('pk')
+        if options['farm']:
+            animals = animals.filter(farm_id=options['farm'])
+        if not options['all_statuses']:
+            animals = animals.filter(health_status__in=('sick', 'recovering'))
+
+        selected = [
+            InsightRequest(livestock, prompts.amu_messages(livestock, load_amu_history(livestock)))
+            for livestock in animals
+        ]
+        fresh = llm_cache.fresh_keys(insight.key for insight in selected)
+        return selected, [insight for insight in selected if insight.key not in fresh]
+
+    async def generate(self, pending, concurrency, results):
+        queue = asyncio.Queue()
+        for insight in pending:
+            queue.put_nowait(insight)
+        stop = asyncio.Event()
+
+        async def worker():
+            while not stop.is_set():
+                try:
+                    insight = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                await self.generate_one(insight, results, stop)
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+    async def generate_one(self, insight, results, stop):
+        tag_id = insight.livestock.tag_id
+        started = time.perf_counter()
+        try:
+            insights = await llm.chat_completion(
+                insight.messages, model=insight.model, **insight.params
+            )
+        except llm.LLMCircuitOpen as e:
+            # The provider is down; stop and leave the rest for the next run.
+            if not stop.is_set():
+                self.stderr.write(f'Stopping: {e}')
+            stop.set()
+            return
+        except llm.LLMError as e:
+            results['failed'].append({'tag_id': tag_id, 'error': str(e)})
+            self.stderr.write(f'{tag_id}: {e}')
+            return
+        results['latencies'].append(time.perf_counter() - started)
+        await sync_to_async(llm_cache.store_response)(insight.key, insight.model, insights)
+        results['generated'].append(tag_id)
+        self.stdout.write(f'{tag_id}: generated')
+
+    def print_report(self, report):
+        self.stdout.write(self.style.MIGRATE_HEADING('Summary'))
+        self.stdout.write(
+            f"  {report['generated']}/{report['pending']} generated, "
+            f"{report['failed']} failed, {report['up_to_date']} already up to date"
+        )
+        median = report['median_llm_seconds']
+        self.stdout.write(
+            f"  {report['elapsed_seconds']} s elapsed, {report['per_minute']} insights/min"
+            + (f", median LLM call {median} s" if median is not None else '')
+        )
+        if report['interrupted'] or report['generated'] + report['failed'] < report['pending']:
+            if not report['dry_run']:
+                self.stdout.write(self.style.WARNING(
+                    '  Run again to finish; completed insights are kept.'
+                ))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from livestock.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Recompute the monthly feed, yield and AMU rollups from the raw records'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--farm', type=int, help='Only rebuild this farm id')
+
+    def handle(self, *args, **options):
+        farm_id = options['farm']
+        scope = f'farm {farm_id}' if farm_id else 'all farms'
+        self.stdout.write(f'Rebuilding rollups for {scope}...')
+        rebuild_rollups(farm_id)
+        self.stdout.write(self.style.SUCCESS('Rollups rebuilt.'))
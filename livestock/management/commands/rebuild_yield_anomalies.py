@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from livestock.anomalies import rebuild_anomalies
+from livestock.models import YieldAnomalyState
+
+
+class Command(BaseCommand):
+    help = 'Recompute the per-animal yield anomaly statistics from the raw yield records'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--farm', type=int, help='Only rebuild this farm id')
+
+    def handle(self, *args, **options):
+        farm_id = options['farm']
+        scope = f'farm {farm_id}' if farm_id else 'all farms'
+        self.stdout.write(f'Rebuilding yield anomaly state for {scope}...')
+        series = rebuild_anomalies(farm_id)
+        flagged = YieldAnomalyState.objects.filter(flagged=True)
+        if farm_id:
+            flagged = flagged.filter(farm_id=farm_id)
+        self.stdout.write(self.style.SUCCESS(
+            f'{series} series rebuilt, {flagged.count()} currently flagged.'
+        ))
@@ -0,0 +1,63 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.core.management.base import BaseCommand
+
+from livestock import llm
+from livestock.jobs import claim_next_job, run_job
+
+
+class Command(BaseCommand):
+    help = 'Process queued AMU insight jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int, default=4,
+            help='Jobs to keep in flight at once (default 4)',
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=1.0,
+            help='Seconds to wait when the queue is empty (default 1)',
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Exit once the queue is empty instead of polling',
+        )
+
+    def handle(self, *args, **options):
+        concurrency = max(1, options['concurrency'])
+        self.stdout.write(f'Processing insight jobs with concurrency {concurrency}...')
+        try:
+            processed = asyncio.run(
+                self.run(concurrency, options['poll_interval'], options['once'])
+            )
+        except KeyboardInterrupt:
+            return
+        self.stdout.write(self.style.SUCCESS(f'Processed {processed} job(s).'))
+
+    async def run(self, concurrency, poll_interval, once):
+        counts = await asyncio.gather(
+            *(self.work(poll_interval, once) for _ in range(concurrency))
+        )
+        return sum(counts)
+
+    async def work(self, poll_interval, once):
+        # Each slot claims, runs and records one job at a time; the LLM calls
+        # of all slots overlap on the shared connection pool.
+        processed = 0
+        while True:
+            job = await sync_to_async(claim_next_job)()
+            if job is None:
+                if once:
+                    return processed
+                await asyncio.sleep(poll_interval)
+                continue
+            await run_job(job)
+            if llm.breaker.state == llm.breaker.OPEN:
+                # The job was requeued; wait for the breaker instead of spinning.
+                if once:
+                    return processed
+                await asyncio.sleep(llm.breaker.reset_timeout)
+                continue
+            processed += 1
+            self.stdout.write(f'Job {job.pk} for livestock {job.livestock_id} done.')
@@ -0,0 +1,87 @@
+from dataclasses import dataclass
+from typing import Optional
+
+from django.contrib.auth import get_user_model
+
+OWNER = "owner"
+LABOURER = "labourer"
+
+
+@dataclass(frozen=True)
+class FarmMembership:
+    """The caller's relationship to a farm, resolved once per request."""
+
+    farm_id: Optional[int] = None
+    role: Optional[str] = None
+    status: Optional[str] = None
+
+    @property
+    def is_owner(self):
+        return self.role == OWNER
+
+    @property
+    def is_approved(self):
+        return self.farm_id is not None and (self.is_owner or self.status == "approved")
+
+    @property
+    def owned_farm_id(self):
+        return self.farm_id if self.is_owner else None
+
+    @property
+    def approved_farm_id(self):
+        """The farm the caller may act on: owned, or joined and approved."""
+        return self.farm_id if self.is_approved else None
+
+
+NO_MEMBERSHIP = FarmMembership()
+
+
+def get_membership(request):
+    """
+    Return the caller's FarmMembership, cached on the request.
+
+    Owner and labourer lookups share one query (two LEFT JOINs from the user
+    row), so permissions, querysets and actions can all consult it freely.
+    """
+    membership = getattr(request, "_farm_membership", None)
+    if membership is None:
+        membership = resolve_membership(request.user)
+        request._farm_membership = membership
+    return membership
+
+
+def resolve_membership(user):
+    if user is None or not user.is_authenticated:
+        return NO_MEMBERSHIP
+    row = (
+        get_user_model()
+        .objects.filter(pk=user.pk)
+        .values(
+            "owned_farm__id",
+            "labourer_profile__id",
+            "labourer_profile__farm_id",
+            "labourer_profile__status",
+        )
+        .first()
+    )
+    if row is None:
+        return NO_MEMBERSHIP
+    if row["owned_farm__id"] is not None:
+        return FarmMembership(farm_id=row["owned_farm__id"], role=OWNER)
+    if row["labourer_profile__id"] is not None:
+        return FarmMembership(
+            farm_id=row["labourer_profile__farm_id"],
+            role=LABOURER,
+            status=row["labourer_profile__status"],
+        )
+    return NO_MEMBERSHIP
+
+
+class FarmScopedQuerysetMixin:
+    """Limits the viewset's ``queryset`` to the caller's farm."""
+
+    def get_queryset(self):
+        farm_id = get_membership(self.request).farm_id
+        if farm_id is None:
+            return self.queryset.none()
+        return self.queryset.filter(farm_id=farm_id)
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.7 on 2026-10-17 00:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('livestock', '0005_feed_feedrecord_price_per_kg_feedrecord_feed'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='feedrecord',
+            index=models.Index(fields=['livestock', 'date'], name='feedrecord_livestock_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='healthrecord',
+            index=models.Index(fields=['livestock', 'event_date'], name='healthrec_livestock_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='yieldrecord',
+            index=models.Index(fields=['livestock', 'date'], name='yieldrecord_livestock_date_idx'),
+        ),
+    ]
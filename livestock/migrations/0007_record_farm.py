@@ -0,0 +1,32 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('livestock', '0006_record_time_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='amurecord',
+            name='farm',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='amu_records', to='livestock.farm'),
+        ),
+        migrations.AddField(
+            model_name='feedrecord',
+            name='farm',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='feed_records', to='livestock.farm'),
+        ),
+        migrations.AddField(
+            model_name='healthrecord',
+            name='farm',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='health_records', to='livestock.farm'),
+        ),
+        migrations.AddField(
+            model_name='yieldrecord',
+            name='farm',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='yield_records', to='livestock.farm'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_record_farm(apps, schema_editor):
+    Livestock = apps.get_model('livestock', 'Livestock')
+    HealthRecord = apps.get_model('livestock', 'HealthRecord')
+    AMURecord = apps.get_model('livestock', 'AMURecord')
+    FeedRecord = apps.get_model('livestock', 'FeedRecord')
+    YieldRecord = apps.get_model('livestock', 'YieldRecord')
+
+    livestock_farm = Subquery(
+        Livestock.objects.filter(pk=OuterRef('livestock_id')).values('farm_id')[:1]
+    )
+    for model in (HealthRecord, FeedRecord, YieldRecord):
+        model.objects.update(farm_id=livestock_farm)
+
+    # Health records are filled in above, so AMU records copy from them.
+    AMURecord.objects.update(
+        farm_id=Subquery(
+            HealthRecord.objects.filter(pk=OuterRef('health_record_id')).values('farm_id')[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('livestock', '0007_record_farm'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_record_farm, migrations.RunPython.noop),
+    ]
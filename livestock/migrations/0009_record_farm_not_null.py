@@ -0,0 +1,44 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('livestock', '0008_backfill_record_farm'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='amurecord',
+            name='farm',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='amu_records', to='livestock.farm'),
+        ),
+        migrations.AlterField(
+            model_name='feedrecord',
+            name='farm',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='feed_records', to='livestock.farm'),
+        ),
+        migrations.AlterField(
+            model_name='healthrecord',
+            name='farm',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='health_records', to='livestock.farm'),
+        ),
+        migrations.AlterField(
+            model_name='yieldrecord',
+            name='farm',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='yield_records', to='livestock.farm'),
+        ),
+        migrations.AddIndex(
+            model_name='feedrecord',
+            index=models.Index(fields=['farm', 'date'], name='feedrecord_farm_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='healthrecord',
+            index=models.Index(fields=['farm', 'event_date'], name='healthrec_farm_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='yieldrecord',
+            index=models.Index(fields=['farm', 'date'], name='yieldrecord_farm_date_idx'),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.7 on 2026-10-17 00:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('livestock', '0009_record_farm_not_null'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AMUMonthlyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='First day of the month')),
+                ('treatments', models.PositiveIntegerField()),
+                ('drug', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='livestock.drug')),
+                ('farm', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='livestock.farm')),
+                ('livestock', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='livestock.livestock')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['livestock', 'month'], name='amurollup_livestock_month_idx'), models.Index(fields=['farm', 'month'], name='amurollup_farm_month_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='FeedMonthlyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='First day of the month')),
+                ('feed_name', models.CharField(max_length=100)),
+                ('total_kg', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('total_spend', models.DecimalField(decimal_places=2, max_digits=16)),
+                ('farm', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='livestock.farm')),
+                ('livestock', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='livestock.livestock')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['farm', 'month'], name='feedrollup_farm_month_idx')],
+                'constraints': [models.UniqueConstraint(fields=('livestock', 'month', 'feed_name'), name='feedrollup_bucket_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='YieldMonthlyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='First day of the month')),
+                ('yield_type', models.CharField(max_length=50)),
+                ('unit', models.CharField(max_length=20)),
+                ('total_quantity', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('farm', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='livestock.farm')),
+                ('livestock', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='livestock.livestock')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['farm', 'month'], name='yieldrollup_farm_month_idx')],
+                'constraints': [models.UniqueConstraint(fields=('livestock', 'month', 'yield_type', 'unit'), name='yieldrollup_bucket_uniq')],
+            },
+        ),
+    ]
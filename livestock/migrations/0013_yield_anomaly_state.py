@@ -0,0 +1,40 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('livestock', '0012_insight_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='YieldAnomalyState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('yield_type', models.CharField(max_length=50)),
+                ('unit', models.CharField(max_length=20)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('mean', models.FloatField(default=0)),
+                ('m2', models.FloatField(default=0)),
+                ('ewma', models.FloatField(default=0)),
+                ('ewm_var', models.FloatField(default=0)),
+                ('last_date', models.DateField(blank=True, null=True)),
+                ('last_quantity', models.FloatField(blank=True, null=True)),
+                ('z_score', models.FloatField(blank=True, null=True)),
+                ('ewma_score', models.FloatField(blank=True, null=True)),
+                ('flagged', models.BooleanField(default=False)),
+                ('flagged_since', models.DateField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('farm', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='livestock.farm')),
+                ('livestock', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='livestock.livestock')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['farm', 'flagged'], name='yieldanomaly_farm_flag_idx')],
+                'constraints': [models.UniqueConstraint(fields=('livestock', 'yield_type'), name='yieldanomaly_series_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('livestock', '0013_yield_anomaly_state'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WithdrawalInterval',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start', models.DateField(help_text='Treatment date')),
+                ('ends_on', models.DateField(help_text='First day products are safe again')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='yieldrecord',
+            name='under_withdrawal',
+            field=models.BooleanField(default=False, help_text='Logged inside a drug withdrawal interval; maintained by livestock.withdrawal'),
+        ),
+        migrations.AddIndex(
+            model_name='yieldrecord',
+            index=models.Index(condition=models.Q(('under_withdrawal', True)), fields=['farm', 'date'], name='yieldrecord_withdrawal_idx'),
+        ),
+        migrations.AddField(
+            model_name='withdrawalinterval',
+            name='amu_record',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='withdrawal_interval', to='livestock.amurecord'),
+        ),
+        migrations.AddField(
+            model_name='withdrawalinterval',
+            name='drug',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='livestock.drug'),
+        ),
+        migrations.AddField(
+            model_name='withdrawalinterval',
+            name='farm',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='livestock.farm'),
+        ),
+        migrations.AddField(
+            model_name='withdrawalinterval',
+            name='livestock',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='withdrawal_intervals', to='livestock.livestock'),
+        ),
+        migrations.AddIndex(
+            model_name='withdrawalinterval',
+            index=models.Index(fields=['farm', 'ends_on', 'start'], name='withdrawal_farm_end_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='withdrawalinterval',
+            index=models.Index(fields=['livestock', 'ends_on', 'start'], name='withdrawal_livestock_end_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('livestock', '0014_withdrawal_intervals'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='amurecord',
+            name='dosage_unit',
+            field=models.CharField(blank=True, max_length=20, null=True),
+        ),
+        migrations.AddField(
+            model_name='amurecord',
+            name='dosage_value',
+            field=models.DecimalField(blank=True, decimal_places=4, max_digits=12, null=True),
+        ),
+    ]
@@ -0,0 +1,105 @@
+import re
+from decimal import Decimal, InvalidOperation
+
+from django.db import migrations
+
+# The parser from livestock.dosage as of this migration, copied so later
+# changes to that module do not change what this migration does.
+PER_KG = '/kg'
+
+UNITS = {}
+for _canonical, _factor, _aliases in [
+    ('ml', '1', ['ml', 'mls', 'millilitre', 'millilitres', 'milliliter', 'milliliters', 'cc', 'cm3']),
+    ('ml', '1000', ['l', 'litre', 'litres', 'liter', 'liters', 'ltr']),
+    ('mg', '1', ['mg', 'mgs', 'milligram', 'milligrams']),
+    ('mg', '1000', ['g', 'gm', 'gms', 'gram', 'grams']),
+    ('mg', '0.001', ['mcg', 'ug', 'µg', 'microgram', 'micrograms']),
+    ('iu', '1', ['iu', 'i.u.', 'unit', 'units', 'u']),
+    ('tablet', '1', ['tablet', 'tablets', 'tab', 'tabs', 'caplet', 'caplets']),
+    ('bolus', '1', ['bolus', 'boluses']),
+    ('dose', '1', ['dose', 'doses']),
+]:
+    for _alias in _aliases:
+        UNITS[_alias] = (_canonical, Decimal(_factor))
+
+_GROUPED = r'[1-9]\d{0,2}(?:,\d{3})+(?![\d,])(?:\.\d+)?'
+_DOSAGE = re.compile(
+    rf'(?<![\d.,])(?P<value>{_GROUPED}|\d+(?:[.,]\d+)?|[.,]\d+)\s*'
+    r'(?P<unit>[a-zµ][a-zµ0-9.]*)?\s*'
+    r'(?P<per_kg>(?:/|per\s+)\s*kg\b(?:\s*(?:bw|b\.w\.|body\s*weight))?)?',
+    re.IGNORECASE,
+)
+
+_PLACES = Decimal('0.0001')
+_MAX_VALUE = Decimal('99999999.9999')
+
+
+def _normalize_unit(unit):
+    text = ' '.join(unit.lower().split())
+    per_kg = False
+    for suffix in ('/kg bw', '/kg', ' per kg'):
+        if text.endswith(suffix):
+            text, per_kg = text[: -len(suffix)].strip(), True
+            break
+    known = UNITS.get(text.rstrip('.'), UNITS.get(text))
+    if known is None:
+        return None
+    return known[0], known[1], per_kg
+
+
+def _reading(match):
+    text = match['value']
+    text = text.replace(',', '') if re.fullmatch(_GROUPED, text) else text.replace(',', '.')
+    try:
+        value = Decimal(text)
+    except InvalidOperation:
+        return None
+    unit = None
+    if match['unit']:
+        normalized = _normalize_unit(match['unit'])
+        if normalized is None:
+            return None
+        unit, factor, per_kg = normalized
+        value *= factor
+        if per_kg or match['per_kg']:
+            unit += PER_KG
+    value = value.quantize(_PLACES)
+    if value > _MAX_VALUE:
+        return None
+    return value, unit
+
+
+def _parse_dosage(text):
+    text = text or ''
+    for match in _DOSAGE.finditer(text):
+        if match['unit'] or match['per_kg']:
+            reading = _reading(match)
+            if reading is not None:
+                return reading
+    match = _DOSAGE.fullmatch(text.strip())
+    if match is not None and not match['unit']:
+        return _reading(match)
+    return None, None
+
+
+def backfill_amu_dosage(apps, schema_editor):
+    AMURecord = apps.get_model('livestock', 'AMURecord')
+    batch = []
+    for record in AMURecord.objects.only('pk', 'dosage').iterator(chunk_size=1000):
+        record.dosage_value, record.dosage_unit = _parse_dosage(record.dosage)
+        batch.append(record)
+        if len(batch) == 1000:
+            AMURecord.objects.bulk_update(batch, ['dosage_value', 'dosage_unit'])
+            batch = []
+    AMURecord.objects.bulk_update(batch, ['dosage_value', 'dosage_unit'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('livestock', '0015_amu_dosage_value'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_amu_dosage, migrations.RunPython.noop),
+    ]
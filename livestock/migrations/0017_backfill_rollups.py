@@ -0,0 +1,105 @@
+from django.db import migrations
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum, Value
+from django.db.models.functions import Coalesce, NullIf, TruncMonth
+
+
+def backfill_rollups(apps, schema_editor):
+    FeedRecord = apps.get_model('livestock', 'FeedRecord')
+    YieldRecord = apps.get_model('livestock', 'YieldRecord')
+    AMURecord = apps.get_model('livestock', 'AMURecord')
+    FeedMonthlyRollup = apps.get_model('livestock', 'FeedMonthlyRollup')
+    YieldMonthlyRollup = apps.get_model('livestock', 'YieldMonthlyRollup')
+    AMUMonthlyRollup = apps.get_model('livestock', 'AMUMonthlyRollup')
+
+    # The same aggregates as livestock.rollups, spelled out here so later
+    # changes to that module do not change what this migration does.
+    price = Coalesce(
+        'price_per_kg',
+        F('feed__cost_per_kg'),
+        Value(0),
+        output_field=DecimalField(max_digits=10, decimal_places=2),
+    )
+    spend = ExpressionWrapper(
+        F('quantity_kg') * price, output_field=DecimalField(max_digits=12, decimal_places=2)
+    )
+    feed_rows = (
+        FeedRecord.objects.annotate(
+            month=TruncMonth('date'),
+            label=Coalesce('feed__name', NullIf('feed_type', Value('')), Value('Unknown')),
+        )
+        .values('farm_id', 'livestock_id', 'month', 'label')
+        .annotate(total_kg=Sum('quantity_kg'), total_spend=Sum(spend))
+        .order_by()
+    )
+    FeedMonthlyRollup.objects.all().delete()
+    FeedMonthlyRollup.objects.bulk_create(
+        (
+            FeedMonthlyRollup(
+                farm_id=row['farm_id'],
+                livestock_id=row['livestock_id'],
+                month=row['month'],
+                feed_name=row['label'],
+                total_kg=row['total_kg'] or 0,
+                total_spend=row['total_spend'] or 0,
+            )
+            for row in feed_rows.iterator()
+        ),
+        batch_size=1000,
+    )
+
+    yield_rows = (
+        YieldRecord.objects.annotate(month=TruncMonth('date'))
+        .values('farm_id', 'livestock_id', 'month', 'yield_type', 'unit')
+        .annotate(total_quantity=Sum('quantity'))
+        .order_by()
+    )
+    YieldMonthlyRollup.objects.all().delete()
+    YieldMonthlyRollup.objects.bulk_create(
+        (
+            YieldMonthlyRollup(
+                farm_id=row['farm_id'],
+                livestock_id=row['livestock_id'],
+                month=row['month'],
+                yield_type=row['yield_type'],
+                unit=row['unit'],
+                total_quantity=row['total_quantity'] or 0,
+            )
+            for row in yield_rows.iterator()
+        ),
+        batch_size=1000,
+    )
+
+    amu_rows = (
+        AMURecord.objects.annotate(
+            livestock_id=F('health_record__livestock_id'),
+            month=TruncMonth('health_record__event_date'),
+        )
+        .values('farm_id', 'livestock_id', 'month', 'drug_id')
+        .annotate(treatments=Count('id'))
+        .order_by()
+    )
+    AMUMonthlyRollup.objects.all().delete()
+    AMUMonthlyRollup.objects.bulk_create(
+        (
+            AMUMonthlyRollup(
+                farm_id=row['farm_id'],
+                livestock_id=row['livestock_id'],
+                month=row['month'],
+                drug_id=row['drug_id'],
+                treatments=row['treatments'],
+            )
+            for row in amu_rows.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('livestock', '0016_backfill_amu_dosage'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
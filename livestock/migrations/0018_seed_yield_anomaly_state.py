@@ -0,0 +1,85 @@
+import math
+from itertools import groupby
+
+from django.db import migrations
+
+# The scoring from livestock.anomalies as of this migration, copied so later
+# changes to that module do not change what this migration does.
+MIN_HISTORY = 7
+Z_THRESHOLD = 3.0
+EWMA_ALPHA = 0.2
+EWMA_THRESHOLD = 3.0
+MIN_RELATIVE_STD = 0.05
+
+
+def _score(value, mean, variance):
+    std = max(math.sqrt(max(variance, 0.0)), MIN_RELATIVE_STD * abs(mean), 1e-9)
+    return (value - mean) / std
+
+
+def _observe(state, value, day):
+    z_score = ewma_score = None
+    if state.count >= MIN_HISTORY:
+        z_score = _score(value, state.mean, state.m2 / (state.count - 1))
+        ewma_score = _score(value, state.ewma, state.ewm_var)
+    anomalous = (z_score is not None and abs(z_score) >= Z_THRESHOLD) or (
+        ewma_score is not None and abs(ewma_score) >= EWMA_THRESHOLD
+    )
+
+    state.count += 1
+    delta = value - state.mean
+    state.mean += delta / state.count
+    state.m2 += delta * (value - state.mean)
+    if state.count == 1:
+        state.ewma, state.ewm_var = value, 0.0
+    else:
+        diff = value - state.ewma
+        increment = EWMA_ALPHA * diff
+        state.ewma += increment
+        state.ewm_var = (1 - EWMA_ALPHA) * (state.ewm_var + diff * increment)
+
+    state.last_date = day
+    state.last_quantity = value
+    state.z_score = z_score
+    state.ewma_score = ewma_score
+    if anomalous:
+        state.flagged_since = state.flagged_since if state.flagged else day
+        state.flagged = True
+    else:
+        state.flagged = False
+        state.flagged_since = None
+
+
+def seed_yield_anomaly_state(apps, schema_editor):
+    YieldRecord = apps.get_model('livestock', 'YieldRecord')
+    YieldAnomalyState = apps.get_model('livestock', 'YieldAnomalyState')
+
+    # One pass over the records in series order, replaying each series.
+    records = (
+        YieldRecord.objects.order_by('livestock_id', 'yield_type', 'date', 'pk')
+        .values_list('livestock_id', 'yield_type', 'farm_id', 'unit', 'quantity', 'date')
+        .iterator(chunk_size=1000)
+    )
+    YieldAnomalyState.objects.all().delete()
+    batch = []
+    for (livestock_id, yield_type), readings in groupby(records, key=lambda row: row[:2]):
+        state = YieldAnomalyState(livestock_id=livestock_id, yield_type=yield_type)
+        for _, _, farm_id, unit, quantity, day in readings:
+            state.farm_id, state.unit = farm_id, unit
+            _observe(state, float(quantity), day)
+        batch.append(state)
+        if len(batch) == 1000:
+            YieldAnomalyState.objects.bulk_create(batch)
+            batch = []
+    YieldAnomalyState.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('livestock', '0017_backfill_rollups'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_yield_anomaly_state, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,61 @@
+from datetime import timedelta
+
+from django.db import migrations
+from django.db.models import Exists, OuterRef
+
+
+def backfill_withdrawal_intervals(apps, schema_editor):
+    AMURecord = apps.get_model('livestock', 'AMURecord')
+    WithdrawalInterval = apps.get_model('livestock', 'WithdrawalInterval')
+    YieldRecord = apps.get_model('livestock', 'YieldRecord')
+
+    # One interval per treatment with a withdrawal period, covering
+    # [event_date, event_date + period), as livestock.withdrawal keeps them.
+    rows = (
+        AMURecord.objects.filter(withdrawal_period__gt=0)
+        .values_list(
+            'pk',
+            'farm_id',
+            'drug_id',
+            'withdrawal_period',
+            'health_record__livestock_id',
+            'health_record__event_date',
+        )
+        .iterator(chunk_size=1000)
+    )
+    WithdrawalInterval.objects.all().delete()
+    WithdrawalInterval.objects.bulk_create(
+        (
+            WithdrawalInterval(
+                amu_record_id=pk,
+                farm_id=farm_id,
+                drug_id=drug_id,
+                livestock_id=livestock_id,
+                start=event_date,
+                ends_on=event_date + timedelta(days=period),
+            )
+            for pk, farm_id, drug_id, period, livestock_id, event_date in rows
+        ),
+        batch_size=1000,
+    )
+
+    YieldRecord.objects.update(
+        under_withdrawal=Exists(
+            WithdrawalInterval.objects.filter(
+                livestock_id=OuterRef('livestock_id'),
+                ends_on__gt=OuterRef('date'),
+                start__lte=OuterRef('date'),
+            )
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('livestock', '0018_seed_yield_anomaly_state'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_withdrawal_intervals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,260 @@
+"""
+A local stand-in for the OpenAI-compatible chat-completions API.
+
+Point ``GROQ_API_URL`` at it (any ``GROQ_API_KEY`` is accepted) to exercise
+the LLM endpoints, including token streaming, without network access. Run it
+with ``manage.py mock_llm_server`` or start ``MockLLMServer`` from a script.
+
+Latency (``latency`` plus up to ``jitter`` seconds before answering, then
+``delay`` per word) and injected failures (``error_rate`` 500s and
+``rate_limit_rate`` 429s) are configurable. With ``record_url`` every request
+is forwarded to the real API and the answer saved under ``fixtures``; with
+``replay`` answers come only from those fixtures, so benchmarks see real
+model output without the network.
+"""
+
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+
+DEFAULT_REPLY = (
+    "Dosages are within the recommended range for this animal's weight. "
+    "Keep recording treatments and review again after the withdrawal period."
+)
+DEFAULT_JSON_REPLY = {"tag_id": "COW-001", "species": "cow"}
+
+
+def fixture_key(body):
+    """Hash of a request body, ignoring whether it asked to stream."""
+    request = {k: v for k, v in body.items() if k != "stream"}
+    canonical = json.dumps(request, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self.send_error(404)
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self.send_error(400, "Invalid JSON")
+            return
+
+        started = time.perf_counter()
+        self.server.track(+1)
+        try:
+            self._respond(body)
+        finally:
+            self.server.track(-1, time.perf_counter() - started)
+
+    def _respond(self, body):
+        server = self.server
+        pause = server.latency + server.rng_uniform(0, server.jitter)
+        if pause:
+            time.sleep(pause)
+
+        roll = server.rng_uniform(0, 1)
+        if roll < server.error_rate:
+            self._error(500, "Injected server error")
+            return
+        if roll < server.error_rate + server.rate_limit_rate:
+            self._error(429, "Injected rate limit", {"Retry-After": "1"})
+            return
+
+        if server.record_url:
+            reply = self._record(body)
+        elif server.replay:
+            reply = server.load_fixture(body)
+            if reply is None:
+                self._error(404, "No recorded response for this request")
+                return
+        elif body.get("response_format", {}).get("type") == "json_object":
+            reply = json.dumps(server.json_reply)
+        else:
+            reply = server.reply
+        if reply is None:
+            return
+
+        if body.get("stream"):
+            self._stream(body, reply)
+        else:
+            self._complete(body, reply)
+
+    def _record(self, body):
+        """Answer from the real API and save the exchange; None if it failed."""
+        upstream = {k: v for k, v in body.items() if k != "stream"}
+        try:
+            response = httpx.post(
+                self.server.record_url,
+                json=upstream,
+                headers={"Authorization": self.headers.get("Authorization", "")},
+                timeout=60,
+            )
+        except httpx.HTTPError as e:
+            self._error(502, f"Upstream request failed: {e}")
+            return None
+        if response.status_code != 200:
+            self._error(response.status_code, response.text[:500])
+            return None
+        content = response.json()["choices"][0]["message"]["content"]
+        self.server.save_fixture(body, content)
+        return content
+
+    def _error(self, status, message, headers=None):
+        payload = json.dumps({"error": {"message": message}}).encode()
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _complete(self, body, reply):
+        payload = json.dumps(
+            {
+                "object": "chat.completion",
+                "model": body.get("model"),
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": reply},
+                        "finish_reason": "stop",
+                    }
+                ],
+            }
+        ).encode()
+        time.sleep(self.server.delay * len(reply.split()))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _stream(self, body, reply):
+        # No Content-Length: the body ends when the connection closes.
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        words = reply.split(" ")
+        for i, word in enumerate(words):
+            token = word if i == len(words) - 1 else word + " "
+            chunk = {
+                "object": "chat.completion.chunk",
+                "model": body.get("model"),
+                "choices": [{"index": 0, "delta": {"content": token}}],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+            time.sleep(self.server.delay)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+        self.close_connection = True
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class MockLLMServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        host="127.0.0.1",
+        port=0,
+        reply=DEFAULT_REPLY,
+        json_reply=None,
+        delay=0.0,
+        verbose=False,
+        latency=0.0,
+        jitter=0.0,
+        error_rate=0.0,
+        rate_limit_rate=0.0,
+        seed=None,
+        fixtures=None,
+        record_url=None,
+        replay=False,
+    ):
+        if (record_url or replay) and not fixtures:
+            raise ValueError("Recording and replay need a fixtures directory.")
+        super().__init__((host, port), _Handler)
+        self.reply = reply
+        self.json_reply = DEFAULT_JSON_REPLY if json_reply is None else json_reply
+        self.delay = delay
+        self.verbose = verbose
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.fixtures = fixtures
+        self.record_url = record_url
+        self.replay = replay
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def rng_uniform(self, low, high):
+        with self._lock:
+            return self._rng.uniform(low, high)
+
+    def reset_stats(self):
+        with self._lock:
+            self.requests = 0
+            self.in_flight = 0
+            self.max_in_flight = 0
+            self.service_times = []
+
+    def track(self, change, service_time=None):
+        with self._lock:
+            self.in_flight += change
+            if change > 0:
+                self.requests += 1
+                self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            if service_time is not None:
+                self.service_times.append(service_time)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "in_flight": self.in_flight,
+                "max_in_flight": self.max_in_flight,
+                "service_times": list(self.service_times),
+            }
+
+    def _fixture_path(self, body):
+        return os.path.join(self.fixtures, f"{fixture_key(body)}.json")
+
+    def load_fixture(self, body):
+        try:
+            with open(self._fixture_path(body)) as fh:
+                return json.load(fh)["content"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def save_fixture(self, body, content):
+        os.makedirs(self.fixtures, exist_ok=True)
+        request = {k: v for k, v in body.items() if k != "stream"}
+        with open(self._fixture_path(body), "w") as fh:
+            json.dump({"request": request, "content": content}, fh, indent=2)
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/openai/v1/chat/completions"
+
+    def start(self):
+        """Serve from a daemon thread and return self."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
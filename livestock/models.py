@@ -63,6 +63,24 @@ class Livestock(models.Model):
         return f"{self.species} - {self.tag_id}"
 
 
+class FarmScopedMixin:
+    """
+    Records carry a copy of their animal's ``farm`` so tenant scoping and
+    permission checks filter on one indexed column instead of joining
+    through livestock. It is refreshed from ``farm_source`` on every save;
+    bulk writes must call ``sync_farm()`` themselves.
+    """
+
+    farm_source = "livestock"
+
+    def sync_farm(self):
+        self.farm_id = getattr(self, self.farm_source).farm_id
+
+    def save(self, *args, **kwargs):
+        self.sync_farm()
+        super().save(*args, **kwargs)
+
+
 class Drug(models.Model):
     name = models.CharField(max_length=100, unique=True)
     active_ingredient = models.CharField(max_length=100, blank=True, null=True)
@@ -89,13 +107,16 @@ class Feed(models.Model):
         return self.name
 
 
-class HealthRecord(models.Model):
+class HealthRecord(FarmScopedMixin, models.Model):
     EVENT_CHOICES = [
         ("vaccination", "Vaccination"),
         ("sickness", "Sickness"),
         ("check-up", "Check-up"),
         ("treatment", "Treatment"),
     ]
+    farm = models.ForeignKey(
+        Farm, related_name="health_records", on_delete=models.CASCADE, db_index=False
+    )
     livestock = models.ForeignKey(
         Livestock, related_name="health_records", on_delete=models.CASCADE
     )
@@ -107,11 +128,29 @@ class HealthRecord(models.Model):
         max_length=20, blank=True, null=True
     )
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["livestock", "event_date"], name="healthrec_livestock_date_idx"
+            ),
+            models.Index(fields=["farm", "event_date"], name="healthrec_farm_date_idx"),
+        ]
+
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        super().save(*args, **kwargs)
+        if not adding:
+            # Keep the AMU records' copy in step if the record moved farms.
+            self.amu_records.exclude(farm_id=self.farm_id).update(farm_id=self.farm_id)
+
     def __str__(self):
         return f"{self.event_type} for {self.livestock.tag_id} on {self.event_date}"
 
 
-class AMURecord(models.Model):
+class AMURecord(FarmScopedMixin, models.Model):
+    farm_source = "health_record"
+
+    farm = models.ForeignKey(Farm, related_name="amu_records", on_delete=models.CASCADE)
     health_record = models.ForeignKey(
         HealthRecord, related_name="amu_records", on_delete=models.CASCADE
     )
@@ -123,6 +162,9 @@ class AMURecord(models.Model):
         blank=True,  
     )
     dosage = models.CharField(max_length=50)
+    # Parsed from ``dosage`` on save, in a canonical unit; see livestock.dosage.
+    dosage_value = models.DecimalField(max_digits=12, decimal_places=4, null=True, blank=True)
+    dosage_unit = models.CharField(max_length=20, blank=True, null=True)
     withdrawal_period = models.PositiveIntegerField(
         help_text="Days until livestock product is safe for consumption"
     )
@@ -131,7 +173,10 @@ class AMURecord(models.Model):
         return f"Drug: {self.drug.name if self.drug else 'N/A'} for Health Record ID: {self.health_record.id}"
 
 
-class FeedRecord(models.Model):
+class FeedRecord(FarmScopedMixin, models.Model):
+    farm = models.ForeignKey(
+        Farm, related_name="feed_records", on_delete=models.CASCADE, db_index=False
+    )
     livestock = models.ForeignKey(
         Livestock, related_name="feed_records", on_delete=models.CASCADE
     )
@@ -147,11 +192,22 @@ class FeedRecord(models.Model):
     price_per_kg = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     date = models.DateField()
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["livestock", "date"], name="feedrecord_livestock_date_idx"
+            ),
+            models.Index(fields=["farm", "date"], name="feedrecord_farm_date_idx"),
+        ]
+
     def __str__(self):
         return f"{self.quantity_kg}kg of {self.feed_type} for {self.livestock.tag_id}"
 
 
-class YieldRecord(models.Model):
+class YieldRecord(FarmScopedMixin, models.Model):
+    farm = models.ForeignKey(
+        Farm, related_name="yield_records", on_delete=models.CASCADE, db_index=False
+    )
     livestock = models.ForeignKey(
         Livestock, related_name="yield_records", on_delete=models.CASCADE
     )
@@ -159,7 +215,218 @@ class YieldRecord(models.Model):
     quantity = models.DecimalField(max_digits=7, decimal_places=2)
     unit = models.CharField(max_length=20, help_text="e.g., Liters, Units")
     date = models.DateField()
+    under_withdrawal = models.BooleanField(
+        default=False,
+        help_text="Logged inside a drug withdrawal interval; maintained by livestock.withdrawal",
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["livestock", "date"], name="yieldrecord_livestock_date_idx"
+            ),
+            models.Index(fields=["farm", "date"], name="yieldrecord_farm_date_idx"),
+            models.Index(
+                fields=["farm", "date"],
+                condition=models.Q(under_withdrawal=True),
+                name="yieldrecord_withdrawal_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.quantity} {self.unit} of {self.yield_type} from {self.livestock.tag_id}"
 
+
+
+class WithdrawalInterval(models.Model):
+    """
+    Days an animal's products are unsafe after a treatment, from ``start`` up
+    to but not including ``ends_on``; one per AMURecord with a withdrawal
+    period, maintained by livestock.withdrawal.
+    """
+
+    farm = models.ForeignKey(Farm, related_name="+", on_delete=models.CASCADE)
+    livestock = models.ForeignKey(
+        Livestock, related_name="withdrawal_intervals", on_delete=models.CASCADE
+    )
+    amu_record = models.OneToOneField(
+        AMURecord, related_name="withdrawal_interval", on_delete=models.CASCADE
+    )
+    drug = models.ForeignKey(
+        Drug, related_name="+", on_delete=models.CASCADE, null=True, blank=True
+    )
+    start = models.DateField(help_text="Treatment date")
+    ends_on = models.DateField(help_text="First day products are safe again")
+
+    class Meta:
+        indexes = [
+            # "Under withdrawal on D" is ends_on > D and start <= D; almost
+            # every interval ends in the past, so ends_on leads.
+            models.Index(fields=["farm", "ends_on", "start"], name="withdrawal_farm_end_idx"),
+            models.Index(
+                fields=["livestock", "ends_on", "start"], name="withdrawal_livestock_end_idx"
+            ),
+        ]
+
+
+class FeedMonthlyRollup(models.Model):
+    """Feed spend per animal, month and feed; maintained by livestock.rollups."""
+
+    farm = models.ForeignKey(Farm, related_name="+", on_delete=models.CASCADE)
+    livestock = models.ForeignKey(Livestock, related_name="+", on_delete=models.CASCADE)
+    month = models.DateField(help_text="First day of the month")
+    feed_name = models.CharField(max_length=100)
+    total_kg = models.DecimalField(max_digits=14, decimal_places=2)
+    total_spend = models.DecimalField(max_digits=16, decimal_places=2)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["livestock", "month", "feed_name"], name="feedrollup_bucket_uniq"
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["farm", "month"], name="feedrollup_farm_month_idx"),
+        ]
+
+
+class YieldMonthlyRollup(models.Model):
+    """Yield per animal, month, yield type and unit; maintained by livestock.rollups."""
+
+    farm = models.ForeignKey(Farm, related_name="+", on_delete=models.CASCADE)
+    livestock = models.ForeignKey(Livestock, related_name="+", on_delete=models.CASCADE)
+    month = models.DateField(help_text="First day of the month")
+    yield_type = models.CharField(max_length=50)
+    unit = models.CharField(max_length=20)
+    total_quantity = models.DecimalField(max_digits=14, decimal_places=2)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["livestock", "month", "yield_type", "unit"],
+                name="yieldrollup_bucket_uniq",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["farm", "month"], name="yieldrollup_farm_month_idx"),
+        ]
+
+
+class AMUMonthlyRollup(models.Model):
+    """Treatment counts per animal, month and drug; maintained by livestock.rollups."""
+
+    farm = models.ForeignKey(Farm, related_name="+", on_delete=models.CASCADE)
+    livestock = models.ForeignKey(Livestock, related_name="+", on_delete=models.CASCADE)
+    month = models.DateField(help_text="First day of the month")
+    drug = models.ForeignKey(
+        Drug, related_name="+", on_delete=models.CASCADE, null=True, blank=True
+    )
+    treatments = models.PositiveIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["livestock", "month"], name="amurollup_livestock_month_idx"),
+            models.Index(fields=["farm", "month"], name="amurollup_farm_month_idx"),
+        ]
+
+
+class YieldAnomalyState(models.Model):
+    """
+    Running yield statistics per animal and yield type, and whether the
+    latest reading was an excursion; maintained by livestock.anomalies.
+    """
+
+    farm = models.ForeignKey(Farm, related_name="+", on_delete=models.CASCADE)
+    livestock = models.ForeignKey(Livestock, related_name="+", on_delete=models.CASCADE)
+    yield_type = models.CharField(max_length=50)
+    unit = models.CharField(max_length=20)
+    # Welford's running mean and sum of squared deviations.
+    count = models.PositiveIntegerField(default=0)
+    mean = models.FloatField(default=0)
+    m2 = models.FloatField(default=0)
+    ewma = models.FloatField(default=0)
+    ewm_var = models.FloatField(default=0)
+    last_date = models.DateField(null=True, blank=True)
+    last_quantity = models.FloatField(null=True, blank=True)
+    # Scores of the latest reading against the statistics before it.
+    z_score = models.FloatField(null=True, blank=True)
+    ewma_score = models.FloatField(null=True, blank=True)
+    flagged = models.BooleanField(default=False)
+    flagged_since = models.DateField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["livestock", "yield_type"], name="yieldanomaly_series_uniq"
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["farm", "flagged"], name="yieldanomaly_farm_flag_idx"),
+        ]
+
+
+class LLMResponseCache(models.Model):
+    """Generated LLM output keyed by a hash of its inputs; maintained by livestock.llm_cache."""
+
+    key = models.CharField(max_length=64, unique=True)
+    model_name = models.CharField(max_length=100)
+    response = models.TextField()
+    created_at = models.DateTimeField()
+    last_used_at = models.DateTimeField()
+    hits = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["last_used_at"], name="llmcache_last_used_idx"),
+        ]
+
+
+class InsightJob(models.Model):
+    """A queued AMU insight generation; processed by the run_insight_jobs command."""
+
+    STATUS_CHOICES = [
+        ("queued", "Queued"),
+        ("running", "Running"),
+        ("succeeded", "Succeeded"),
+        ("failed", "Failed"),
+    ]
+    IN_FLIGHT = ("queued", "running")
+
+    farm = models.ForeignKey(Farm, related_name="insight_jobs", on_delete=models.CASCADE)
+    livestock = models.ForeignKey(
+        Livestock, related_name="insight_jobs", on_delete=models.CASCADE
+    )
+    requested_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        related_name="+",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+    )
+    cache_key = models.CharField(max_length=64)
+    model_name = models.CharField(max_length=100)
+    request = models.JSONField(help_text="Chat messages and sampling parameters")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="queued")
+    attempts = models.PositiveSmallIntegerField(default=0)
+    result = models.TextField(blank=True, null=True)
+    error = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        constraints = [
+            # Identical requests coalesce onto the one job still in flight.
+            models.UniqueConstraint(
+                fields=["cache_key"],
+                condition=models.Q(status__in=["queued", "running"]),
+                name="insightjob_inflight_key_uniq",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["status", "created_at"], name="insightjob_status_idx"),
+        ]
+
+    def __str__(self):
+        return f"Insight job {self.pk} for {self.livestock_id} ({self.status})"
@@ -0,0 +1,208 @@
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+from urllib.parse import parse_qs, urlencode, urlsplit, urlunsplit
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import BooleanField, F, Func, Q, Value
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+
+
+class RowComparison(Func):
+    """
+    `(a, b) < (x, y)` as one SQL row-value comparison.
+
+    Unlike the equivalent `a < x OR (a = x AND b < y)`, a row comparison is
+    an index range bound, so the database seeks straight to the boundary row.
+    """
+
+    output_field = BooleanField()
+
+    def __init__(self, columns, values, operator):
+        self.operator = operator
+        self.width = len(columns)
+        super().__init__(*columns, *values)
+
+    def as_sql(self, compiler, connection, **extra_context):
+        sqls, params = [], []
+        for expression in self.source_expressions:
+            sql, expression_params = compiler.compile(expression)
+            sqls.append(sql)
+            params.extend(expression_params)
+        columns, values = sqls[: self.width], sqls[self.width :]
+        return f"({', '.join(columns)}) {self.operator} ({', '.join(values)})", params
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination keyed on every column of the view's `ordering`.
+
+    DRF's CursorPagination only keys on the first ordering field and skips
+    ties with an offset, so a day with hundreds of records still has to be
+    scanned. Here the cursor holds the full ordering tuple of the boundary
+    row, e.g. (date, id), and the next page is a plain
+    `WHERE (date, id) < (d, i) ORDER BY date DESC, id DESC LIMIT n`, which
+    costs the same however deep the client scrolls.
+    """
+
+    cursor_query_param = "cursor"
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 500
+    ordering = ("-id",)
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = tuple(getattr(view, "ordering", None) or self.ordering)
+        position, reverse = self.decode_cursor(request, queryset.model)
+
+        ordering = self._flip(self.ordering) if reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self._after(position, ordering))
+
+        results = list(queryset[: self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[: self.page_size]
+        if reverse:
+            results.reverse()
+
+        if reverse:
+            self.has_next = position is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+
+        self.first_position = self._position(results[0]) if results else None
+        self.last_position = self._position(results[-1]) if results else None
+        return results
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                "next": self.get_next_link(),
+                "previous": self.get_previous_link(),
+                "results": data,
+            }
+        )
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        if self.page_size_query_param:
+            try:
+                size = int(request.query_params[self.page_size_query_param])
+                if size > 0:
+                    return min(size, self.max_page_size)
+            except (KeyError, ValueError):
+                pass
+        return self.page_size
+
+    def get_next_link(self):
+        if not self.has_next or self.last_position is None:
+            return None
+        return self.encode_cursor(self.last_position, reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or self.first_position is None:
+            return None
+        return self.encode_cursor(self.first_position, reverse=True)
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode("ascii")))
+            position = payload["p"]
+            reverse = bool(payload.get("r", False))
+        except (TypeError, ValueError, KeyError, UnicodeEncodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        fields = [self._field(model, name) for name in self.ordering]
+        try:
+            position = [field.to_python(value) for field, value in zip(fields, position)]
+        except (ValidationError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if any(value is None for value in position):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def encode_cursor(self, position, reverse):
+        payload = json.dumps({"p": position, "r": reverse}, separators=(",", ":"))
+        encoded = base64.urlsafe_b64encode(payload.encode("ascii")).decode("ascii")
+
+        url = self.request.build_absolute_uri()
+        scheme, netloc, path, query, fragment = urlsplit(url)
+        params = parse_qs(query, keep_blank_values=True)
+        params[self.cursor_query_param] = [encoded]
+        return urlunsplit((scheme, netloc, path, urlencode(params, doseq=True), fragment))
+
+    def _position(self, obj):
+        position = []
+        for field in self.ordering:
+            value = obj
+            for attr in field.lstrip("-").split("__"):
+                value = getattr(value, attr)
+            if isinstance(value, (date, datetime)):
+                value = value.isoformat()
+            elif isinstance(value, Decimal):
+                value = str(value)
+            position.append(value)
+        return position
+
+    @staticmethod
+    def _field(model, name):
+        """The model field an ordering entry such as "-health_record__event_date" names."""
+        *relations, attname = name.lstrip("-").split("__")
+        for relation in relations:
+            model = model._meta.get_field(relation).related_model
+        try:
+            return model._meta.get_field(attname)
+        except FieldDoesNotExist:
+            # "id" on a model whose primary key is named otherwise.
+            if attname in ("id", "pk"):
+                return model._meta.pk
+            raise
+
+    def _after(self, position, ordering):
+        names = [field.lstrip("-") for field in ordering]
+        descending = {field.startswith("-") for field in ordering}
+        if len(descending) == 1:
+            # Every column sorts the same way: one row comparison the index
+            # can seek on, e.g. (date, id) < (d, i).
+            operator = "<" if descending.pop() else ">"
+            return RowComparison(
+                [F(name) for name in names], [Value(value) for value in position], operator
+            )
+        # Mixed directions have no row-value form:
+        # (a, b, c) > (x, y, z)  ==  a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z)
+        clauses = []
+        for i, field in enumerate(ordering):
+            name = field.lstrip("-")
+            lookup = "lt" if field.startswith("-") else "gt"
+            equal = {f.lstrip("-"): position[j] for j, f in enumerate(ordering[:i])}
+            clauses.append(Q(**equal, **{f"{name}__{lookup}": position[i]}))
+        return reduce(or_, clauses)
+
+    @staticmethod
+    def _flip(ordering):
+        return tuple(f[1:] if f.startswith("-") else f"-{f}" for f in ordering)
@@ -1,5 +1,6 @@
 from rest_framework.permissions import BasePermission, SAFE_METHODS
-from .models import Farm, Livestock, HealthRecord, AMURecord, FeedRecord, YieldRecord
+from .membership import get_membership
+from .models import Farm
 
 class IsFarmOwner(BasePermission):
     """
@@ -8,7 +9,7 @@ class IsFarmOwner(BasePermission):
     """
     def has_object_permission(self, request, view, obj):
         if isinstance(obj, Farm):
-            return obj.owner == request.user
+            return get_membership(request).owned_farm_id == obj.pk
         return False
 
 class IsFarmMember(BasePermission):
@@ -28,29 +29,24 @@ class IsFarmMember(BasePermission):
         return True
 
     def has_object_permission(self, request, view, obj):
-        user = request.user
-        farm = self._get_farm_from_obj(obj)
+        membership = get_membership(request)
+        farm_id = self._get_farm_id(obj)
 
-        if not farm:
+        if not farm_id or farm_id != membership.farm_id:
             return False
 
         # Farm owner has full permissions
-        if farm.owner == user:
+        if membership.is_owner:
             return True
 
-        # Check for approved labourer status
-        try:
-            is_approved_labourer = (
-                user.labourer_profile.farm == farm and
-                user.labourer_profile.status == 'approved'
-            )
-        except AttributeError: # Catches if user has no labourer_profile
-            is_approved_labourer = False
-
-        if not is_approved_labourer:
+        # Labourers must have been approved
+        if not membership.is_approved:
             return False
 
-        # Labourer permissions
+        return self.labourer_has_permission(request, view)
+
+    def labourer_has_permission(self, request, view):
+        """Labourer rules, shared with the bulk endpoints that have no single object."""
         viewset_name = view.__class__.__name__
 
         # Labourers can do anything on Feed and Yield records except delete
@@ -65,11 +61,9 @@ class IsFarmMember(BasePermission):
 
         return False
 
-    def _get_farm_from_obj(self, obj):
+    def _get_farm_id(self, obj):
+        # Livestock, labourers and every record type carry farm_id directly,
+        # so this never needs to load a related row.
         if isinstance(obj, Farm):
-            return obj
-        if hasattr(obj, 'farm') and obj.farm is not None:
-            return obj.farm
-        if hasattr(obj, 'livestock') and obj.livestock.farm is not None:
-            return obj.livestock.farm
-        return None
\ No newline at end of file
+            return obj.pk
+        return getattr(obj, 'farm_id', None)
@@ -0,0 +1,350 @@
+"""
+Prompt templates for the LLM endpoints, compiled once at import.
+
+Records go into prompts as compact pipe-separated tables rather than
+serializer dumps, and AMU history is trimmed newest-first to
+``LLM_PROMPT_TOKEN_BUDGET`` estimated tokens, so prompt size (and with it
+latency and cost) stays bounded however long an animal's history grows.
+"""
+
+from string import Template
+
+from django.conf import settings
+
+from .dosage import check_amu
+
+# Rough size of a token for English text and numbers; close enough to budget
+# with and far cheaper than running a tokenizer on every request.
+CHARS_PER_TOKEN = 4
+
+# Most health records read from the database for one prompt; the token
+# budget usually stops well before this.
+HISTORY_LIMIT = 50
+
+NOTES_WIDTH = 80
+
+FORM_FIELDS = {
+    "livestock": {
+        "description": """
+- tag_id: Animal identification tag/ID
+- species: Animal species (cow, buffalo, goat, sheep, chicken, pig)
+- breed: Animal breed name
+- gender: Gender (M for male, F for female)
+- health_status: Health status (healthy, sick, recovering)
+- current_weight_kg: Weight in kilograms
+- date_of_birth: Birth date in YYYY-MM-DD format
+        """,
+        "fields": """
+- tag_id: String (required) - Animal identification
+- species: String (required) - Animal species
+- breed: String (required) - Animal breed
+- gender: String (required) - M or F
+- health_status: String (required) - healthy, sick, or recovering
+- current_weight_kg: Decimal (optional) - Weight in kg
+- date_of_birth: Date (required) - Birth date
+        """,
+        "example": '{\n  "tag_id": "COW-001",\n  "species": "cow",\n  "breed": "Holstein",\n  "gender": "F",\n  "health_status": "healthy",\n  "current_weight_kg": 500,\n  "date_of_birth": "2023-01-15"\n}',
+    },
+    "health": {
+        "description": """
+- livestock: Livestock ID or tag
+- event_type: Event type (vaccination, sickness, check-up, treatment)
+- event_date: Event date in YYYY-MM-DD format
+- notes: Additional notes
+- diagnosis: Medical diagnosis
+- treatment_outcome: Treatment outcome (recovered, ongoing, completed)
+        """,
+        "fields": """
+- livestock: String (required) - Livestock ID
+- event_type: String (required) - vaccination, sickness, check-up, treatment
+- event_date: Date (required) - Event date
+- notes: String (optional) - Additional notes
+- diagnosis: String (optional) - Medical diagnosis
+- treatment_outcome: String (optional) - Treatment outcome
+        """,
+        "example": '{\n  "livestock": "COW-001",\n  "event_type": "vaccination",\n  "event_date": "2024-01-15",\n  "notes": "Routine vaccination",\n  "diagnosis": "Preventive care",\n  "treatment_outcome": "completed"\n}',
+    },
+    "feed_record": {
+        "description": """
+- livestock: Livestock ID or tag
+- feed_type: Type of feed (hay, grass, silage, concentrate, grain, etc.)
+- feed: Feed name or brand
+- quantity_kg: Quantity in kilograms
+- price_per_kg: Price per kilogram
+- date: Feeding date in YYYY-MM-DD format
+        """,
+        "fields": """
+- livestock: String (required) - Livestock ID
+- feed_type: String (required) - Feed type
+- feed: String (required) - Feed name
+- quantity_kg: Decimal (required) - Quantity in kg
+- price_per_kg: Decimal (required) - Price per kg
+- date: Date (required) - Feeding date
+        """,
+        "example": '{\n  "livestock": "COW-001",\n  "feed_type": "hay",\n  "feed": "Alfalfa hay",\n  "quantity_kg": 10.0,\n  "price_per_kg": 50.0,\n  "date": "2024-01-15"\n}',
+    },
+    "yield_record": {
+        "description": """
+- livestock: Livestock ID or tag (e.g., COW-123)
+- yield_type: Type of yield (milk, eggs, wool, meat, etc.)
+- quantity: Yield quantity (numeric)
+- unit: Unit of measure (e.g., liters, kg, pieces)
+- quality_grade: Quality grade (A, B, C) (optional)
+- date: Yield date (accept natural formats like 9 26 2023 or YYYY-MM-DD)
+- notes: Additional notes (optional)
+        """,
+        "fields": """
+- livestock: String (required) - Livestock ID
+- yield_type: String (required) - Yield type
+- quantity: Decimal (required) - Yield quantity
+- unit: String (required) - Unit of measure (liters, kg, pieces)
+- quality_grade: String (optional) - Quality grade
+- date: Date (required) - Yield date in YYYY-MM-DD
+- notes: String (optional) - Additional notes
+        """,
+        "example": '{\n  "livestock": "COW-123",\n  "yield_type": "milk",\n  "quantity": 15,\n  "unit": "liters",\n  "quality_grade": "A",\n  "date": "2023-09-26",\n  "notes": "Morning milking"\n}',
+    },
+    "drug": {
+        "description": """
+- name: Drug name
+- active_ingredient: Active ingredient
+- unit: Measurement unit (e.g., ml, mg, tablet)
+- notes: Additional notes (e.g., manufacturer, remarks)
+        """,
+        "fields": """
+- name: String (required) - Drug name
+- active_ingredient: String (required) - Active ingredient
+- unit: String (optional) - Measurement unit
+- notes: String (optional) - Notes or manufacturer details
+        """,
+        "example": '{\n  "name": "Penicillin",\n  "active_ingredient": "Penicillin",\n  "unit": "ml",\n  "notes": "Manufactured by ABC Pharma"\n}',
+    },
+    "feed": {
+        "description": """
+- name: Feed name
+- cost_per_kg: Price per kilogram
+- notes: Additional notes or remarks (optional)
+        """,
+        "fields": """
+- name: String (required) - Feed name
+- cost_per_kg: Decimal (required) - Price per kg
+- notes: String (optional) - Additional notes or remarks
+        """,
+        "example": '{\n  "name": "Sunflower seeds",\n  "cost_per_kg": 500.0,\n  "notes": "Do not buy them; they are expensive."\n}',
+    },
+}
+
+
+for _definition in FORM_FIELDS.values():
+    _definition["description"] = _definition["description"].strip()
+    _definition["fields"] = _definition["fields"].strip()
+
+
+def get_form_fields(form_type):
+    """Get form-specific field definitions for AI parsing"""
+    return FORM_FIELDS.get(form_type, FORM_FIELDS["livestock"])
+
+
+def estimate_tokens(text):
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def _cell(value, width=None):
+    if value is None or value == "":
+        return "-"
+    text = " ".join(str(value).replace("|", "/").split())
+    if width and len(text) > width:
+        text = text[: width - 1] + "…"
+    return text
+
+
+def encode_table(columns, rows):
+    """Render ``rows`` (sequences matching ``columns``) as a pipe table."""
+    lines = ["|".join(columns)]
+    lines.extend("|".join(_cell(value) for value in row) for row in rows)
+    return "\n".join(lines)
+
+
+def fit_rows(columns, rows, budget):
+    """
+    Encode as many of ``rows`` as fit in ``budget`` tokens, keeping their
+    order. Returns the table and the number of rows left out.
+    """
+    header = "|".join(columns)
+    used = estimate_tokens(header)
+    lines = [header]
+    for row in rows:
+        line = "|".join(_cell(value) for value in row)
+        cost = estimate_tokens(line) + 1
+        if used + cost > budget:
+            break
+        lines.append(line)
+        used += cost
+    return "\n".join(lines), len(rows) - (len(lines) - 1)
+
+
+AMU_SYSTEM = (
+    "You are an expert veterinary assistant specializing in livestock health "
+    "and antimicrobial usage (AMU) analysis."
+)
+
+AMU_TEMPLATE = Template("""\
+Analyze the following data for a livestock animal and provide insights on AMU (Antimicrobial Usage).
+Determine if the current drug dosages are correct based on recommended ranges and animal weight.
+If not correct, suggest adjustments (e.g., bring the dosage up or down by X quantity).
+Also, provide any additional relevant insights about the animal's health and drug usage.
+Tables are pipe-separated with a header row; "-" means not recorded.
+
+Livestock: species=$species breed=$breed gender=$gender weight_kg=$weight health_status=$health_status
+
+Health history, newest first (drugs: name dosage withdrawal days, then the
+dose per kg of current weight and how it compares with the drug's range)$omitted:
+$history
+
+Recommended drug information:
+$drugs
+""")
+
+HISTORY_COLUMNS = ("date", "event", "diagnosis", "outcome", "notes", "drugs")
+DRUG_COLUMNS = ("name", "active_ingredient", "species", "dose_min", "dose_max", "unit")
+
+
+def _amu_cell(amu, weight_kg):
+    name = amu.drug.name if amu.drug else "unlisted drug"
+    cell = f"{name} {amu.dosage} {amu.withdrawal_period}d"
+    check = check_amu(amu, weight_kg)
+    if check["status"] != "unknown":
+        cell += f" [{check['dose_per_kg'].normalize():f} {check['unit']}: {check['status']}]"
+    return cell
+
+
+def amu_messages(livestock, health_records, budget=None):
+    """
+    Chat messages for AMU insights on ``livestock``.
+
+    ``health_records`` must be newest first with ``amu_records__drug``
+    prefetched; the oldest are dropped once the prompt would exceed
+    ``budget`` tokens.
+    """
+    if budget is None:
+        budget = settings.LLM_PROMPT_TOKEN_BUDGET
+
+    rows = []
+    for record in health_records:
+        rows.append((
+            record.event_date,
+            record.event_type,
+            record.diagnosis,
+            record.treatment_outcome,
+            _cell(record.notes, NOTES_WIDTH),
+            "; ".join(
+                _amu_cell(amu, livestock.current_weight_kg) for amu in record.amu_records.all()
+            ),
+        ))
+
+    fields = {
+        "species": _cell(livestock.species),
+        "breed": _cell(livestock.breed),
+        "gender": _cell(livestock.gender),
+        "weight": _cell(livestock.current_weight_kg),
+        "health_status": _cell(livestock.health_status),
+    }
+    fixed = estimate_tokens(
+        AMU_SYSTEM + AMU_TEMPLATE.substitute(fields, omitted="", history="", drugs="")
+    )
+    # Drug reference rows are few and short; give history what they leave.
+    drug_budget = max(0, budget - fixed) // 4
+    history, omitted = fit_rows(HISTORY_COLUMNS, rows, budget - fixed - drug_budget)
+
+    drugs = {}
+    for record in health_records[: len(rows) - omitted]:
+        for amu in record.amu_records.all():
+            if amu.drug:
+                drugs.setdefault(amu.drug.pk, amu.drug)
+    drug_table, _ = fit_rows(
+        DRUG_COLUMNS,
+        [
+            (d.name, d.active_ingredient, d.species_target,
+             d.recommended_dosage_min, d.recommended_dosage_max, d.unit)
+            for d in drugs.values()
+        ],
+        drug_budget,
+    )
+
+    prompt = AMU_TEMPLATE.substitute(
+        fields,
+        omitted=" (older records omitted)" if omitted else "",
+        history=history,
+        drugs=drug_table,
+    )
+    return [
+        {"role": "system", "content": AMU_SYSTEM},
+        {"role": "user", "content": prompt},
+    ]
+
+
+VOICE_SYSTEM = (
+    "You extract structured fields from livestock management transcripts "
+    "and always return valid JSON."
+)
+
+_VOICE_TEMPLATE = """\
+You are an expert livestock management assistant. I need you to parse the following voice transcript and extract $form_type information in a structured JSON format.
+Voice Transcript: "$${transcript}"
+
+The transcript language code is "$${language}". If the transcript is not in English, first translate it to English accurately, then extract the fields.
+
+Please analyze this transcript and extract the following information:
+$description
+
+Expected fields:
+$fields
+
+Important:
+- Return ONLY a valid JSON object.
+- Do NOT add markdown formatting like ```json.
+$batch_instructions
+Example response format:
+$example
+"""
+
+BATCH_INSTRUCTIONS = """\
+- The transcript may describe several animals. Return {"records": [...]}
+  with one object per animal, each with the expected fields. Details
+  said once (date, unit, feed) apply to every record."""
+
+
+def _compile_voice_template(form_type, batch):
+    definition = FORM_FIELDS[form_type]
+    example = definition["example"]
+    if batch:
+        example = '{\n  "records": [\n' + example + "\n  ]\n}"
+    # The first pass fills in the static parts and leaves ${transcript} and
+    # ${language} for the per-request substitution.
+    return Template(Template(_VOICE_TEMPLATE).substitute(
+        form_type=form_type,
+        description=definition["description"],
+        fields=definition["fields"],
+        batch_instructions=BATCH_INSTRUCTIONS if batch else "",
+        example=example,
+    ))
+
+
+VOICE_TEMPLATES = {
+    (form_type, batch): _compile_voice_template(form_type, batch)
+    for form_type in FORM_FIELDS
+    for batch in (False, True)
+}
+
+
+def voice_messages(transcript, form_type, language="en", batch=False):
+    """Chat messages asking the LLM to parse a voice transcript."""
+    if form_type not in FORM_FIELDS:
+        form_type = "livestock"
+    template = VOICE_TEMPLATES[(form_type, batch)]
+    # A literal "$" in the transcript is just text to Template.substitute.
+    prompt = template.substitute(transcript=transcript, language=language)
+    return [
+        {"role": "system", "content": VOICE_SYSTEM},
+        {"role": "user", "content": prompt},
+    ]
@@ -0,0 +1,233 @@
+"""
+Monthly rollups behind the insights charts.
+
+Each rollup row covers one (livestock, month, dimension) bucket. Writes never
+patch totals in place: the touched buckets are re-aggregated from the raw
+records (an index range scan on (livestock, date)) and replaced, so a rollup
+always matches what a full scan would produce. A batch of buckets costs one
+aggregate, one delete and one insert however many buckets it spans, under a
+row lock on the buckets' animals.
+"""
+
+from datetime import timedelta
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import (
+    Count,
+    DecimalField,
+    ExpressionWrapper,
+    F,
+    Q,
+    Sum,
+    Value,
+)
+from django.db.models.functions import Coalesce, NullIf, TruncMonth
+
+from .models import (
+    AMUMonthlyRollup,
+    AMURecord,
+    FeedMonthlyRollup,
+    FeedRecord,
+    Livestock,
+    YieldMonthlyRollup,
+    YieldRecord,
+)
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def next_month(month):
+    return (month.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+
+def feed_cost_expression():
+    price_decimal = Coalesce(
+        "price_per_kg",
+        F("feed__cost_per_kg"),
+        Value(0),
+        output_field=DecimalField(max_digits=10, decimal_places=2),
+    )
+    return ExpressionWrapper(
+        F("quantity_kg") * price_decimal,
+        output_field=DecimalField(max_digits=12, decimal_places=2),
+    )
+
+
+def feed_label_expression():
+    return Coalesce("feed__name", NullIf("feed_type", Value("")), Value("Unknown"))
+
+
+def _group_by_month(buckets):
+    by_month = {}
+    for livestock_id, day in buckets:
+        by_month.setdefault(month_start(day), set()).add(livestock_id)
+    return by_month
+
+
+def _records_filter(buckets, livestock_field, date_field):
+    return reduce(
+        or_,
+        (
+            Q(
+                **{
+                    f"{livestock_field}__in": ids,
+                    f"{date_field}__gte": month,
+                    f"{date_field}__lt": next_month(month),
+                }
+            )
+            for month, ids in _group_by_month(buckets).items()
+        ),
+    )
+
+
+def _rollups_filter(buckets):
+    return reduce(
+        or_,
+        (
+            Q(livestock_id__in=ids, month=month)
+            for month, ids in _group_by_month(buckets).items()
+        ),
+    )
+
+
+def _replace(rollup_model, rollups, rows, build, buckets=None):
+    with transaction.atomic():
+        if buckets is not None:
+            # Writers of the same bucket queue on the animal's row, so each
+            # aggregates after the last one committed and none inserts a row
+            # another has just inserted. Taken in pk order, so they cannot
+            # deadlock over several animals.
+            list(
+                Livestock.objects.select_for_update()
+                .filter(pk__in={livestock_id for livestock_id, _ in buckets})
+                .order_by("pk")
+                .values_list("pk", flat=True)
+            )
+        rollups.delete()
+        rollup_model.objects.bulk_create([build(row) for row in rows], batch_size=1000)
+
+
+def _write_feed(records, rollups, buckets=None):
+    rows = (
+        records.annotate(month=TruncMonth("date"), label=feed_label_expression())
+        .values("farm_id", "livestock_id", "month", "label")
+        .annotate(total_kg=Sum("quantity_kg"), total_spend=Sum(feed_cost_expression()))
+        .order_by()
+    )
+    _replace(
+        FeedMonthlyRollup,
+        rollups,
+        rows,
+        lambda row: FeedMonthlyRollup(
+            farm_id=row["farm_id"],
+            livestock_id=row["livestock_id"],
+            month=row["month"],
+            feed_name=row["label"],
+            total_kg=row["total_kg"] or 0,
+            total_spend=row["total_spend"] or 0,
+        ),
+        buckets,
+    )
+
+
+def _write_yield(records, rollups, buckets=None):
+    rows = (
+        records.annotate(month=TruncMonth("date"))
+        .values("farm_id", "livestock_id", "month", "yield_type", "unit")
+        .annotate(total_quantity=Sum("quantity"))
+        .order_by()
+    )
+    _replace(
+        YieldMonthlyRollup,
+        rollups,
+        rows,
+        lambda row: YieldMonthlyRollup(
+            farm_id=row["farm_id"],
+            livestock_id=row["livestock_id"],
+            month=row["month"],
+            yield_type=row["yield_type"],
+            unit=row["unit"],
+            total_quantity=row["total_quantity"] or 0,
+        ),
+        buckets,
+    )
+
+
+def _write_amu(records, rollups, buckets=None):
+    rows = (
+        records.annotate(
+            livestock_id=F("health_record__livestock_id"),
+            month=TruncMonth("health_record__event_date"),
+        )
+        .values("farm_id", "livestock_id", "month", "drug_id")
+        .annotate(treatments=Count("id"))
+        .order_by()
+    )
+    _replace(
+        AMUMonthlyRollup,
+        rollups,
+        rows,
+        lambda row: AMUMonthlyRollup(
+            farm_id=row["farm_id"],
+            livestock_id=row["livestock_id"],
+            month=row["month"],
+            drug_id=row["drug_id"],
+            treatments=row["treatments"],
+        ),
+        buckets,
+    )
+
+
+def refresh_feed_rollups(buckets):
+    """Recompute the feed rollups for an iterable of (livestock_id, date) pairs."""
+    buckets = set(buckets)
+    if buckets:
+        _write_feed(
+            FeedRecord.objects.filter(_records_filter(buckets, "livestock_id", "date")),
+            FeedMonthlyRollup.objects.filter(_rollups_filter(buckets)),
+            buckets,
+        )
+
+
+def refresh_yield_rollups(buckets):
+    """Recompute the yield rollups for an iterable of (livestock_id, date) pairs."""
+    buckets = set(buckets)
+    if buckets:
+        _write_yield(
+            YieldRecord.objects.filter(_records_filter(buckets, "livestock_id", "date")),
+            YieldMonthlyRollup.objects.filter(_rollups_filter(buckets)),
+            buckets,
+        )
+
+
+def refresh_amu_rollups(buckets):
+    """Recompute the AMU rollups for an iterable of (livestock_id, event_date) pairs."""
+    buckets = set(buckets)
+    if buckets:
+        _write_amu(
+            AMURecord.objects.filter(
+                _records_filter(
+                    buckets, "health_record__livestock_id", "health_record__event_date"
+                )
+            ),
+            AMUMonthlyRollup.objects.filter(_rollups_filter(buckets)),
+            buckets,
+        )
+
+
+def rebuild_rollups(farm_id=None):
+    """Recompute every rollup from scratch, optionally for a single farm."""
+    scope = {} if farm_id is None else {"farm_id": farm_id}
+    _write_feed(
+        FeedRecord.objects.filter(**scope), FeedMonthlyRollup.objects.filter(**scope)
+    )
+    _write_yield(
+        YieldRecord.objects.filter(**scope), YieldMonthlyRollup.objects.filter(**scope)
+    )
+    _write_amu(
+        AMURecord.objects.filter(**scope), AMUMonthlyRollup.objects.filter(**scope)
+    )
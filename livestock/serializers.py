@@ -1,4 +1,6 @@
 from rest_framework import serializers
+from . import tag_index
+from .membership import get_membership
 from .models import (
     Livestock,
     HealthRecord,
@@ -12,6 +14,85 @@ from .models import (
 )
 
 
+class PreloadedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    Resolves pks from ``context["preloaded"][Model]`` when the bulk endpoints
+    have fetched the whole batch's related rows up front, instead of running
+    one ``queryset.get(pk=...)`` per item.
+    """
+
+    def lookup_pk(self, data, farm_id):
+        """The pk ``data`` refers to, or None; used to preload bulk batches."""
+        try:
+            return int(data)
+        except (TypeError, ValueError):
+            return None
+
+    def to_internal_value(self, data):
+        preloaded = self.context.get("preloaded", {}).get(self.get_queryset().model)
+        if preloaded is None:
+            return super().to_internal_value(data)
+        if isinstance(data, bool):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        try:
+            return preloaded[int(data)]
+        except KeyError:
+            self.fail("does_not_exist", pk_value=data)
+        except (TypeError, ValueError):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+
+
+class LivestockTagField(PreloadedPrimaryKeyRelatedField):
+    """
+    A livestock pk, or a tag as the voice parser returns it ("COW-001", "cow
+    one"), resolved against the caller's farm through livestock.tag_index.
+    A fuzzy match is only offered as a suggestion, never written.
+    """
+
+    default_error_messages = {
+        "unknown_tag": 'Unknown tag "{tag}".',
+        "ambiguous_tag": 'Tag "{tag}" could match {candidates}.',
+        "suggested_tag": 'Unknown tag "{tag}"; did you mean {suggestion}?',
+    }
+
+    def lookup_pk(self, data, farm_id):
+        """The pk ``data`` refers to, or None; used to preload bulk batches."""
+        if isinstance(data, str) and not data.strip().isdigit():
+            if farm_id is None:
+                return None
+            match = tag_index.resolve_tag(farm_id, data)
+            return match.pk if match.match != "fuzzy" else None
+        return super().lookup_pk(data, farm_id)
+
+    def _farm_id(self):
+        request = self.context.get("request")
+        return get_membership(request).approved_farm_id if request else None
+
+    def get_queryset(self):
+        # Only the caller's own animals; another farm's pk is "does not exist".
+        # Unbound copies (as the bulk endpoints build) have no request and
+        # are filtered by their caller.
+        queryset = super().get_queryset()
+        if self.context.get("request") is None:
+            return queryset
+        return queryset.filter(farm_id=self._farm_id())
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) and not data.strip().isdigit():
+            farm_id = self._farm_id()
+            if farm_id is None:
+                self.fail("unknown_tag", tag=data)
+            match = tag_index.resolve_tag(farm_id, data)
+            if match.ambiguous:
+                self.fail("ambiguous_tag", tag=data, candidates=", ".join(match.candidates))
+            if match.match == "fuzzy":
+                self.fail("suggested_tag", tag=data, suggestion=match.tag_id)
+            if match.pk is None:
+                self.fail("unknown_tag", tag=data)
+            data = match.pk
+        return super().to_internal_value(data)
+
+
 class FarmSerializer(serializers.ModelSerializer):
     owner = serializers.PrimaryKeyRelatedField(read_only=True)
 
@@ -70,10 +151,13 @@ class AMURecordSerializer(serializers.ModelSerializer):
     drug_name = serializers.CharField(source='drug.name', read_only=True) # Display drug name
     class Meta:
         model = AMURecord
-        fields = ["id", "health_record", "drug", "drug_name", "dosage", "withdrawal_period"]
+        fields = ["id", "health_record", "drug", "drug_name", "dosage", "dosage_value", "dosage_unit", "withdrawal_period"]
+        read_only_fields = ("dosage_value", "dosage_unit")
 
 
 class HealthRecordSerializer(serializers.ModelSerializer):
+    serializer_related_field = PreloadedPrimaryKeyRelatedField
+    livestock = LivestockTagField(queryset=Livestock.objects.all())
     amu_records = AMURecordSerializer(many=True, read_only=True)
 
     class Meta:
@@ -82,6 +166,8 @@ class HealthRecordSerializer(serializers.ModelSerializer):
 
 
 class FeedRecordSerializer(serializers.ModelSerializer):
+    serializer_related_field = PreloadedPrimaryKeyRelatedField
+    livestock = LivestockTagField(queryset=Livestock.objects.all())
     feed_name = serializers.CharField(source="feed.name", read_only=True)
     class Meta:
         model = FeedRecord
@@ -89,6 +175,9 @@ class FeedRecordSerializer(serializers.ModelSerializer):
 
 
 class YieldRecordSerializer(serializers.ModelSerializer):
+    serializer_related_field = PreloadedPrimaryKeyRelatedField
+    livestock = LivestockTagField(queryset=Livestock.objects.all())
     class Meta:
         model = YieldRecord
-        fields = ["id", "livestock", "yield_type", "quantity", "unit", "date"]
\ No newline at end of file
+        fields = ["id", "livestock", "yield_type", "quantity", "unit", "date", "under_withdrawal"]
+        read_only_fields = ("under_withdrawal",)
\ No newline at end of file
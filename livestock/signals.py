@@ -0,0 +1,329 @@
+import threading
+from contextlib import contextmanager
+
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.db.models.functions import TruncMonth
+from django.dispatch import Signal, receiver
+
+from . import anomalies, dosage, tag_index, withdrawal
+from .insights_cache import bump_versions
+from .models import (
+    AMURecord,
+    Drug,
+    Feed,
+    FeedRecord,
+    HealthRecord,
+    Livestock,
+    WithdrawalInterval,
+    YieldRecord,
+)
+from .rollups import (
+    month_start,
+    refresh_amu_rollups,
+    refresh_feed_rollups,
+    refresh_yield_rollups,
+)
+
+# Sent by the bulk endpoints, whose bulk_create/bulk_update bypass
+# post_save, and by bulk_delete() below. ``instances`` are the rows as
+# written (or as deleted); ``previous`` holds copies taken before a bulk
+# update was applied, and is empty otherwise. ``created`` is True for a bulk
+# create, ``deleted`` for a bulk delete.
+records_bulk_changed = Signal()
+
+_bulk_delete = threading.local()
+
+
+@contextmanager
+def bulk_delete():
+    """
+    Run queryset deletes with the per-row post_delete handlers held back.
+
+    The rows they are sent for (cascaded ones included) are collected
+    instead, and one records_bulk_changed with ``deleted=True`` is sent per
+    model once the block ends, so each rollup bucket, anomaly series and
+    cache version is refreshed once rather than once per row.
+    """
+    deleted = {}
+    _bulk_delete.rows = deleted
+    try:
+        yield
+    finally:
+        _bulk_delete.rows = None
+    for model, rows in deleted.items():
+        records_bulk_changed.send(sender=model, instances=list(rows.values()), deleted=True)
+
+
+def _held_back(sender, instance):
+    """Collect ``instance`` for bulk_delete() if one is running."""
+    rows = getattr(_bulk_delete, "rows", None)
+    if rows is None:
+        return False
+    rows.setdefault(sender, {})[instance.pk] = instance
+    return True
+
+
+def _bucket(instance):
+    if isinstance(instance, HealthRecord):
+        return instance.livestock_id, month_start(instance.event_date)
+    return instance.livestock_id, month_start(instance.date)
+
+
+def _amu_bucket(amu_record):
+    try:
+        health_record = amu_record.health_record
+    except HealthRecord.DoesNotExist:
+        return None
+    return _bucket(health_record)
+
+
+def _amu_buckets(amu_records):
+    """Buckets of these AMU records whose health records still exist: one query."""
+    rows = HealthRecord.objects.filter(
+        pk__in={obj.health_record_id for obj in amu_records}
+    ).values_list("livestock_id", "event_date")
+    return {(livestock_id, month_start(day)) for livestock_id, day in rows}
+
+
+@receiver(pre_save, sender=FeedRecord)
+@receiver(pre_save, sender=YieldRecord)
+@receiver(pre_save, sender=HealthRecord)
+def remember_previous_bucket(sender, instance, **kwargs):
+    instance._previous_bucket = None
+    if instance.pk is None:
+        return
+    date_field = "event_date" if sender is HealthRecord else "date"
+    fields = ["livestock_id", date_field]
+    if sender is YieldRecord:
+        fields.append("yield_type")
+    previous = sender.objects.filter(pk=instance.pk).values_list(*fields).first()
+    if previous is not None:
+        instance._previous_bucket = (previous[0], month_start(previous[1]))
+        if sender is YieldRecord:
+            instance._previous_series = (previous[0], previous[2])
+
+
+def _changed_buckets(instance):
+    buckets = {_bucket(instance)}
+    if getattr(instance, "_previous_bucket", None):
+        buckets.add(instance._previous_bucket)
+    return buckets
+
+
+@receiver(post_save, sender=FeedRecord)
+def feed_record_saved(sender, instance, **kwargs):
+    refresh_feed_rollups(_changed_buckets(instance))
+
+
+@receiver(post_save, sender=YieldRecord)
+def yield_record_saved(sender, instance, **kwargs):
+    refresh_yield_rollups(_changed_buckets(instance))
+
+
+@receiver(post_save, sender=HealthRecord)
+def health_record_saved(sender, instance, created, **kwargs):
+    # A new health record has no AMU records yet; a moved one drags its
+    # AMU records to a different (livestock, month) bucket.
+    buckets = _changed_buckets(instance)
+    if not created and len(buckets) > 1:
+        refresh_amu_rollups(buckets)
+
+
+@receiver(post_delete, sender=FeedRecord)
+def feed_record_deleted(sender, instance, **kwargs):
+    if _held_back(sender, instance):
+        return
+    refresh_feed_rollups([_bucket(instance)])
+
+
+@receiver(post_delete, sender=YieldRecord)
+def yield_record_deleted(sender, instance, **kwargs):
+    if _held_back(sender, instance):
+        return
+    refresh_yield_rollups([_bucket(instance)])
+
+
+@receiver(post_save, sender=AMURecord)
+@receiver(post_delete, sender=AMURecord)
+def amu_record_changed(sender, instance, **kwargs):
+    if _held_back(sender, instance):
+        return
+    bucket = _amu_bucket(instance)
+    if bucket is not None:
+        refresh_amu_rollups([bucket])
+
+
+def _feed_buckets(feed):
+    return set(
+        FeedRecord.objects.filter(feed=feed)
+        .annotate(month=TruncMonth("date"))
+        .values_list("livestock_id", "month")
+        .distinct()
+    )
+
+
+@receiver(post_save, sender=Feed)
+def feed_saved(sender, instance, created, **kwargs):
+    # Spend falls back to Feed.cost_per_kg and rows are labelled by name.
+    if not created:
+        refresh_feed_rollups(_feed_buckets(instance))
+
+
+@receiver(pre_delete, sender=Feed)
+def remember_feed_buckets(sender, instance, **kwargs):
+    instance._rollup_buckets = _feed_buckets(instance)
+
+
+@receiver(post_delete, sender=Feed)
+def feed_deleted(sender, instance, **kwargs):
+    # FeedRecord.feed is SET_NULL, which updates rows without signals.
+    refresh_feed_rollups(getattr(instance, "_rollup_buckets", ()))
+
+
+@receiver(records_bulk_changed)
+def records_bulk_changed_rollups(sender, instances, previous=(), deleted=False, **kwargs):
+    if sender is AMURecord:
+        refresh_amu_rollups(_amu_buckets(instances))
+        return
+    if sender not in (FeedRecord, YieldRecord, HealthRecord):
+        return
+    buckets = {_bucket(obj) for obj in instances} | {_bucket(obj) for obj in previous}
+    if sender is FeedRecord:
+        refresh_feed_rollups(buckets)
+    elif sender is YieldRecord:
+        refresh_yield_rollups(buckets)
+    elif previous or deleted:
+        # Moved or deleted health records take their AMU records' counts along.
+        refresh_amu_rollups(buckets)
+
+
+@receiver(post_save, sender=YieldRecord)
+def yield_record_saved_anomalies(sender, instance, created, **kwargs):
+    previous = getattr(instance, "_previous_series", None)
+    if created or previous is None:
+        anomalies.record_readings([instance])
+    else:
+        anomalies.rebuild_series_many(
+            [previous, (instance.livestock_id, instance.yield_type)]
+        )
+
+
+@receiver(post_delete, sender=YieldRecord)
+def yield_record_deleted_anomalies(sender, instance, **kwargs):
+    if _held_back(sender, instance):
+        return
+    anomalies.rebuild_series(instance.livestock_id, instance.yield_type)
+
+
+@receiver(records_bulk_changed, sender=YieldRecord)
+def records_bulk_changed_anomalies(sender, instances, previous=(), created=False, **kwargs):
+    if created:
+        anomalies.record_readings(instances)
+    else:
+        anomalies.rebuild_series_many(
+            (obj.livestock_id, obj.yield_type) for obj in [*instances, *previous]
+        )
+
+
+@receiver(pre_save, sender=YieldRecord)
+def flag_yield_under_withdrawal(sender, instance, **kwargs):
+    instance.under_withdrawal = withdrawal.is_under_withdrawal(
+        instance.livestock_id, instance.date
+    )
+
+
+@receiver(pre_save, sender=AMURecord)
+def parse_amu_dosage(sender, instance, **kwargs):
+    instance.dosage_value, instance.dosage_unit = dosage.parse_dosage(instance.dosage)
+
+
+@receiver(post_save, sender=AMURecord)
+def amu_record_saved_withdrawal(sender, instance, **kwargs):
+    withdrawal.sync_intervals(AMURecord.objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=HealthRecord)
+def health_record_saved_withdrawal(sender, instance, created, **kwargs):
+    # Its treatments' intervals follow the event date and the animal.
+    if not created:
+        withdrawal.sync_for_health_records([instance.pk])
+
+
+@receiver(post_delete, sender=WithdrawalInterval)
+def withdrawal_interval_deleted(sender, instance, **kwargs):
+    # Also sent for intervals removed by cascade with their AMU record.
+    if _held_back(sender, instance):
+        return
+    withdrawal.reflag_ranges([(instance.livestock_id, instance.start, instance.ends_on)])
+
+
+@receiver(records_bulk_changed, sender=YieldRecord)
+def records_bulk_changed_withdrawal_yields(sender, instances, previous=(), created=False, **kwargs):
+    if created or previous:
+        withdrawal.flag_yields(instances)
+
+
+@receiver(records_bulk_changed, sender=WithdrawalInterval)
+def records_bulk_changed_withdrawal_intervals(sender, instances, **kwargs):
+    withdrawal.reflag_ranges(
+        (obj.livestock_id, obj.start, obj.ends_on) for obj in instances
+    )
+
+
+@receiver(records_bulk_changed, sender=HealthRecord)
+def records_bulk_changed_withdrawal_health(sender, instances, previous=(), **kwargs):
+    if previous:
+        withdrawal.sync_for_health_records([obj.pk for obj in instances])
+
+
+@receiver(post_save, sender=FeedRecord)
+@receiver(post_save, sender=YieldRecord)
+@receiver(post_save, sender=HealthRecord)
+@receiver(post_delete, sender=FeedRecord)
+@receiver(post_delete, sender=YieldRecord)
+@receiver(post_delete, sender=HealthRecord)
+def record_changed_bump_versions(sender, instance, **kwargs):
+    if _held_back(sender, instance):
+        return
+    livestock_ids = [instance.livestock_id]
+    previous = getattr(instance, "_previous_bucket", None)
+    if previous:
+        livestock_ids.append(previous[0])
+    bump_versions(livestock_ids=livestock_ids, farm_ids=[instance.farm_id])
+
+
+@receiver(post_save, sender=AMURecord)
+@receiver(post_delete, sender=AMURecord)
+def amu_record_changed_bump_versions(sender, instance, **kwargs):
+    if _held_back(sender, instance):
+        return
+    bucket = _amu_bucket(instance)
+    livestock_ids = [bucket[0]] if bucket else []
+    bump_versions(livestock_ids=livestock_ids, farm_ids=[instance.farm_id])
+
+
+@receiver(post_save, sender=Feed)
+@receiver(post_delete, sender=Feed)
+@receiver(post_save, sender=Drug)
+@receiver(post_delete, sender=Drug)
+def catalog_changed_bump_versions(sender, **kwargs):
+    bump_versions(catalog=True)
+
+
+@receiver(records_bulk_changed)
+def records_bulk_changed_bump_versions(sender, instances, previous=(), **kwargs):
+    rows = list(instances) + list(previous)
+    if sender is WithdrawalInterval:
+        # Not charted, as on post_delete.
+        return
+    if sender is AMURecord:
+        livestock_ids = [livestock_id for livestock_id, _ in _amu_buckets(rows)]
+    else:
+        livestock_ids = [obj.livestock_id for obj in rows]
+    bump_versions(livestock_ids=livestock_ids, farm_ids=[obj.farm_id for obj in rows])
+
+
+@receiver(post_save, sender=Livestock)
+@receiver(post_delete, sender=Livestock)
+def livestock_changed_invalidate_tags(sender, instance, **kwargs):
+    tag_index.invalidate([instance.farm_id])
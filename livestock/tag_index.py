@@ -0,0 +1,178 @@
+"""
+In-memory per-farm index for resolving livestock tags.
+
+Voice parses return tags ("COW-001", or spoken forms such as "cow one" or
+"cow number 1") where the record serializers need a pk. Each process keeps
+one index per farm, built with a single query, and answers lookups from it.
+Livestock writes bump the farm's tag version in the shared insights cache
+(see livestock.signals); an index built at an older version is rebuilt on
+its next use, so every worker sees new, renamed or deleted animals.
+
+Lookups try, in order: the exact tag, the tag with punctuation and spacing
+removed, the (prefix, number) pair read from typed or spoken text, the
+number alone when no animal word was said, and finally a close fuzzy match.
+A step that matches more than one animal stops the search as ambiguous.
+"""
+
+import difflib
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import Optional
+
+from .insights_cache import bump_version, get_versions
+from .models import Livestock
+from .voice_rules import TAG_PREFIXES, spoken_numbers_to_digits
+
+FUZZY_CUTOFF = 0.8
+
+_indexes = {}
+_lock = threading.Lock()
+
+
+@dataclass
+class TagMatch:
+    query: str
+    pk: Optional[int] = None
+    tag_id: Optional[str] = None
+    # exact, normalized, spoken, number or fuzzy; None when unresolved.
+    match: Optional[str] = None
+    candidates: list = field(default_factory=list)
+
+    @property
+    def ambiguous(self):
+        return self.pk is None and len(self.candidates) > 1
+
+    def as_dict(self):
+        return {
+            "query": self.query,
+            "id": self.pk,
+            "tag_id": self.tag_id,
+            "match": self.match,
+            "candidates": self.candidates,
+        }
+
+
+def _version_key(farm_id):
+    return f"tags:version:farm:{farm_id}"
+
+
+def _version(farm_id):
+    key = _version_key(farm_id)
+    return get_versions([key])[key]
+
+
+def invalidate(farm_ids):
+    """Mark these farms' indexes stale in every process."""
+    for farm_id in set(farm_ids):
+        if farm_id is None:
+            continue
+        bump_version(_version_key(farm_id))
+        with _lock:
+            _indexes.pop(farm_id, None)
+
+
+def _compact(text):
+    return re.sub(r"[^A-Z0-9]", "", text.upper())
+
+
+def _words_to_digits(text):
+    return re.findall(r"[a-z]+|\d+", spoken_numbers_to_digits(text.lower()))
+
+
+def _parts(text):
+    """(prefix or "", number) read from a tag or spoken text, or None."""
+    prefix = ""
+    for token in _words_to_digits(text):
+        if token.isdigit():
+            return prefix, int(token)
+        if token in ("number", "no", "tag"):
+            continue
+        # The word right before the number is the prefix: "the cow number one".
+        if token.endswith("s") and token[:-1] in TAG_PREFIXES:
+            token = token[:-1]
+        prefix = TAG_PREFIXES.get(token, token.upper())
+    return None
+
+
+class TagIndex:
+    def __init__(self, farm_id, version, rows):
+        self.farm_id = farm_id
+        self.version = version
+        self.exact = {}
+        self.compact = {}
+        self.parts = {}
+        self.numbers = {}
+        for pk, tag_id in rows:
+            entry = (pk, tag_id)
+            self.exact[tag_id.strip().upper()] = entry
+            self.compact.setdefault(_compact(tag_id), []).append(entry)
+            parts = _parts(tag_id)
+            if parts is not None:
+                self.parts.setdefault(parts, []).append(entry)
+                self.numbers.setdefault(parts[1], []).append(entry)
+
+    @classmethod
+    def build(cls, farm_id):
+        version = _version(farm_id)
+        rows = Livestock.objects.filter(farm_id=farm_id).values_list("pk", "tag_id")
+        return cls(farm_id, version, list(rows))
+
+    def resolve(self, query):
+        text = str(query).strip()
+        result = TagMatch(query=query)
+        if not text:
+            return result
+
+        entry = self.exact.get(text.upper())
+        if entry is not None:
+            return self._found(result, entry, "exact")
+
+        steps = [("normalized", self.compact.get(_compact(text), []))]
+        parts = _parts(text)
+        if parts is not None:
+            steps.append(("spoken", self.parts.get(parts, [])))
+            if not parts[0]:
+                steps.append(("number", self.numbers.get(parts[1], [])))
+        for match, entries in steps:
+            if len(entries) == 1:
+                return self._found(result, entries[0], match)
+            if entries:
+                result.candidates = sorted(tag for _, tag in entries)
+                return result
+
+        close = difflib.get_close_matches(
+            _compact(text), list(self.compact), n=2, cutoff=FUZZY_CUTOFF
+        )
+        entries = [entry for key in close for entry in self.compact[key]]
+        if len(entries) == 1:
+            return self._found(result, entries[0], "fuzzy")
+        result.candidates = sorted(tag for _, tag in entries)
+        return result
+
+    def _found(self, result, entry, match):
+        result.pk, result.tag_id = entry
+        result.match = match
+        return result
+
+
+def get_index(farm_id):
+    """This farm's TagIndex, rebuilt if a Livestock write has made it stale."""
+    version = _version(farm_id)
+    with _lock:
+        index = _indexes.get(farm_id)
+    if index is None or index.version != version:
+        index = TagIndex.build(farm_id)
+        with _lock:
+            _indexes[farm_id] = index
+    return index
+
+
+def resolve_tags(farm_id, queries):
+    """Resolve each of ``queries`` within ``farm_id``; one index lookup for the batch."""
+    index = get_index(farm_id)
+    return [index.resolve(query) for query in queries]
+
+
+def resolve_tag(farm_id, query):
+    return resolve_tags(farm_id, [query])[0]
@@ -1,3 +1,1273 @@
-from django.test import TestCase
+import asyncio
+import base64
+import importlib
+import io
+import json
+import os
+import tempfile
+import threading
+import types
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+import httpx
+from asgiref.sync import async_to_sync
+
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core.models import User
+from livestock import analytics, anomalies, dosage, jobs, llm, prompts
+from livestock.models import (
+    AMUMonthlyRollup,
+    AMURecord,
+    Drug,
+    Farm,
+    Feed,
+    FeedMonthlyRollup,
+    FeedRecord,
+    HealthRecord,
+    InsightJob,
+    Labourer,
+    Livestock,
+    LLMResponseCache,
+    WithdrawalInterval,
+    YieldAnomalyState,
+    YieldMonthlyRollup,
+    YieldRecord,
+)
+from livestock.management.commands import precompute_insights, run_insight_jobs
+from livestock.mock_llm import MockLLMServer
+from livestock.rollups import rebuild_rollups
+from livestock.signals import records_bulk_changed
+from livestock.voice_rules import parse_batch, parse_transcript, spoken_numbers_to_digits
+
+TODAY = date.today()
+
+
+class FarmTestCase(TestCase):
+    """A farm with an owner and an authenticated client, plus a second farm."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(email="owner@farm.test", password="x", username="owner")
+        cls.farm = Farm.objects.create(owner=cls.owner, name="Home Farm")
+        other_owner = User.objects.create_user(email="other@farm.test", password="x", username="other")
+        cls.other_farm = Farm.objects.create(owner=other_owner, name="Other Farm")
+        cls.feed = Feed.objects.create(name="Hay", cost_per_kg=Decimal("10.00"))
+        cls.drug = Drug.objects.create(
+            name="Penicillin",
+            unit="ml",
+            recommended_dosage_min=Decimal("0.01"),
+            recommended_dosage_max=Decimal("0.02"),
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    @staticmethod
+    def make_animal(farm, tag_id, **fields):
+        fields = {
+            "species": "Cattle",
+            "breed": "Holstein",
+            "date_of_birth": date(2020, 1, 1),
+            "gender": "F",
+            "current_weight_kg": Decimal("400"),
+            **fields,
+        }
+        return Livestock.objects.create(farm=farm, tag_id=tag_id, **fields)
+
+    def make_records(self, animal, days, start=TODAY):
+        """A feed, a milk and a treatment record per day for ``days`` days back from ``start``."""
+        for offset in range(days):
+            day = start - timedelta(days=offset)
+            FeedRecord.objects.create(
+                livestock=animal, feed=self.feed, feed_type="hay", quantity_kg=Decimal("5"), date=day
+            )
+            YieldRecord.objects.create(
+                livestock=animal, yield_type="Milk", quantity=Decimal("10"), unit="Liters", date=day
+            )
+            health = HealthRecord.objects.create(livestock=animal, event_type="treatment", event_date=day)
+            AMURecord.objects.create(
+                health_record=health, drug=self.drug, dosage="5 ml", withdrawal_period=7
+            )
+
+
+class MockLLMTestCase(FarmTestCase):
+    """FarmTestCase with GROQ_API_URL pointed at a local MockLLMServer."""
+
+    reply = "Treatment pattern looks fine. Keep recording."
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = MockLLMServer(reply=cls.reply).start()
+        cls.addClassCleanup(cls.server.server_close)
+        cls.addClassCleanup(cls.server.shutdown)
+
+    def setUp(self):
+        super().setUp()
+        self.server.reset_stats()
+        env = {"GROQ_API_KEY": "test-key", "GROQ_API_URL": self.server.url}
+        for patcher in (
+            mock.patch.dict(os.environ, env),
+            mock.patch.object(llm, "breaker", llm.CircuitBreaker(threshold=5, reset_timeout=30)),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.animal = self.make_animal(self.farm, "COW-001", health_status="sick")
+        self.make_records(self.animal, 2)
+
+    def generate(self, **data):
+        return self.client.post(
+            "/api/amu-insights/generate/", {"livestock_id": self.animal.pk, **data}, format="json"
+        )
+
+
+def cursor(payload):
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+
+class KeysetPaginationTests(FarmTestCase):
+    def setUp(self):
+        super().setUp()
+        self.animal = self.make_animal(self.farm, "COW-001")
+        # Several records per day so pages break inside a day.
+        for offset in range(4):
+            for _ in range(3):
+                YieldRecord.objects.create(
+                    livestock=self.animal,
+                    yield_type="Milk",
+                    quantity=Decimal("10"),
+                    unit="Liters",
+                    date=TODAY - timedelta(days=offset),
+                )
+
+    def walk(self, url):
+        ids, pages = [], 0
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids += [row["id"] for row in response.data["results"]]
+            url, pages = response.data["next"], pages + 1
+        return ids, pages
+
+    def test_pages_cover_every_record_once_in_order(self):
+        ids, pages = self.walk("/api/yield-records/?page_size=5")
+        expected = list(
+            YieldRecord.objects.order_by("-date", "-id").values_list("id", flat=True)
+        )
+        self.assertEqual(ids, expected)
+        self.assertEqual(pages, 3)
+
+    def test_previous_link_returns_the_earlier_page(self):
+        first = self.client.get("/api/yield-records/?page_size=5").data
+        second = self.client.get(first["next"]).data
+        back = self.client.get(second["previous"]).data
+        self.assertEqual(
+            [row["id"] for row in back["results"]], [row["id"] for row in first["results"]]
+        )
+
+    def test_next_page_is_a_row_comparison(self):
+        first = self.client.get("/api/yield-records/?page_size=5").data
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(first["next"])
+        self.assertTrue(
+            any('"id") < (' in query["sql"] for query in queries.captured_queries)
+        )
+
+    def test_malformed_cursors_are_not_found(self):
+        for payload in (
+            {"p": ["notadate", 1]},
+            {"p": [{"a": 1}, 1]},
+            {"p": ["2025-01-01", "x"]},
+            {"p": [None, 1]},
+            {"p": ["2025-01-01"]},
+            {"q": 1},
+        ):
+            with self.subTest(payload=payload):
+                response = self.client.get(f"/api/yield-records/?cursor={cursor(payload)}")
+                self.assertEqual(response.status_code, 404)
+        response = self.client.get("/api/yield-records/?cursor=not-base64!")
+        self.assertEqual(response.status_code, 404)
+
+
+class ListQueryCountTests(FarmTestCase):
+    """Every list endpoint costs the same number of queries at any row count."""
+
+    def assertConstantQueries(self, url, add_rows):
+        add_rows(2)
+        with CaptureQueriesContext(connection) as few:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        add_rows(8)
+        with self.assertNumQueries(len(few)):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+    def add_animals(self, count):
+        start = Livestock.objects.count()
+        for i in range(start, start + count):
+            self.make_animal(self.farm, f"COW-{i:03d}")
+
+    def add_records(self, count):
+        # Each animal gets a day of every record type.
+        start = Livestock.objects.count()
+        for i in range(start, start + count):
+            self.make_records(self.make_animal(self.farm, f"COW-{i:03d}"), 1)
+
+    def add_farms(self, count):
+        start = Farm.objects.count()
+        for i in range(start, start + count):
+            owner = User.objects.create_user(email=f"farmer{i}@farm.test", password="x", username=f"farmer{i}")
+            Farm.objects.create(owner=owner, name=f"Farm {i}")
+
+    def add_labourers(self, count):
+        start = Labourer.objects.count()
+        for i in range(start, start + count):
+            user = User.objects.create_user(email=f"hand{i}@farm.test", password="x", username=f"hand{i}")
+            Labourer.objects.create(user=user, farm=self.farm, status="approved")
+
+    def add_drugs(self, count):
+        start = Drug.objects.count()
+        for i in range(start, start + count):
+            Drug.objects.create(name=f"Drug {i}", unit="ml")
+
+    def add_feeds(self, count):
+        start = Feed.objects.count()
+        for i in range(start, start + count):
+            Feed.objects.create(name=f"Feed {i}", cost_per_kg=Decimal("1.00"))
+
+    def test_livestock(self):
+        self.assertConstantQueries("/api/livestock/?page_size=100", self.add_animals)
+
+    def test_health_records(self):
+        self.assertConstantQueries("/api/health-records/?page_size=100", self.add_records)
+
+    def test_amu_records(self):
+        self.assertConstantQueries("/api/amu-records/?page_size=100", self.add_records)
+
+    def test_feed_records(self):
+        self.assertConstantQueries("/api/feed-records/?page_size=100", self.add_records)
+
+    def test_yield_records(self):
+        self.assertConstantQueries("/api/yield-records/?page_size=100", self.add_records)
+
+    def test_farms(self):
+        self.assertConstantQueries("/api/farms/", self.add_farms)
+
+    def test_labourers(self):
+        self.assertConstantQueries("/api/labourers/", self.add_labourers)
+
+    def test_drugs(self):
+        self.assertConstantQueries("/api/drugs/", self.add_drugs)
+
+    def test_feeds(self):
+        self.assertConstantQueries("/api/feeds/", self.add_feeds)
+
+
+class LivestockFieldTests(FarmTestCase):
+    def setUp(self):
+        super().setUp()
+        self.animal = self.make_animal(self.farm, "COW-001")
+        self.foreign = self.make_animal(self.other_farm, "COW-900")
+
+    def post_yield(self, livestock):
+        return self.client.post(
+            "/api/yield-records/",
+            {
+                "livestock": livestock,
+                "yield_type": "Milk",
+                "quantity": "10",
+                "unit": "Liters",
+                "date": TODAY.isoformat(),
+            },
+            format="json",
+        )
+
+    def test_own_animal_by_pk_or_tag(self):
+        self.assertEqual(self.post_yield(self.animal.pk).status_code, 201)
+        self.assertEqual(self.post_yield("COW-001").status_code, 201)
+
+    def test_other_farms_animal_is_rejected(self):
+        for livestock in (self.foreign.pk, "COW-900"):
+            response = self.post_yield(livestock)
+            self.assertEqual(response.status_code, 400, livestock)
+            self.assertIn("livestock", response.data)
+        self.assertFalse(YieldRecord.objects.filter(livestock=self.foreign).exists())
+
+    def test_update_cannot_move_record_to_other_farms_animal(self):
+        record = YieldRecord.objects.create(
+            livestock=self.animal, yield_type="Milk", quantity=Decimal("10"), unit="Liters", date=TODAY
+        )
+        response = self.client.patch(
+            f"/api/yield-records/{record.pk}/", {"livestock": self.foreign.pk}, format="json"
+        )
+        self.assertEqual(response.status_code, 400)
+        record.refresh_from_db()
+        self.assertEqual(record.livestock_id, self.animal.pk)
+
+
+class BulkWriteTests(FarmTestCase):
+    def setUp(self):
+        super().setUp()
+        self.animal = self.make_animal(self.farm, "COW-001")
+
+    def create_yields(self, quantities):
+        response = self.client.post(
+            "/api/yield-records/bulk/",
+            [
+                {
+                    "livestock": self.animal.pk,
+                    "yield_type": "Milk",
+                    "quantity": quantity,
+                    "unit": "Liters",
+                    "date": (TODAY - timedelta(days=i)).isoformat(),
+                }
+                for i, quantity in enumerate(quantities)
+            ],
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201)
+        return [row["id"] for row in response.data]
+
+    def rollup_total(self):
+        return sum(
+            YieldMonthlyRollup.objects.filter(livestock=self.animal).values_list(
+                "total_quantity", flat=True
+            )
+        )
+
+    def test_create_writes_records_and_rollups(self):
+        self.create_yields(["10", "12", "14"])
+        self.assertEqual(YieldRecord.objects.filter(livestock=self.animal).count(), 3)
+        self.assertEqual(self.rollup_total(), Decimal("36"))
+
+    def test_invalid_item_writes_nothing(self):
+        response = self.client.post(
+            "/api/yield-records/bulk/",
+            [{"livestock": self.animal.pk, "yield_type": "Milk", "unit": "Liters"}],
+            format="json",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(YieldRecord.objects.exists())
+
+    def test_update_rejects_duplicate_ids(self):
+        (pk,) = self.create_yields(["10"])
+        response = self.client.patch(
+            "/api/yield-records/bulk/",
+            [{"id": pk, "quantity": "11"}, {"id": pk, "quantity": "12"}],
+            format="json",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["errors"], [{}, {"id": ["Duplicate id."]}])
+        self.assertEqual(YieldRecord.objects.get(pk=pk).quantity, Decimal("10"))
+
+    def test_update_refreshes_rollups(self):
+        first, second = self.create_yields(["10", "12"])
+        response = self.client.patch(
+            "/api/yield-records/bulk/", [{"id": first, "quantity": "20"}], format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.rollup_total(), Decimal("32"))
+
+    def test_delete_signals_once_per_batch(self):
+        ids = self.create_yields(["10", "12", "14"])
+        sent = []
+
+        def receiver(sender, **kwargs):
+            sent.append((sender, len(kwargs["instances"]), kwargs.get("deleted")))
+
+        records_bulk_changed.connect(receiver)
+        self.addCleanup(records_bulk_changed.disconnect, receiver)
+        response = self.client.delete("/api/yield-records/bulk/", ids[:2], format="json")
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(sent, [(YieldRecord, 2, True)])
+        self.assertEqual(self.rollup_total(), Decimal("14"))
+        state = YieldAnomalyState.objects.get(livestock=self.animal)
+        self.assertEqual((state.count, state.last_quantity), (1, 14.0))
+
+    def test_health_delete_clears_cascaded_treatments(self):
+        self.make_records(self.animal, 3)
+        ids = list(HealthRecord.objects.values_list("pk", flat=True))
+        response = self.client.delete("/api/health-records/bulk/", ids, format="json")
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(AMUMonthlyRollup.objects.exists())
+        self.assertFalse(WithdrawalInterval.objects.exists())
+        self.assertFalse(YieldRecord.objects.filter(under_withdrawal=True).exists())
+
+    def test_records_of_another_farm_are_not_found(self):
+        other = self.make_animal(self.other_farm, "GOAT-001")
+        record = YieldRecord.objects.create(
+            livestock=other, yield_type="Milk", quantity=Decimal("1"), unit="Liters", date=TODAY
+        )
+        response = self.client.delete("/api/yield-records/bulk/", [record.pk], format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(YieldRecord.objects.filter(pk=record.pk).exists())
+
+
+class BulkQueryCountTests(FarmTestCase):
+    """Bulk writes cost the same number of queries at any batch size (user-004)."""
+
+    month = date(TODAY.year - 1, 3, 1)
+
+    def assertConstantQueries(self, write):
+        with CaptureQueriesContext(connection) as few:
+            write(2)
+        with self.assertNumQueries(len(few)):
+            write(8)
+
+    def fresh_animal(self):
+        return self.make_animal(self.farm, f"COW-{Livestock.objects.count():03d}")
+
+    def yield_items(self, animal, count):
+        return [
+            {
+                "livestock": animal.pk,
+                "yield_type": "Milk",
+                "quantity": "10",
+                "unit": "Liters",
+                "date": (self.month + timedelta(days=i)).isoformat(),
+            }
+            for i in range(count)
+        ]
+
+    def create_yields(self, count):
+        animal = self.fresh_animal()
+        return self.client.post("/api/yield-records/bulk/", self.yield_items(animal, count), format="json")
+
+    def test_create(self):
+        def write(count):
+            self.assertEqual(self.create_yields(count).status_code, 201)
+
+        self.assertConstantQueries(write)
+
+    def test_update(self):
+        ids = {count: [row["id"] for row in self.create_yields(count).data] for count in (2, 8)}
+
+        def write(count):
+            items = [{"id": pk, "quantity": "11"} for pk in ids[count]]
+            response = self.client.patch("/api/yield-records/bulk/", items, format="json")
+            self.assertEqual(response.status_code, 200)
+
+        self.assertConstantQueries(write)
+
+    def test_delete(self):
+        ids = {count: [row["id"] for row in self.create_yields(count).data] for count in (2, 8)}
+
+        def write(count):
+            response = self.client.delete("/api/yield-records/bulk/", ids[count], format="json")
+            self.assertEqual(response.status_code, 204)
+
+        self.assertConstantQueries(write)
+
+    def test_delete_health_records_with_treatments(self):
+        ids = {}
+        for count in (2, 8):
+            animal = self.fresh_animal()
+            self.make_records(animal, count, start=self.month + timedelta(days=count))
+            ids[count] = list(HealthRecord.objects.filter(livestock=animal).values_list("pk", flat=True))
+
+        def write(count):
+            response = self.client.delete("/api/health-records/bulk/", ids[count], format="json")
+            self.assertEqual(response.status_code, 204)
+
+        self.assertConstantQueries(write)
+
+
+class RollupTests(FarmTestCase):
+    """Rollups kept up by the signals match a rebuild from the raw records."""
+
+    def snapshot(self):
+        return [
+            sorted(
+                model.objects.values_list(
+                    *[f.attname for f in model._meta.fields if not f.primary_key]
+                )
+            )
+            for model in (FeedMonthlyRollup, YieldMonthlyRollup, AMUMonthlyRollup)
+        ]
+
+    def assertMatchesRebuild(self):
+        maintained = self.snapshot()
+        rebuild_rollups()
+        self.assertEqual(maintained, self.snapshot())
+
+    def test_saves_moves_and_deletes(self):
+        animal = self.make_animal(self.farm, "COW-001")
+        other = self.make_animal(self.farm, "COW-002")
+        self.make_records(animal, 40)
+        self.assertMatchesRebuild()
+
+        record = YieldRecord.objects.filter(livestock=animal).earliest("date")
+        record.livestock, record.date = other, TODAY
+        record.save()
+        health = HealthRecord.objects.filter(livestock=animal).latest("event_date")
+        health.event_date = TODAY - timedelta(days=90)
+        health.save()
+        FeedRecord.objects.filter(livestock=animal).first().delete()
+        self.feed.cost_per_kg = Decimal("12.00")
+        self.feed.save()
+        self.assertMatchesRebuild()
+
+    def test_chart_data_reads_rollups(self):
+        animal = self.make_animal(self.farm, "COW-001")
+        self.make_records(animal, 3)
+        response = self.client.get("/api/yield-insights/farm-chart-data/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["summary"]["total"], 30.0)
+
+
+class AnomalyTests(FarmTestCase):
+    """Anomaly state kept up by the signals matches a replay of the records."""
+
+    def setUp(self):
+        super().setUp()
+        self.animal = self.make_animal(self.farm, "COW-001")
+
+    def add_yields(self, quantities, start=TODAY - timedelta(days=30)):
+        for i, quantity in enumerate(quantities):
+            YieldRecord.objects.create(
+                livestock=self.animal, yield_type="Milk", quantity=Decimal(quantity),
+                unit="Liters", date=start + timedelta(days=i),
+            )
+
+    def snapshot(self):
+        fields = [
+            f.attname for f in YieldAnomalyState._meta.fields if f.attname not in ("id", "updated_at")
+        ]
+        return sorted(YieldAnomalyState.objects.values_list(*fields))
+
+    def assertMatchesRebuild(self):
+        maintained = self.snapshot()
+        anomalies.rebuild_anomalies()
+        self.assertEqual(maintained, self.snapshot())
+
+    def test_drop_is_flagged(self):
+        self.add_yields(["20", "21", "19", "20", "22", "20", "21", "19", "20", "8"])
+        state = YieldAnomalyState.objects.get(livestock=self.animal, yield_type="Milk")
+        self.assertTrue(state.flagged)
+        self.assertEqual(anomalies.direction(state), "drop")
+        self.assertMatchesRebuild()
+
+    def test_back_dated_edit_and_delete_replay(self):
+        self.add_yields(["20", "21", "19", "20", "22", "20", "21", "19", "20", "8"])
+        self.add_yields(["20"], start=TODAY - timedelta(days=60))
+        record = YieldRecord.objects.get(quantity=Decimal("8"))
+        record.quantity = Decimal("20")
+        record.save()
+        self.assertMatchesRebuild()
+        YieldRecord.objects.filter(livestock=self.animal).first().delete()
+        self.assertMatchesRebuild()
+
+    def test_missing_state_is_rebuilt_from_history(self):
+        self.add_yields(["20", "21", "19", "20", "22", "20", "21", "19", "20"])
+        YieldAnomalyState.objects.all().delete()
+        self.add_yields(["8"], start=TODAY)
+        state = YieldAnomalyState.objects.get(livestock=self.animal, yield_type="Milk")
+        self.assertEqual(state.count, 10)
+        self.assertTrue(state.flagged)
+
+    def test_migration_seeds_state_like_a_rebuild(self):
+        self.add_yields(["20", "21", "19", "20", "22", "20", "21", "19", "20", "8"])
+        other = self.make_animal(self.farm, "COW-002")
+        YieldRecord.objects.create(
+            livestock=other, yield_type="Milk", quantity=Decimal("15"), unit="Liters", date=TODAY
+        )
+        expected = self.snapshot()
+        YieldAnomalyState.objects.all().delete()
+        migration = importlib.import_module("livestock.migrations.0018_seed_yield_anomaly_state")
+        migration.seed_yield_anomaly_state(django_apps, None)
+        self.assertEqual(self.snapshot(), expected)
+
+
+class WithdrawalTests(FarmTestCase):
+    """Yields are flagged while a treatment's withdrawal interval covers them."""
+
+    def setUp(self):
+        super().setUp()
+        self.animal = self.make_animal(self.farm, "COW-001")
+        self.start = TODAY - timedelta(days=20)
+        for i in range(20):
+            YieldRecord.objects.create(
+                livestock=self.animal, yield_type="Milk", quantity=Decimal("10"),
+                unit="Liters", date=self.start + timedelta(days=i),
+            )
+        self.health = HealthRecord.objects.create(
+            livestock=self.animal, event_type="treatment", event_date=self.start + timedelta(days=5)
+        )
+        self.amu = AMURecord.objects.create(
+            health_record=self.health, drug=self.drug, dosage="5 ml", withdrawal_period=7
+        )
+
+    def flagged_days(self):
+        return [
+            (day - self.start).days
+            for day in YieldRecord.objects.filter(under_withdrawal=True)
+            .order_by("date")
+            .values_list("date", flat=True)
+        ]
+
+    def test_treatment_flags_its_window(self):
+        self.assertEqual(self.flagged_days(), list(range(5, 12)))
+        interval = WithdrawalInterval.objects.get(amu_record=self.amu)
+        self.assertEqual(interval.ends_on, self.start + timedelta(days=12))
+
+    def test_moving_and_removing_treatment_reflags(self):
+        self.health.event_date = self.start + timedelta(days=15)
+        self.health.save()
+        self.assertEqual(self.flagged_days(), list(range(15, 20)))
+        self.amu.delete()
+        self.assertEqual(self.flagged_days(), [])
+
+    def test_new_yields_are_flagged(self):
+        response = self.client.post(
+            "/api/yield-records/bulk/",
+            [
+                {
+                    "livestock": self.animal.pk,
+                    "yield_type": "Meat",
+                    "quantity": "1",
+                    "unit": "kg",
+                    "date": (self.start + timedelta(days=day)).isoformat(),
+                }
+                for day in (4, 6)
+            ],
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([row["under_withdrawal"] for row in response.data], [False, True])
+
+    def test_under_withdrawal_endpoint(self):
+        day = (self.start + timedelta(days=8)).isoformat()
+        response = self.client.get(f"/api/livestock/under-withdrawal/?date={day}")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([a["tag_id"] for a in response.data["results"]], ["COW-001"])
+
+    def intervals(self):
+        return list(
+            WithdrawalInterval.objects.values_list("amu_record_id", "livestock_id", "start", "ends_on")
+        )
+
+    def test_migration_backfills_intervals_and_flags(self):
+        expected = self.intervals()
+        WithdrawalInterval.objects.all().delete()
+        YieldRecord.objects.update(under_withdrawal=False)
+        migration = importlib.import_module("livestock.migrations.0019_backfill_withdrawal_intervals")
+        migration.backfill_withdrawal_intervals(django_apps, None)
+        self.assertEqual(self.intervals(), expected)
+        self.assertEqual(self.flagged_days(), list(range(5, 12)))
+
+
+@override_settings(
+    CACHES={
+        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+        "insights": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "insights-tests",
+        },
+    }
+)
+class InsightsCacheTests(FarmTestCase):
+    url = "/api/yield-insights/farm-chart-data/"
+
+    def setUp(self):
+        super().setUp()
+        self.animal = self.make_animal(self.farm, "COW-001")
+        self.make_records(self.animal, 2)
+        caches["insights"].clear()
+
+    def total(self):
+        return self.client.get(self.url).data["summary"]["total"]
+
+    def add_yield(self, quantity):
+        YieldRecord.objects.create(
+            livestock=self.animal, yield_type="Milk", quantity=quantity, unit="Liters", date=TODAY
+        )
+
+    def test_writes_invalidate_cached_responses(self):
+        self.assertEqual(self.total(), 20.0)
+        self.assertEqual(self.total(), 20.0)
+        self.add_yield(Decimal("5"))
+        self.assertEqual(self.total(), 25.0)
+
+    def test_evicted_version_does_not_revive_stale_entries(self):
+        self.assertEqual(self.total(), 20.0)
+        self.add_yield(Decimal("5"))
+        self.assertEqual(self.total(), 25.0)
+        self.add_yield(Decimal("5"))
+        # The cache culls the farm's version key; the response cached under
+        # the first version must not be served again.
+        caches["insights"].delete(f"insights:version:farm:{self.farm.pk}")
+        self.assertEqual(self.total(), 30.0)
+
+
+class ProfitabilityTests(FarmTestCase):
+    """profitability-insights/farm-data and its MAX_CELLS guard (user-022)."""
+
+    url = "/api/profitability-insights/farm-data/"
+
+    def setUp(self):
+        super().setUp()
+        caches["insights"].clear()
+        self.make_records(self.make_animal(self.farm, "COW-001"), 2)
+        self.make_animal(self.farm, "GOAT-001", species="Goat")
+        self.make_records(self.make_animal(self.other_farm, "COW-002"), 2)
+
+    def test_margins_per_animal_species_and_farm(self):
+        response = self.client.get(self.url, {"price": "20"})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        # Two days of 5 kg hay at 10/kg and 10 litres at 20 per litre.
+        expected = {
+            "feed_kg": 10.0,
+            "feed_cost": 100.0,
+            "yield": 20.0,
+            "feed_conversion_ratio": 0.5,
+            "revenue": 400.0,
+            "margin": 300.0,
+        }
+        self.assertEqual({name: data["summary"][name] for name in expected}, expected)
+        self.assertEqual(data["summary"]["animals"], 1)
+        self.assertEqual([animal["tag_id"] for animal in data["animals"]], ["COW-001"])
+        cattle = next(row for row in data["species"] if row["species"] == "Cattle")
+        self.assertEqual(cattle["margin"], 300.0)
+        self.assertEqual(data["rolling_margin_chart"]["datasets"][0]["data"][-1], 300.0)
+
+    def test_margins_need_a_price(self):
+        with override_settings(YIELD_PRICE_PER_UNIT=None):
+            summary = self.client.get(self.url).json()["summary"]
+        self.assertIsNone(summary["margin"])
+        self.assertEqual(summary["feed_cost"], 100.0)
+
+    def test_bad_parameters(self):
+        for params in ({"price": "abc"}, {"price": "-1"}, {"rolling_days": "0"}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(self.url, params).status_code, 400)
+
+    def test_large_windows_are_refused(self):
+        # Two animals over the default year is 730 cells.
+        with mock.patch.object(analytics, "MAX_CELLS", 700):
+            response = self.client.get(self.url, {"price": "20"})
+            self.assertEqual(response.status_code, 400)
+            self.assertIn("narrow the window", response.json()["error"])
+            start = (TODAY - timedelta(days=9)).isoformat()
+            response = self.client.get(self.url, {"price": "20", "start": start})
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["summary"]["margin"], 300.0)
+        # Each of the three float64 arrays stays within a few MB.
+        self.assertLessEqual(analytics.MAX_CELLS * 8, 4 * 2**20)
+
+
+class DosageTests(SimpleTestCase):
+    cases = {
+        "5 ml": (Decimal("5"), "ml"),
+        "12.5ml": (Decimal("12.5"), "ml"),
+        "0,5 ml": (Decimal("0.5"), "ml"),
+        "1,25 ml": (Decimal("1.25"), "ml"),
+        "1,000 mg": (Decimal("1000"), "mg"),
+        "12,500.5 mg": (Decimal("12500.5"), "mg"),
+        "1,000,000 iu": (Decimal("1000000"), "iu"),
+        "0.005 L": (Decimal("5"), "ml"),
+        "2 g": (Decimal("2000"), "mg"),
+        "0.5mg/kg": (Decimal("0.5"), "mg/kg"),
+        "1 ml per kg bw": (Decimal("1"), "ml/kg"),
+        "20% solution, 5 cc": (Decimal("5"), "ml"),
+        "2 tabs": (Decimal("2"), "tablet"),
+        "7": (Decimal("7"), None),
+        "1,000,5 ml": (None, None),
+        "a splash": (None, None),
+        "": (None, None),
+    }
+
+    def test_parse_dosage(self):
+        for text, expected in self.cases.items():
+            with self.subTest(text=text):
+                self.assertEqual(dosage.parse_dosage(text), expected)
+
+    def test_backfill_migration_parses_the_same(self):
+        migration = importlib.import_module("livestock.migrations.0016_backfill_amu_dosage")
+        for text in self.cases:
+            with self.subTest(text=text):
+                self.assertEqual(migration._parse_dosage(text), dosage.parse_dosage(text))
+
+    def test_check_dose(self):
+        # 0.01-0.02 ml per kg on a 400 kg animal is 4-8 ml.
+        for value, unit, status in [
+            ("5", "ml", "ok"),
+            ("2", "ml", "under"),
+            ("0.05", "ml/kg", "over"),
+            ("6", None, "ok"),
+        ]:
+            with self.subTest(value=value, unit=unit):
+                result = dosage.check_dose(
+                    Decimal(value), unit, Decimal("400"), Decimal("0.01"), Decimal("0.02"), "ml"
+                )
+                self.assertEqual(result["status"], status)
+        result = dosage.check_dose(
+            Decimal("5"), "mg", Decimal("400"), Decimal("0.01"), Decimal("0.02"), "ml"
+        )
+        self.assertEqual(result["status"], "unknown")
+
+
+class VoiceRulesTests(SimpleTestCase):
+    today = date(2026, 10, 17)
+
+    def parse(self, transcript, form_type="yield_record"):
+        return parse_transcript(transcript, form_type, today=self.today)
+
+    def test_formulaic_yield(self):
+        result = self.parse("cow 12 gave 14 litres of milk today")
+        self.assertEqual(
+            result.data,
+            {
+                "livestock": "COW-012",
+                "quantity": 14,
+                "unit": "liters",
+                "yield_type": "Milk",
+                "date": "2026-10-17",
+            },
+        )
+        self.assertGreaterEqual(result.confidence, settings.VOICE_RULES_MIN_CONFIDENCE)
+
+    def test_compound_number_words(self):
+        for transcript in (
+            "cow twenty one gave 14 litres of milk",
+            "cow twenty-one gave fourteen litres of milk",
+        ):
+            with self.subTest(transcript=transcript):
+                result = self.parse(transcript)
+                self.assertEqual(result.data["livestock"], "COW-021")
+                self.assertEqual(result.data["quantity"], 14)
+        self.assertEqual(spoken_numbers_to_digits("two three ninety nine"), "2 3 99")
+
+    def test_unparsed_date_falls_back_to_the_llm(self):
+        for transcript in (
+            "cow 12 gave 14 litres of milk on the 3rd",
+            "cow 12 gave 14 litres of milk 2 weeks ago",
+        ):
+            with self.subTest(transcript=transcript):
+                result = self.parse(transcript)
+                self.assertLess(result.confidence, settings.VOICE_RULES_MIN_CONFIDENCE)
+
+    def test_parsed_dates(self):
+        cases = {
+            "cow 1 gave 10 litres of milk yesterday": "2026-10-16",
+            "cow 1 gave 10 litres of milk on 3rd october": "2026-10-03",
+            "cow 1 gave 10 litres of milk 3 days ago": "2026-10-14",
+        }
+        for transcript, expected in cases.items():
+            with self.subTest(transcript=transcript):
+                result = self.parse(transcript)
+                self.assertEqual(result.data["date"], expected)
+                self.assertGreaterEqual(result.confidence, settings.VOICE_RULES_MIN_CONFIDENCE)
+
+    def test_grouped_thousands(self):
+        result = self.parse("chicken 4 laid 1,200 eggs today")
+        self.assertEqual((result.data["livestock"], result.data["quantity"]), ("CHK-004", 1200))
+        self.assertGreaterEqual(result.confidence, settings.VOICE_RULES_MIN_CONFIDENCE)
+        result = self.parse("fed cow 3 1,500 kg of silage today", "feed_record")
+        self.assertEqual(result.data["quantity_kg"], 1500)
+        self.assertGreaterEqual(result.confidence, settings.VOICE_RULES_MIN_CONFIDENCE)
+
+    def test_negated_or_leftover_number_falls_back_to_the_llm(self):
+        for transcript in (
+            "did not give 14 litres",
+            "cow 12 didn't give 14 litres of milk today",
+            "cow 12 gave no milk today",
+            "cow 12 gave 14 litres of milk today 9",
+        ):
+            with self.subTest(transcript=transcript):
+                result = self.parse(transcript)
+                self.assertLess(result.confidence, settings.VOICE_RULES_MIN_CONFIDENCE)
+        self.assertEqual(self.parse("cow no 12 gave 14 litres of milk").data["livestock"], "COW-012")
+
+    def test_batch(self):
+        result = parse_batch(
+            "COW-001 12 litres, COW-002 9 litres, COW-003 14", "yield_record", today=self.today
+        )
+        self.assertEqual(
+            [(r["livestock"], r["quantity"], r["unit"]) for r in result.records],
+            [("COW-001", 12, "liters"), ("COW-002", 9, "liters"), ("COW-003", 14, "liters")],
+        )
+
+
+class CommitVoiceTests(FarmTestCase):
+    """commit-voice writes a parse-voice batch all at once or not at all (user-015)."""
+
+    def setUp(self):
+        super().setUp()
+        self.first = self.make_animal(self.farm, "COW-001")
+        self.second = self.make_animal(self.farm, "COW-002")
+        self.make_animal(self.other_farm, "COW-003")
+
+    def commit(self, path, records):
+        return self.client.post(f"/api/{path}/commit-voice/", {"records": records}, format="json")
+
+    def milk(self, tag, quantity):
+        return {
+            "livestock": tag,
+            "yield_type": "Milk",
+            "quantity": quantity,
+            "unit": "liters",
+            "date": TODAY.isoformat(),
+        }
+
+    def test_valid_batch_is_created(self):
+        response = self.commit("yield-records", [self.milk("COW-001", 12), self.milk("cow 2", 9)])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            sorted(YieldRecord.objects.values_list("livestock__tag_id", "quantity")),
+            [("COW-001", Decimal("12")), ("COW-002", Decimal("9"))],
+        )
+
+    def test_one_bad_record_writes_nothing(self):
+        response = self.commit(
+            "yield-records",
+            [self.milk("COW-001", 12), self.milk("COW-003", 9), self.milk("COW-002", 14)],
+        )
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()["errors"]
+        self.assertEqual(errors[0], {})
+        # COW-003 belongs to the other farm, so it only resembles this farm's tags.
+        self.assertEqual(list(errors[1]), ["livestock"])
+        self.assertEqual(errors[2], {})
+        self.assertFalse(YieldRecord.objects.exists())
+
+    def test_feed_names_are_resolved(self):
+        record = {"livestock": "COW-001", "feed_type": "hay", "quantity_kg": 10, "date": TODAY.isoformat()}
+        response = self.commit(
+            "feed-records", [{**record, "feed": "hay"}, {**record, "feed": "Silage"}]
+        )
+        self.assertEqual(response.status_code, 201)
+        # An unknown feed name is dropped rather than failing the batch.
+        self.assertEqual(
+            sorted(FeedRecord.objects.values_list("feed_id", flat=True), key=str),
+            sorted([self.feed.pk, None], key=str),
+        )
+
+    def test_bad_body_is_rejected(self):
+        self.assertEqual(self.commit("yield-records", []).status_code, 400)
+        response = self.commit("yield-records", [self.milk("COW-001", 12), "COW-002 9"])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["errors"][1], {"non_field_errors": ["Expected an object."]})
+        self.assertFalse(YieldRecord.objects.exists())
+
+
+class LLMClientTests(SimpleTestCase):
+    def setUp(self):
+        self.now = 0.0
+        breaker = llm.CircuitBreaker(threshold=1, reset_timeout=30, clock=lambda: self.now)
+        for patcher in (
+            mock.patch.object(llm, "breaker", breaker),
+            mock.patch.dict(os.environ, {"GROQ_API_KEY": "test-key"}),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.breaker = breaker
+
+    def serve(self, handler):
+        patcher = mock.patch.object(
+            llm, "get_client", lambda: httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def open_breaker(self):
+        self.breaker.record_failure()
+        self.now += 31
+        self.assertEqual(self.breaker.state, self.breaker.HALF_OPEN)
+
+    async def collect_stream(self):
+        return [delta async for delta in llm.stream_chat_completion([{"role": "user", "content": "hi"}])]
+
+    async def test_stream_probe_with_client_error_closes_the_breaker(self):
+        self.open_breaker()
+        self.serve(lambda request: httpx.Response(400, text="bad request"))
+        with self.assertRaises(llm.LLMHTTPError):
+            await self.collect_stream()
+        self.assertEqual(self.breaker.state, self.breaker.CLOSED)
+
+    async def test_stream_probe_with_server_error_reopens_the_breaker(self):
+        self.open_breaker()
+        self.serve(lambda request: httpx.Response(503, text="unavailable"))
+        with self.assertRaises(llm.LLMHTTPError):
+            await self.collect_stream()
+        self.assertEqual(self.breaker.state, self.breaker.OPEN)
+
+    async def test_stream_yields_deltas(self):
+        body = (
+            'data: {"choices": [{"delta": {"content": "hello "}}]}\n\n'
+            'data: {"choices": [{"delta": {"content": "world"}}]}\n\n'
+            "data: [DONE]\n\n"
+        )
+        self.serve(lambda request: httpx.Response(200, text=body))
+        self.assertEqual(await self.collect_stream(), ["hello ", "world"])
+
+    def test_concurrency_cap_is_process_wide(self):
+        limiter = llm._ConcurrencyLimit(2)
+        peak = []
+
+        async def call():
+            async with limiter.slot():
+                peak.append(limiter.in_flight)
+                await asyncio.sleep(0.02)
+
+        # One event loop per thread, as under WSGI.
+        threads = [threading.Thread(target=asyncio.run, args=(call(),)) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(max(peak), 2)
+        self.assertEqual((limiter.in_flight, limiter.waiting), (0, 0))
+
+    def test_pooled_client_is_closed_with_its_loop(self):
+        clients = []
+
+        async def use():
+            clients.append(llm.get_client())
+
+        asyncio.run(use())
+        asyncio.run(use())
+        self.assertIsNot(clients[0], clients[1])
+        self.assertTrue(all(client.is_closed for client in clients))
+        self.assertEqual(len(llm._clients), 0)
+
+
+class LLMResponseCacheTests(MockLLMTestCase):
+    """Generated insights are answered from LLMResponseCache (user-010)."""
+
+    def test_repeat_request_is_a_cache_hit(self):
+        first = self.generate().json()
+        self.assertEqual(first, {"insights": self.reply, "cached": False})
+        second = self.generate().json()
+        self.assertTrue(second["cached"])
+        self.assertEqual(second["insights"], self.reply)
+        self.assertIn("generated_at", second)
+        self.assertEqual(self.server.stats()["requests"], 1)
+        self.assertEqual(LLMResponseCache.objects.get().hits, 1)
+
+    def test_force_refresh_asks_the_model_again(self):
+        self.generate()
+        response = self.generate(force_refresh=True).json()
+        self.assertFalse(response["cached"])
+        self.assertEqual(self.server.stats()["requests"], 2)
+        self.assertEqual(LLMResponseCache.objects.count(), 1)
+
+    def test_changed_history_is_a_miss(self):
+        self.generate()
+        self.make_records(self.animal, 1, start=TODAY - timedelta(days=5))
+        self.assertFalse(self.generate().json()["cached"])
+        self.assertEqual(self.server.stats()["requests"], 2)
+
+    def test_expired_entry_is_a_miss(self):
+        self.generate()
+        LLMResponseCache.objects.update(
+            created_at=timezone.now() - timedelta(seconds=settings.LLM_CACHE_TTL + 1)
+        )
+        self.assertFalse(self.generate().json()["cached"])
+        self.assertEqual(self.server.stats()["requests"], 2)
+
+
+class InsightJobTests(MockLLMTestCase):
+    """Insight generation queued as InsightJobs and run by run_insight_jobs (user-012)."""
+
+    def test_async_miss_is_queued_once(self):
+        first = self.generate(**{"async": True})
+        self.assertEqual(first.status_code, 202)
+        data = first.json()
+        self.assertEqual(data["status"], "queued")
+        self.assertTrue(data["status_url"].endswith(f"/amu-insights/jobs/{data['job_id']}/"))
+        second = self.generate(**{"async": True}).json()
+        self.assertEqual(second["job_id"], data["job_id"])
+        self.assertEqual(InsightJob.objects.count(), 1)
+        self.assertEqual(self.server.stats()["requests"], 0)
+
+    def test_claim_hands_a_job_out_once(self):
+        self.generate(**{"async": True})
+        job = jobs.claim_next_job()
+        self.assertEqual((job.status, job.attempts), ("running", 1))
+        self.assertIsNone(jobs.claim_next_job())
+
+    def test_stale_job_is_reclaimed_until_it_gives_up(self):
+        self.generate(**{"async": True})
+        for attempt in range(1, jobs.MAX_ATTEMPTS + 1):
+            job = jobs.claim_next_job()
+            self.assertEqual(job.attempts, attempt)
+            InsightJob.objects.update(started_at=timezone.now() - jobs.STALE_AFTER)
+        self.assertIsNone(jobs.claim_next_job())
+        self.assertEqual(InsightJob.objects.get().status, "failed")
+
+    def test_worker_runs_job_and_fills_cache(self):
+        job_id = self.generate(**{"async": True}).json()["job_id"]
+        # The worker loop under async_to_sync rather than the command's own
+        # asyncio.run, so its ORM calls stay inside the test transaction.
+        worker = run_insight_jobs.Command(stdout=io.StringIO())
+        self.assertEqual(async_to_sync(worker.run)(2, 0, True), 1)
+
+        polled = self.client.get(f"/api/amu-insights/jobs/{job_id}/").json()
+        self.assertEqual(polled["status"], "succeeded")
+        self.assertEqual(polled["insights"], self.reply)
+        self.assertTrue(self.generate().json()["cached"])
+        self.assertEqual(self.server.stats()["requests"], 1)
+
+    def test_job_is_private_to_its_farm(self):
+        job_id = self.generate(**{"async": True}).json()["job_id"]
+        other = APIClient()
+        other.force_authenticate(self.other_farm.owner)
+        self.assertEqual(other.get(f"/api/amu-insights/jobs/{job_id}/").status_code, 404)
+
+
+class InsightStreamTests(MockLLMTestCase):
+    """generate_insights_stream relays the model's tokens as SSE frames (user-013)."""
+
+    def stream(self):
+        response = self.client.post(
+            "/api/amu-insights/generate/stream/", {"livestock_id": self.animal.pk}, format="json"
+        )
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+
+        async def read():
+            return b"".join([chunk async for chunk in response.streaming_content])
+
+        frames = []
+        for frame in async_to_sync(read)().decode().split("\n\n"):
+            if frame:
+                event, data = frame.split("\n")
+                frames.append((event.removeprefix("event: "), json.loads(data.removeprefix("data: "))))
+        return frames
+
+    def test_tokens_then_done(self):
+        frames = self.stream()
+        events = [event for event, _ in frames]
+        self.assertEqual(events, ["token"] * (len(frames) - 1) + ["done"])
+        self.assertGreater(len(frames), 2)
+        self.assertEqual("".join(data["text"] for _, data in frames[:-1]), self.reply)
+        self.assertEqual(frames[-1][1], {"cached": False})
+
+    def test_streamed_answer_is_cached(self):
+        self.stream()
+        frames = self.stream()
+        self.assertEqual(frames[0], ("token", {"text": self.reply}))
+        self.assertEqual(frames[1][0], "done")
+        self.assertTrue(frames[1][1]["cached"])
+        self.assertIn("generated_at", frames[1][1])
+        self.assertEqual(len(frames), 2)
+        self.assertEqual(self.server.stats()["requests"], 1)
+        self.assertTrue(self.generate().json()["cached"])
+
+
+class PromptBudgetTests(MockLLMTestCase):
+    """AMU history is trimmed to LLM_PROMPT_TOKEN_BUDGET before it is sent (user-017)."""
+
+    def setUp(self):
+        super().setUp()
+        self.make_records(self.animal, 58, start=TODAY - timedelta(days=2))
+        patcher = mock.patch.object(llm, "chat_completion", wraps=llm.chat_completion)
+        self.chat_completion = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def sent_prompt(self):
+        self.assertEqual(self.generate(force_refresh=True).status_code, 200)
+        messages = self.chat_completion.call_args.args[0]
+        prompt = messages[-1]["content"]
+        history = [
+            line.split("|")[0] for line in prompt.splitlines() if line[:4].isdigit() and "|" in line
+        ]
+        return messages, prompt, history
+
+    def test_long_history_is_trimmed_to_the_budget(self):
+        with override_settings(LLM_PROMPT_TOKEN_BUDGET=600):
+            messages, prompt, history = self.sent_prompt()
+        self.assertLessEqual(sum(prompts.estimate_tokens(m["content"]) for m in messages), 600)
+        self.assertIn("(older records omitted)", prompt)
+        self.assertGreater(len(history), 0)
+        self.assertLess(len(history), 60)
+        # Newest first, and it is the oldest records that are dropped.
+        expected = [(TODAY - timedelta(days=i)).isoformat() for i in range(len(history))]
+        self.assertEqual(history, expected)
+
+    def test_generous_budget_stops_at_the_history_limit(self):
+        with override_settings(LLM_PROMPT_TOKEN_BUDGET=100_000):
+            _, prompt, history = self.sent_prompt()
+        self.assertEqual(len(history), prompts.HISTORY_LIMIT)
+        self.assertNotIn("(older records omitted)", prompt)
+
+    def test_budget_changes_the_cache_key(self):
+        self.generate()
+        with override_settings(LLM_PROMPT_TOKEN_BUDGET=600):
+            self.assertFalse(self.generate().json()["cached"])
+        self.assertEqual(self.server.stats()["requests"], 2)
+
+
+class PrecomputeInsightsTests(MockLLMTestCase):
+    """precompute_insights fills the LLM response cache ahead of time (user-018)."""
+
+    def setUp(self):
+        super().setUp()
+        self.make_records(self.make_animal(self.farm, "COW-002"), 2)
+        self.make_records(self.make_animal(self.other_farm, "COW-003", health_status="recovering"), 2)
+
+    def precompute(self, *args):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "report.json")
+            # The command's asyncio.run under async_to_sync instead, so the
+            # cache writes stay on this thread, inside the test transaction.
+            async def run(coro):
+                return await coro
+
+            command_asyncio = types.SimpleNamespace(**{**vars(asyncio), "run": async_to_sync(run)})
+            with mock.patch.object(precompute_insights, "asyncio", command_asyncio):
+                call_command(
+                    "precompute_insights", *args, "--output", path,
+                    stdout=io.StringIO(), stderr=io.StringIO(),
+                )
+            with open(path) as fh:
+                return json.load(fh)
+
+    def test_dry_run_selects_sick_and_recovering_animals(self):
+        report = self.precompute("--dry-run")
+        self.assertEqual(report["animals"], ["COW-001", "COW-003"])
+        self.assertEqual(report["generated"], 0)
+        self.assertEqual(self.precompute("--dry-run", "--farm", str(self.farm.pk))["animals"], ["COW-001"])
+        self.assertEqual(len(self.precompute("--dry-run", "--all-statuses")["animals"]), 3)
+        self.assertEqual(self.server.stats()["requests"], 0)
+
+    def test_generated_insights_are_served_from_cache(self):
+        report = self.precompute()
+        self.assertEqual((report["pending"], report["generated"], report["failed"]), (2, 2, 0))
+        self.assertEqual(LLMResponseCache.objects.count(), 2)
+        response = self.generate().json()
+        self.assertEqual(response["insights"], self.reply)
+        self.assertTrue(response["cached"])
+        self.assertEqual(self.server.stats()["requests"], 2)
+
+    def test_only_changed_animals_are_regenerated(self):
+        self.precompute()
+        report = self.precompute()
+        self.assertEqual((report["up_to_date"], report["pending"]), (2, 0))
+        self.make_records(self.animal, 1, start=TODAY - timedelta(days=5))
+        report = self.precompute()
+        self.assertEqual(report["animals"], ["COW-001"])
+        self.assertEqual(report["generated"], 1)
+        self.assertEqual(self.server.stats()["requests"], 3)
+
+    def test_limit(self):
+        report = self.precompute("--limit", "1")
+        self.assertEqual((report["pending"], report["generated"]), (1, 1))
+        self.assertEqual(self.precompute("--dry-run")["animals"], ["COW-003"])
+
+    def test_requires_an_api_key(self):
+        with mock.patch.dict(os.environ, {"GROQ_API_KEY": ""}):
+            with self.assertRaisesMessage(CommandError, "GROQ_API_KEY is not set."):
+                self.precompute()
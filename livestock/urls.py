@@ -11,10 +11,13 @@ from .views import (
     DrugViewSet, # New
     AMUInsightsViewSet, # New
     FeedViewSet,
+    MetricsViewSet,
 )
+from . import views_llm
 from .views_insights import (
     FeedInsightsViewSet,
     YieldInsightsViewSet,
+    ProfitabilityInsightsViewSet,
 )
 
 router = DefaultRouter()
@@ -30,7 +33,17 @@ router.register(r"amu-insights", AMUInsightsViewSet, basename="amu-insight") # N
 router.register(r"feeds", FeedViewSet, basename="feed")
 router.register(r"feed-insights", FeedInsightsViewSet, basename="feed-insight")
 router.register(r"yield-insights", YieldInsightsViewSet, basename="yield-insight")
+router.register(r"profitability-insights", ProfitabilityInsightsViewSet, basename="profitability-insight")
+router.register(r"metrics", MetricsViewSet, basename="metrics")
 
 urlpatterns = [
+    # Async LLM views; listed before the router so they sit under amu-insights/.
+    path("amu-insights/generate/", views_llm.generate_insights, name="amu-insight-generate"),
+    path(
+        "amu-insights/generate/stream/",
+        views_llm.generate_insights_stream,
+        name="amu-insight-generate-stream",
+    ),
+    path("amu-insights/parse-voice/", views_llm.parse_voice_input, name="amu-insight-parse-voice"),
     path("", include(router.urls)),
 ]
@@ -1,27 +1,34 @@
+from datetime import date
+
 from django.core.mail import send_mail
 from django.shortcuts import get_object_or_404
-from django.db.models import Count
-from django.db.models.functions import TruncMonth
-from datetime import datetime, timedelta
+from django.db.models import Prefetch
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.exceptions import PermissionDenied
-from .views_insights import AMUInsightsViewSet
-from .views_insights import FeedInsightsViewSet, YieldInsightsViewSet
+from .views_insights import FeedInsightsViewSet, YieldInsightsViewSet, farm_chart_data
 
 from .models import (
     Farm,
     Labourer,
     Livestock,
     HealthRecord,
+    InsightJob,
     AMURecord,
     FeedRecord,
     YieldRecord,
     Drug,
     Feed,
 )
+from . import dosage, llm, tag_index, withdrawal
+from .buckets import AMU_SOURCE, dense_series, parse_window
+from .bulk import BulkWriteMixin
+from .insights_cache import cache_stats, versioned_cache
+from .jobs import job_data
+from .membership import LABOURER, FarmScopedQuerysetMixin, get_membership
+from .pagination import KeysetPagination
 from .permissions import IsFarmOwner, IsFarmMember
 from .serializers import (
     FarmSerializer,
@@ -35,9 +42,6 @@ from .serializers import (
     FeedSerializer,
 )
 
-import requests
-import os
-
 
 class FarmViewSet(viewsets.ModelViewSet):
     serializer_class = FarmSerializer
@@ -62,11 +66,12 @@ class LabourerViewSet(viewsets.ModelViewSet):
     serializer_class = LabourerSerializer
 
     def get_queryset(self):
-        user = self.request.user
-        if hasattr(user, "owned_farm"):
-            return Labourer.objects.filter(farm=user.owned_farm)
-        elif hasattr(user, "labourer_profile"):
-            return Labourer.objects.filter(user=user)
+        membership = get_membership(self.request)
+        queryset = Labourer.objects.select_related("user", "farm")
+        if membership.is_owner:
+            return queryset.filter(farm_id=membership.farm_id)
+        elif membership.role == LABOURER:
+            return queryset.filter(user=self.request.user)
         return Labourer.objects.none()
 
     def get_permissions(self):
@@ -75,7 +80,7 @@ class LabourerViewSet(viewsets.ModelViewSet):
         return [IsAuthenticated(), IsFarmMember()]
 
     def perform_create(self, serializer):
-        if hasattr(self.request.user, "labourer_profile"):
+        if get_membership(self.request).role == LABOURER:
             raise PermissionDenied("You already have a labourer profile.")
         serializer.save(user=self.request.user, status="pending", farm=None)
 
@@ -193,6 +198,19 @@ class FeedViewSet(viewsets.ModelViewSet):
         return Feed.objects.all()
 
 
+class MetricsViewSet(viewsets.ViewSet):
+    permission_classes = [IsAuthenticated, IsAdminUser]
+
+    @action(detail=False, methods=["GET"], url_path="insights-cache")
+    def insights_cache(self, request):
+        return Response(cache_stats())
+
+    @action(detail=False, methods=["GET"], url_path="llm")
+    def llm_stats(self, request):
+        """Circuit breaker state, in-flight calls and queue depth for this process."""
+        return Response({**llm.stats(), "queued_jobs": InsightJob.objects.filter(status="queued").count()})
+
+
 class AMUInsightsViewSet(viewsets.ViewSet):
     permission_classes = [
         IsAuthenticated,
@@ -200,6 +218,7 @@ class AMUInsightsViewSet(viewsets.ViewSet):
     ]
 
     @action(detail=False, methods=["GET"], url_path="chart-data")
+    @versioned_cache("amu")
     def chart_data(self, request):
         livestock_id = request.query_params.get("livestock_id")
         if not livestock_id:
@@ -209,56 +228,35 @@ class AMUInsightsViewSet(viewsets.ViewSet):
             )
 
         try:
-            livestock = Livestock.objects.get(pk=livestock_id, farm__owner=request.user)
+            livestock = Livestock.objects.get(
+                pk=livestock_id, farm_id=get_membership(request).owned_farm_id
+            )
         except Livestock.DoesNotExist:
             return Response(
                 {"detail": "Livestock not found or you don't own it."},
                 status=status.HTTP_404_NOT_FOUND,
             )
 
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=365)
+        window = parse_window(request.query_params)
+        axis = window.axis()
 
-        amu_records = AMURecord.objects.filter(
-            health_record__livestock_id=livestock_id,
-            health_record__event_date__gte=start_date,
-            health_record__event_date__lte=end_date,
-        )
-
-        monthly_usage = (
-            amu_records.annotate(month=TruncMonth("health_record__event_date"))
-            .values("month", "drug__name")
-            .annotate(count=Count("id"))
-            .order_by("month", "drug__name")
+        # At most one row per (bucket, drug), grouped in the database.
+        usage = list(
+            AMU_SOURCE.rows(
+                window, ["drug_id", "drug__name"], livestock_id=livestock_id
+            )
         )
 
         chart_data = {"labels": [], "datasets": []}
 
-        drugs = Drug.objects.filter(
-            id__in=amu_records.values_list("drug_id", flat=True)
-        ).distinct()
-        drug_datasets = {drug.name: [] for drug in drugs}
-
-        months = []
-        current = start_date
-        while current <= end_date:
-            month_str = current.strftime("%Y-%m")
-            months.append(month_str)
-            for drug_data in drug_datasets.values():
-                drug_data.append(0)
-            current = (current.replace(day=1) + timedelta(days=32)).replace(day=1)
-
-        for record in monthly_usage:
-            month_str = record["month"].strftime("%Y-%m")
-            if month_str in months:
-                month_index = months.index(month_str)
-                drug_name = record["drug__name"]
-                if drug_name in drug_datasets:
-                    drug_datasets[drug_name][month_index] = record["count"]
-
-        formatted_labels = [
-            datetime.strptime(m, "%Y-%m").strftime("%b %Y") for m in months
-        ]
+        # AMU records without a drug are counted in the total but get no series.
+        with_drug = sorted(
+            (row for row in usage if row[1] is not None), key=lambda row: row[1]
+        )
+        drug_names = {row[1]: row[2] for row in with_drug}
+        drug_datasets = dense_series(axis, with_drug, name=lambda row: row[2], cast=int)
+
+        formatted_labels = window.labels(axis)
         chart_data["labels"] = formatted_labels
 
         colors = [
@@ -288,461 +286,188 @@ class AMUInsightsViewSet(viewsets.ViewSet):
         return Response(
             {
                 "chart_data": chart_data,
+                "buckets": [start.isoformat() for start in axis],
                 "summary": {
-                    "total_treatments": amu_records.count(),
-                    "unique_drugs": len(drugs),
+                    "total_treatments": sum(row[3] for row in usage),
+                    "unique_drugs": len(drug_names),
+                    "window": window.as_dict(),
                     "time_period": f"{formatted_labels[0]} to {formatted_labels[-1]}",
                 },
             }
         )
 
-    @action(detail=False, methods=["post"], url_path="generate")
-    def generate_insights(self, request):
-        livestock_id = request.data.get("livestock_id")
+    @action(detail=False, methods=["GET"], url_path="farm-chart-data")
+    @versioned_cache("farm-amu", scope="farm")
+    def farm_chart_data(self, request):
+        return farm_chart_data(request, AMU_SOURCE, "Treatments")
 
-        if not livestock_id:
-            return Response(
-                {"detail": "livestock_id is required."},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
-
-        try:
-            livestock = Livestock.objects.get(pk=livestock_id, farm__owner=request.user)
-        except Livestock.DoesNotExist:
-            return Response(
-                {"detail": "Livestock not found or you don't own it."},
-                status=status.HTTP_404_NOT_FOUND,
-            )
-
-        amu_records = AMURecord.objects.filter(
-            health_record__livestock=livestock
-        ).order_by("-health_record__event_date")[:5]
-        health_records = HealthRecord.objects.filter(livestock=livestock).order_by(
-            "-event_date"
-        )[:5]
-
-        livestock_data = LivestockSerializer(livestock).data
-        amu_data = AMURecordSerializer(amu_records, many=True).data
-        health_data = HealthRecordSerializer(health_records, many=True).data
-
-        prompt = f"""
-        Analyze the following data for a livestock animal and provide insights on AMU (Antimicrobial Usage).
-        Determine if the current drug dosages are correct based on recommended ranges and animal weight.
-        If not correct, suggest adjustments (e.g., bring the dosage up or down by X quantity).
-        Also, provide any additional relevant insights about the animal's health and drug usage.
-
-        Livestock Details:
-        - Species: {livestock_data.get("species")}
-        - Breed: {livestock_data.get("breed")}
-        - Gender: {livestock_data.get("gender")}
-        - Current Weight (kg): {livestock_data.get("current_weight_kg")}
-        - Health Status: {livestock_data.get("health_status")}
-
-        Recent Health Records:
-        {health_data}
-
-        Recent AMU Records:
-        {amu_data}
-
-        Recommended Drug Information (if available in AMU records):
-        """
+    @action(
+        detail=False,
+        methods=["GET"],
+        url_path=r"jobs/(?P<job_id>\d+)",
+        url_name="job",
+    )
+    def job(self, request, job_id=None):
+        """Poll a job queued by ``generate`` with ``async: true``."""
+        job = get_object_or_404(
+            InsightJob, pk=job_id, farm_id=get_membership(request).owned_farm_id
+        )
+        return Response(job_data(job))
 
-        for amu_record in amu_records:
-            if amu_record.drug:
-                drug_info = DrugSerializer(amu_record.drug).data
-                prompt += f"""
-                - Drug Name: {drug_info.get("name")}
-                - Active Ingredient: {drug_info.get("active_ingredient")}
-                - Species Target: {drug_info.get("species_target")}
-                - Recommended Dosage Min: {drug_info.get("recommended_dosage_min")} {drug_info.get("unit")}
-                """
 
-        try:
-            api_key = os.environ.get("GROQ_API_KEY", "").strip()
-            model = os.environ.get("GROQ_MODEL", "llama-3.3-70b-versatile").strip()
-            url = "https://api.groq.com/openai/v1/chat/completions"
-
-            if not api_key:
-                return Response(
-                    {
-                        "insights": "Error generating insights: GROQ_API_KEY is not set.",
-                    },
-                    status=status.HTTP_200_OK,
-                )
-
-            headers = {
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {api_key}",
-            }
+class LivestockViewSet(FarmScopedQuerysetMixin, viewsets.ModelViewSet):
+    queryset = Livestock.objects.all()
+    serializer_class = LivestockSerializer
+    permission_classes = [IsAuthenticated, IsFarmMember]
+    pagination_class = KeysetPagination
+    ordering = ("id",)
 
-            data = {
-                "model": model,
-                "messages": [
-                    {
-                        "role": "system",
-                        "content": "You are an expert veterinary assistant specializing in livestock health and antimicrobial usage (AMU) analysis.",
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt,
-                    },
-                ],
-                "temperature": 0.7,
-                "max_tokens": 1500,
-            }
+    def perform_create(self, serializer):
+        membership = get_membership(self.request)
+        if not membership.is_owner:
+            raise PermissionDenied("Only farm owners can add livestock.")
+        serializer.save(farm_id=membership.farm_id)
 
-            max_retries = 3
-            insights = "No insights generated."
-
-            for attempt in range(max_retries):
-                try:
-                    response = requests.post(
-                        url, json=data, headers=headers, timeout=30
-                    )
-
-                    if response.status_code == 200:
-                        result = response.json()
-                        try:
-                            insights = result["choices"][0]["message"]["content"]
-                        except (KeyError, IndexError):
-                            insights = "AI generated an empty response."
-                        break
-                    else:
-                        if attempt == max_retries - 1:
-                            insights = f"Error generating insights: {response.status_code} - {response.text}"
-                        else:
-                            continue
-
-                except requests.exceptions.RequestException as e:
-                    if attempt == max_retries - 1:
-                        insights = f"Error generating insights: {str(e)}"
-                    else:
-                        continue
-
-        except Exception as e:
-            insights = f"Error generating insights: {str(e)}"
-
-        return Response({"insights": insights}, status=status.HTTP_200_OK)
-
-    @action(detail=False, methods=["post"], url_path="parse-voice")
-    def parse_voice_input(self, request):
+    @action(detail=False, methods=["GET", "POST"], url_path="resolve-tags")
+    def resolve_tags(self, request):
         """
-        Parse voice transcript using Groq AI to extract form information
+        Resolve tags, or spoken variants like "cow one", to animals on the
+        caller's farm: ``?tag=...`` (repeatable) or POST ``{"tags": [...]}``.
+        Each result has ``id`` and ``tag_id`` (null when unresolved), how it
+        matched, and the ``candidates`` when it was ambiguous.
         """
-        transcript = request.data.get("transcript", "")
-        form_type = request.data.get("form_type", "livestock")
-        language = request.data.get("language", "en")
+        farm_id = get_membership(request).approved_farm_id
+        if farm_id is None:
+            raise PermissionDenied("You are not a member of a farm.")
 
-        if not transcript:
+        if request.method == "POST":
+            tags = request.data.get("tags") if isinstance(request.data, dict) else None
+        else:
+            tags = request.query_params.getlist("tag")
+        if not isinstance(tags, list) or not tags or not all(isinstance(t, str) for t in tags):
             return Response(
-                {"error": "Transcript is required"}, status=status.HTTP_400_BAD_REQUEST
+                {"detail": "Expected a non-empty list of tags."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if len(tags) > BulkWriteMixin.bulk_max_items:
+            return Response(
+                {"detail": f"At most {BulkWriteMixin.bulk_max_items} tags per request."},
+                status=status.HTTP_400_BAD_REQUEST,
             )
 
-        form_fields = self.get_form_fields(form_type)
-
-        prompt = f"""You are an expert livestock management assistant. I need you to parse the following voice transcript and extract {form_type} information in a structured JSON format.
-            Voice Transcript: "{transcript}"
-
-            The transcript language code is "{language}". If the transcript is not in English, first translate it to English accurately, then extract the fields.
-
-            Please analyze this transcript and extract the following information:
-            {form_fields["description"]}
-
-            Expected fields:
-            {form_fields["fields"]}
-
-            Important:
-            - Return ONLY a valid JSON object.
-            - Do NOT add markdown formatting like ```json.
-            
-            Example response format:
-            {form_fields["example"]}
-            """
+        matches = tag_index.resolve_tags(farm_id, tags)
+        return Response({"results": [match.as_dict() for match in matches]})
 
+    @action(detail=False, methods=["GET"], url_path="under-withdrawal")
+    def under_withdrawal(self, request):
+        """
+        Animals on the caller's farm whose products are unsafe on ``?date=``
+        (YYYY-MM-DD, default today), with the treatments keeping them so
+        and ``safe_from``, the first day all of them have ended.
+        """
+        farm_id = get_membership(request).approved_farm_id
+        if farm_id is None:
+            raise PermissionDenied("You are not a member of a farm.")
         try:
-            api_key = os.environ.get("GROQ_API_KEY", "").strip()
-            model = os.environ.get("GROQ_MODEL", "llama-3.3-70b-versatile").strip()
-            url = "https://api.groq.com/openai/v1/chat/completions"
-
-            if not api_key:
-                return Response(
-                    {"error": "GROQ_API_KEY is not set."},
-                    status=status.HTTP_400_BAD_REQUEST,
-                )
-
-            headers = {
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {api_key}",
-            }
-
-            data = {
-                "model": model,
-                "messages": [
-                    {
-                        "role": "system",
-                        "content": "You extract structured fields from livestock management transcripts and always return valid JSON.",
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt,
-                    },
-                ],
-                "temperature": 0.1,
-                "max_tokens": 1000,
-                "response_format": {"type": "json_object"},
-            }
-
-            max_retries = 3
-            parsed_data = None
-
-            for attempt in range(max_retries):
-                try:
-                    response = requests.post(
-                        url, json=data, headers=headers, timeout=30
-                    )
-
-                    if response.status_code == 200:
-                        result = response.json()
-                        try:
-                            ai_response = result["choices"][0]["message"]["content"].strip()
-                        except (KeyError, IndexError):
-                            parsed_data = {"error": "AI returned empty response"}
-                            break
-
-                        # Try to parse the JSON response
-                        try:
-                            import json
-
-                            if ai_response.startswith("```json"):
-                                ai_response = ai_response.replace(
-                                    "```json", ""
-                                ).replace("```", "")
-
-                            parsed_data = json.loads(ai_response)
-                            break
-                        except json.JSONDecodeError:
-                            import re
-
-                            json_match = re.search(r"\{.*\}", ai_response, re.DOTALL)
-                            if json_match:
-                                parsed_data = json.loads(json_match.group())
-                                break
-                            else:
-                                if attempt == max_retries - 1:
-                                    parsed_data = {
-                                        "error": "Could not parse AI response as JSON"
-                                    }
-                                continue
-                    else:
-                        if attempt == max_retries - 1:
-                            parsed_data = {
-                                "error": f"API error: {response.status_code} - {response.text}"
-                            }
-                        continue
-
-                except requests.exceptions.RequestException as e:
-                    if attempt == max_retries - 1:
-                        parsed_data = {"error": f"Request error: {str(e)}"}
-                    continue
-
-            if parsed_data is None:
-                parsed_data = {"error": "Failed to parse voice input"}
-
-        except Exception as e:
-            parsed_data = {"error": f"Error processing voice input: {str(e)}"}
-
-        return Response(parsed_data, status=status.HTTP_200_OK)
-
-    def get_form_fields(self, form_type):
-        """Get form-specific field definitions for AI parsing"""
-        form_definitions = {
-            "livestock": {
-                "description": """
-- tag_id: Animal identification tag/ID
-- species: Animal species (cow, buffalo, goat, sheep, chicken, pig)
-- breed: Animal breed name
-- gender: Gender (M for male, F for female)
-- health_status: Health status (healthy, sick, recovering)
-- current_weight_kg: Weight in kilograms
-- date_of_birth: Birth date in YYYY-MM-DD format
-                """,
-                "fields": """
-- tag_id: String (required) - Animal identification
-- species: String (required) - Animal species
-- breed: String (required) - Animal breed
-- gender: String (required) - M or F
-- health_status: String (required) - healthy, sick, or recovering
-- current_weight_kg: Decimal (optional) - Weight in kg
-- date_of_birth: Date (required) - Birth date
-                """,
-                "example": '{\n  "tag_id": "COW-001",\n  "species": "cow",\n  "breed": "Holstein",\n  "gender": "F",\n  "health_status": "healthy",\n  "current_weight_kg": 500,\n  "date_of_birth": "2023-01-15"\n}',
-            },
-            "health": {
-                "description": """
-- livestock: Livestock ID or tag
-- event_type: Event type (vaccination, sickness, check-up, treatment)
-- event_date: Event date in YYYY-MM-DD format
-- notes: Additional notes
-- diagnosis: Medical diagnosis
-- treatment_outcome: Treatment outcome (recovered, ongoing, completed)
-                """,
-                "fields": """
-- livestock: String (required) - Livestock ID
-- event_type: String (required) - vaccination, sickness, check-up, treatment
-- event_date: Date (required) - Event date
-- notes: String (optional) - Additional notes
-- diagnosis: String (optional) - Medical diagnosis
-- treatment_outcome: String (optional) - Treatment outcome
-                """,
-                "example": '{\n  "livestock": "COW-001",\n  "event_type": "vaccination",\n  "event_date": "2024-01-15",\n  "notes": "Routine vaccination",\n  "diagnosis": "Preventive care",\n  "treatment_outcome": "completed"\n}',
-            },
-            "feed_record": {
-                "description": """
-- livestock: Livestock ID or tag
-- feed_type: Type of feed (hay, grass, silage, concentrate, grain, etc.)
-- feed: Feed name or brand
-- quantity_kg: Quantity in kilograms
-- price_per_kg: Price per kilogram
-- date: Feeding date in YYYY-MM-DD format
-                """,
-                "fields": """
-- livestock: String (required) - Livestock ID
-- feed_type: String (required) - Feed type
-- feed: String (required) - Feed name
-- quantity_kg: Decimal (required) - Quantity in kg
-- price_per_kg: Decimal (required) - Price per kg
-- date: Date (required) - Feeding date
-                """,
-                "example": '{\n  "livestock": "COW-001",\n  "feed_type": "hay",\n  "feed": "Alfalfa hay",\n  "quantity_kg": 10.0,\n  "price_per_kg": 50.0,\n  "date": "2024-01-15"\n}',
-            },
-            "yield_record": {
-                "description": """
-- livestock: Livestock ID or tag (e.g., COW-123)
-- yield_type: Type of yield (milk, eggs, wool, meat, etc.)
-- quantity: Yield quantity (numeric)
-- unit: Unit of measure (e.g., liters, kg, pieces)
-- quality_grade: Quality grade (A, B, C) (optional)
-- date: Yield date (accept natural formats like 9 26 2023 or YYYY-MM-DD)
-- notes: Additional notes (optional)
-                """,
-                "fields": """
-- livestock: String (required) - Livestock ID
-- yield_type: String (required) - Yield type
-- quantity: Decimal (required) - Yield quantity
-- unit: String (required) - Unit of measure (liters, kg, pieces)
-- quality_grade: String (optional) - Quality grade
-- date: Date (required) - Yield date in YYYY-MM-DD
-- notes: String (optional) - Additional notes
-                """,
-                "example": '{\n  "livestock": "COW-123",\n  "yield_type": "milk",\n  "quantity": 15,\n  "unit": "liters",\n  "quality_grade": "A",\n  "date": "2023-09-26",\n  "notes": "Morning milking"\n}',
-            },
-            "drug": {
-                "description": """
-- name: Drug name
-- active_ingredient: Active ingredient
-- unit: Measurement unit (e.g., ml, mg, tablet)
-- notes: Additional notes (e.g., manufacturer, remarks)
-                """,
-                "fields": """
-- name: String (required) - Drug name
-- active_ingredient: String (required) - Active ingredient
-- unit: String (optional) - Measurement unit
-- notes: String (optional) - Notes or manufacturer details
-                """,
-                "example": '{\n  "name": "Penicillin",\n  "active_ingredient": "Penicillin",\n  "unit": "ml",\n  "notes": "Manufactured by ABC Pharma"\n}',
-            },
-            "feed": {
-                "description": """
-- name: Feed name
-- cost_per_kg: Price per kilogram
-- notes: Additional notes or remarks (optional)
-                """,
-                "fields": """
-- name: String (required) - Feed name
-- cost_per_kg: Decimal (required) - Price per kg
-- notes: String (optional) - Additional notes or remarks
-                """,
-                "example": '{\n  "name": "Sunflower seeds",\n  "cost_per_kg": 500.0,\n  "notes": "Do not buy them; they are expensive."\n}',
-            },
-        }
-
-        return form_definitions.get(form_type, form_definitions["livestock"])
-
-
-class LivestockViewSet(viewsets.ModelViewSet):
-    serializer_class = LivestockSerializer
-    permission_classes = [IsAuthenticated, IsFarmMember]
-
-    def get_queryset(self):
-        user = self.request.user
-        if hasattr(user, "owned_farm"):
-            return Livestock.objects.filter(farm=user.owned_farm)
-        elif hasattr(user, "labourer_profile") and user.labourer_profile.farm:
-            return Livestock.objects.filter(farm=user.labourer_profile.farm)
-        return Livestock.objects.none()
-
-    def perform_create(self, serializer):
-        user = self.request.user
-        if not hasattr(user, "owned_farm"):
-            raise PermissionDenied("Only farm owners can add livestock.")
-        serializer.save(farm=user.owned_farm)
-
+            day = date.fromisoformat(request.query_params.get("date") or date.today().isoformat())
+        except ValueError:
+            return Response(
+                {"detail": "date must be in YYYY-MM-DD format."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
 
-class HealthRecordViewSet(viewsets.ModelViewSet):
+        intervals = (
+            withdrawal.active_intervals(farm_id, day)
+            .select_related("livestock", "drug")
+            .order_by("livestock__tag_id", "ends_on")
+        )
+        animals = {}
+        for interval in intervals:
+            entry = animals.setdefault(interval.livestock_id, {
+                "livestock_id": interval.livestock_id,
+                "tag_id": interval.livestock.tag_id,
+                "species": interval.livestock.species,
+                "safe_from": interval.ends_on,
+                "treatments": [],
+            })
+            entry["safe_from"] = max(entry["safe_from"], interval.ends_on)
+            entry["treatments"].append({
+                "amu_record": interval.amu_record_id,
+                "drug": interval.drug.name if interval.drug else None,
+                "start": interval.start,
+                "ends_on": interval.ends_on,
+            })
+        return Response({"date": day, "count": len(animals), "results": list(animals.values())})
+
+
+class HealthRecordViewSet(FarmScopedQuerysetMixin, BulkWriteMixin, viewsets.ModelViewSet):
+    queryset = HealthRecord.objects.prefetch_related(
+        Prefetch("amu_records", queryset=AMURecord.objects.select_related("drug"))
+    )
     serializer_class = HealthRecordSerializer
     permission_classes = [IsAuthenticated, IsFarmMember]
-
-    def get_queryset(self):
-        user = self.request.user
-        if hasattr(user, "owned_farm"):
-            return HealthRecord.objects.filter(livestock__farm=user.owned_farm)
-        elif hasattr(user, "labourer_profile") and user.labourer_profile.farm:
-            return HealthRecord.objects.filter(
-                livestock__farm=user.labourer_profile.farm
-            )
-        return HealthRecord.objects.none()
+    pagination_class = KeysetPagination
+    ordering = ("-event_date", "-id")
 
 
-class AMURecordViewSet(viewsets.ModelViewSet):
+class AMURecordViewSet(FarmScopedQuerysetMixin, viewsets.ModelViewSet):
+    # health_record is needed for the pagination cursor (event_date).
+    queryset = AMURecord.objects.select_related("drug", "health_record")
     serializer_class = AMURecordSerializer
     permission_classes = [IsAuthenticated, IsFarmMember]
+    pagination_class = KeysetPagination
+    ordering = ("-health_record__event_date", "-id")
 
-    def get_queryset(self):
-        user = self.request.user
-        if hasattr(user, "owned_farm"):
-            return AMURecord.objects.filter(
-                health_record__livestock__farm=user.owned_farm
+    @action(detail=False, methods=["GET"], url_path="dosage-check")
+    def dosage_check(self, request):
+        """
+        Every treatment on the caller's farm checked against its drug's
+        recommended dosage per kg of the animal's current weight, newest
+        first. Filter with ``livestock_id`` and ``status=ok,under,over,unknown``.
+        """
+        farm_id = get_membership(request).approved_farm_id
+        if farm_id is None:
+            raise PermissionDenied("You are not a member of a farm.")
+
+        livestock_id = request.query_params.get("livestock_id")
+        wanted = [s for s in request.query_params.get("status", "").split(",") if s]
+        if livestock_id is not None and not livestock_id.isdigit():
+            return Response(
+                {"detail": "livestock_id must be an id."}, status=status.HTTP_400_BAD_REQUEST
             )
-        elif hasattr(user, "labourer_profile") and user.labourer_profile.farm:
-            return AMURecord.objects.filter(
-                health_record__livestock__farm=user.labourer_profile.farm
+        if any(s not in dosage.STATUSES for s in wanted):
+            return Response(
+                {"detail": f"status must be among: {', '.join(dosage.STATUSES)}."},
+                status=status.HTTP_400_BAD_REQUEST,
             )
-        return AMURecord.objects.none()
+
+        checks = dosage.farm_dose_checks(
+            farm_id, int(livestock_id) if livestock_id is not None else None
+        )
+        summary = dict.fromkeys(dosage.STATUSES, 0)
+        for check in checks:
+            summary[check["status"]] += 1
+        if wanted:
+            checks = [check for check in checks if check["status"] in wanted]
+        return Response({"summary": summary, "count": len(checks), "results": checks})
 
 
-class FeedRecordViewSet(viewsets.ModelViewSet):
+class FeedRecordViewSet(FarmScopedQuerysetMixin, BulkWriteMixin, viewsets.ModelViewSet):
+    queryset = FeedRecord.objects.select_related("feed")
     serializer_class = FeedRecordSerializer
     permission_classes = [IsAuthenticated, IsFarmMember]
-
-    def get_queryset(self):
-        user = self.request.user
-        if hasattr(user, "owned_farm"):
-            return FeedRecord.objects.filter(livestock__farm=user.owned_farm)
-        elif hasattr(user, "labourer_profile") and user.labourer_profile.farm:
-            return FeedRecord.objects.filter(livestock__farm=user.labourer_profile.farm)
-        return FeedRecord.objects.none()
+    pagination_class = KeysetPagination
+    ordering = ("-date", "-id")
+    # An unrecognised feed name is dropped; feed_type still records it.
+    voice_lookups = {
+        **BulkWriteMixin.voice_lookups,
+        "feed": (Feed, "name", False),
+    }
 
 
-class YieldRecordViewSet(viewsets.ModelViewSet):
+class YieldRecordViewSet(FarmScopedQuerysetMixin, BulkWriteMixin, viewsets.ModelViewSet):
+    queryset = YieldRecord.objects.all()
     serializer_class = YieldRecordSerializer
     permission_classes = [IsAuthenticated, IsFarmMember]
-
-    def get_queryset(self):
-        user = self.request.user
-        if hasattr(user, "owned_farm"):
-            return YieldRecord.objects.filter(livestock__farm=user.owned_farm)
-        elif hasattr(user, "labourer_profile") and user.labourer_profile.farm:
-            return YieldRecord.objects.filter(
-                livestock__farm=user.labourer_profile.farm
-            )
-        return YieldRecord.objects.none()
+    pagination_class = KeysetPagination
+    ordering = ("-date", "-id")
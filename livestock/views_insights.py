@@ -1,183 +1,117 @@
-from django.db.models import Count, Sum, F, DecimalField, Value, ExpressionWrapper
-from django.db.models.functions import TruncMonth, Coalesce
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from datetime import datetime, timedelta
-from .models import AMURecord, Drug, FeedRecord, YieldRecord
+from django.conf import settings
+from .models import Livestock, YieldAnomalyState
+from . import analytics, anomalies
+from .insights_cache import versioned_cache
+from .membership import get_membership
 from .permissions import IsFarmMember
-
-
-class AMUInsightsViewSet(viewsets.ViewSet):
-    permission_classes = [IsAuthenticated, IsFarmMember]
-
-    @action(detail=False, methods=['GET'], url_path='chart-data')
-    def chart_data(self, request):
-        livestock_id = request.query_params.get('livestock_id')
-        if not livestock_id:
-            return Response({"error": "Livestock ID is required"}, status=400)
-
-
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=365)
-
-
-        amu_records = AMURecord.objects.filter(
-            health_record__livestock_id=livestock_id,
-            health_record__event_date__gte=start_date,
-            health_record__event_date__lte=end_date
-        )
-
-
-        monthly_usage = (
-            amu_records
-            .annotate(month=TruncMonth('health_record__event_date'))
-            .values('month', 'drug__name')
-            .annotate(count=Count('id'))
-            .order_by('month', 'drug__name')
+from .buckets import FEED_SOURCE, YIELD_SOURCE, dense_series, parse_window
+
+
+FARM_BREAKDOWNS = {
+    'species': 'livestock__species',
+    'animal': 'livestock__tag_id',
+}
+
+
+def farm_chart_data(request, source, label, **filters):
+    """
+    Totals of ``source`` per time bucket over a farm's rows in one GROUP BY.
+
+    `breakdown=species|animal` splits the series; `livestock_ids=1,2,3`
+    restricts it to those animals and defaults to a per-animal breakdown so
+    they can be compared side by side. `start`, `end` and `granularity` set
+    the buckets (see livestock.buckets).
+    """
+    farm_id = get_membership(request).approved_farm_id
+    if farm_id is None:
+        return Response({"detail": "You are not a member of a farm."}, status=status.HTTP_403_FORBIDDEN)
+
+    livestock_ids = request.query_params.get('livestock_ids')
+    breakdown = request.query_params.get('breakdown') or ('animal' if livestock_ids else None)
+    if breakdown and breakdown not in FARM_BREAKDOWNS:
+        return Response(
+            {"error": f"breakdown must be one of: {', '.join(FARM_BREAKDOWNS)}"},
+            status=status.HTTP_400_BAD_REQUEST,
         )
 
+    window = parse_window(request.query_params)
+
+    if livestock_ids:
+        try:
+            ids = [int(pk) for pk in livestock_ids.split(',') if pk.strip()]
+        except ValueError:
+            return Response({"error": "livestock_ids must be a comma-separated list of ids"}, status=status.HTTP_400_BAD_REQUEST)
+        filters['livestock_id__in'] = ids
+
+    dimensions = [FARM_BREAKDOWNS[breakdown]] if breakdown else []
+    rows = source.rows(window, dimensions, farm_id=farm_id, **filters)
+
+    axis = window.axis()
+    series = dense_series(axis, rows, name=lambda row: row[1] if breakdown else label)
+    totals = [round(sum(column), 2) for column in zip(*series.values())] or [0.0] * len(axis)
+
+    colors = ['#36A2EB', '#FF6384', '#4BC0C0', '#9966FF', '#FF9F40', '#1976d2', '#2e7d32', '#ed6c02']
+    datasets = []
+    for i, (name, values) in enumerate(series.items()):
+        datasets.append({
+            'label': name,
+            'data': values,
+            'backgroundColor': colors[i % len(colors)],
+            'borderColor': colors[i % len(colors)],
+            'fill': False,
+        })
 
-        chart_data = {
-            'labels': [],
-            'datasets': []
+    formatted_labels = window.labels(axis)
+
+    return Response({
+        'labels': formatted_labels,
+        'buckets': [start.isoformat() for start in axis],
+        'datasets': datasets,
+        'totals': totals,
+        'summary': {
+            'total': round(sum(totals), 2),
+            'breakdown': breakdown,
+            'window': window.as_dict(),
+            'time_period': f"{formatted_labels[0]} to {formatted_labels[-1]}"
         }
-
-
-        drugs = Drug.objects.filter(
-            id__in=amu_records.values_list('drug_id', flat=True)
-        ).distinct()
-        drug_datasets = {drug.name: [] for drug in drugs}
-
-
-        months = []
-        current = start_date
-        while current <= end_date:
-            month_str = current.strftime('%Y-%m')
-            months.append(month_str)
-            for drug_data in drug_datasets.values():
-                drug_data.append(0)
-            current = (current.replace(day=1) + timedelta(days=32)).replace(day=1)
-
-
-        for record in monthly_usage:
-            month_str = record['month'].strftime('%Y-%m')
-            if month_str in months:
-                month_index = months.index(month_str)
-                drug_name = record['drug__name']
-                if drug_name in drug_datasets:
-                    drug_datasets[drug_name][month_index] = record['count']
-
-
-        formatted_labels = [datetime.strptime(m, '%Y-%m').strftime('%b %Y') for m in months]
-        chart_data['labels'] = formatted_labels
-
-
-        colors = [
-            '#FF6384', '#36A2EB', '#FFCE56', '#4BC0C0', '#9966FF',
-            '#FF9F40', '#FF6384', '#C9CBCF', '#4BC0C0', '#FF9F40'
-        ]
-
-
-        for i, (drug_name, counts) in enumerate(drug_datasets.items()):
-            dataset = {
-                'label': drug_name,
-                'data': counts,
-                'backgroundColor': colors[i % len(colors)],
-                'borderColor': colors[i % len(colors)],
-                'borderWidth': 1,
-                'fill': False
-            }
-            chart_data['datasets'].append(dataset)
-
-        return Response({
-            'chart_data': chart_data,
-            'summary': {
-                'total_treatments': amu_records.count(),
-                'unique_drugs': len(drugs),
-                'time_period': f"{formatted_labels[0]} to {formatted_labels[-1]}"
-            }
-        })
+    })
 
 
 class FeedInsightsViewSet(viewsets.ViewSet):
     permission_classes = [IsAuthenticated, IsFarmMember]
 
     @action(detail=False, methods=['GET'], url_path='chart-data')
+    @versioned_cache('feed')
     def chart_data(self, request):
         livestock_id = request.query_params.get('livestock_id')
         if not livestock_id:
             return Response({"error": "Livestock ID is required"}, status=status.HTTP_400_BAD_REQUEST)
 
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=365)
-
-        qs = FeedRecord.objects.filter(
-            livestock_id=livestock_id,
-            date__gte=start_date,
-            date__lte=end_date,
-        )
-
-
-        price_decimal = Coalesce(
-            'price_per_kg',
-            F('feed__cost_per_kg'),
-            Value(0),
-            output_field=DecimalField(max_digits=10, decimal_places=2)
-        )
-        cost_expr = ExpressionWrapper(
-            F('quantity_kg') * price_decimal,
-            output_field=DecimalField(max_digits=12, decimal_places=2)
-        )
-        monthly_spend = (
-            qs.annotate(month=TruncMonth('date'))
-              .annotate(cost=cost_expr)
-              .values('month')
-              .annotate(total_spend=Sum('cost'))
-              .order_by('month')
-        )
-
-
-        breakdown = (
-            qs.annotate(month=TruncMonth('date'))
-              .annotate(cost=cost_expr)
-              .values('month', 'feed__name', 'feed_type')
-              .annotate(total_spend=Sum('cost'))
-              .order_by('month', 'feed__name', 'feed_type')
-        )
-
+        window = parse_window(request.query_params)
+        axis = window.axis()
 
-        months = []
-        current = start_date
-        while current <= end_date:
-            months.append(current.strftime('%Y-%m'))
-            current = (current.replace(day=1) + timedelta(days=32)).replace(day=1)
-
-
-        spend_map = {m['month'].strftime('%Y-%m'): float(m['total_spend'] or 0) for m in monthly_spend}
-        spend_series = [spend_map.get(m, 0.0) for m in months]
-
-
-        by_feed = {}
-        for row in breakdown:
-            month_key = row['month'].strftime('%Y-%m')
-            feed_name = row['feed__name'] or row['feed_type'] or 'Unknown'
-            by_feed.setdefault(feed_name, {m: 0.0 for m in months})
-            by_feed[feed_name][month_key] = float(row['total_spend'] or 0)
+        # At most one row per (bucket, feed), grouped in the database.
+        rows = FEED_SOURCE.rows(window, ['feed_name'], livestock_id=livestock_id)
+        by_feed = dense_series(axis, rows, name=lambda row: row[1])
+        spend_series = [round(sum(column), 2) for column in zip(*by_feed.values())] or [0.0] * len(axis)
 
         colors = ['#1976d2','#2e7d32','#ed6c02','#d32f2f','#6d4c41','#00897b','#7b1fa2','#5c6bc0']
         datasets = []
-        for i, (name, month_values) in enumerate(by_feed.items()):
+        for i, (name, values) in enumerate(by_feed.items()):
             datasets.append({
                 'label': name,
-                'data': [month_values[m] for m in months],
+                'data': values,
                 'backgroundColor': colors[i % len(colors)],
                 'borderColor': colors[i % len(colors)],
                 'stack': 'feed',
             })
 
-        formatted_labels = [datetime.strptime(m, '%Y-%m').strftime('%b %Y') for m in months]
+        formatted_labels = window.labels(axis)
+        avg_spend = round(sum(spend_series) / (len(spend_series) or 1), 2)
 
         return Response({
             'spend_chart': {
@@ -194,77 +128,221 @@ class FeedInsightsViewSet(viewsets.ViewSet):
                 'labels': formatted_labels,
                 'datasets': datasets
             },
+            'buckets': [start.isoformat() for start in axis],
             'summary': {
                 'total_spend': round(sum(spend_series), 2),
-                'avg_monthly_spend': round(sum(spend_series) / (len(spend_series) or 1), 2),
+                'avg_spend_per_bucket': avg_spend,
+                'avg_monthly_spend': avg_spend if window.granularity == 'month' else None,
+                'window': window.as_dict(),
                 'time_period': f"{formatted_labels[0]} to {formatted_labels[-1]}"
             }
         })
 
 
+    @action(detail=False, methods=['GET'], url_path='farm-chart-data')
+    @versioned_cache('farm-feed', scope='farm')
+    def farm_chart_data(self, request):
+        return farm_chart_data(request, FEED_SOURCE, 'Total Spend (₦)')
+
+
 class YieldInsightsViewSet(viewsets.ViewSet):
     permission_classes = [IsAuthenticated, IsFarmMember]
 
     @action(detail=False, methods=['GET'], url_path='chart-data')
+    @versioned_cache('yield')
     def chart_data(self, request):
         livestock_id = request.query_params.get('livestock_id')
         yield_type = request.query_params.get('yield_type')
         if not livestock_id:
             return Response({"error": "Livestock ID is required"}, status=status.HTTP_400_BAD_REQUEST)
 
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=365)
+        window = parse_window(request.query_params)
+        axis = window.axis()
 
-        qs = YieldRecord.objects.filter(
-            livestock_id=livestock_id,
-            date__gte=start_date,
-            date__lte=end_date,
-        )
+        # At most one row per (bucket, yield type, unit), grouped in the database.
+        filters = {'livestock_id': livestock_id}
         if yield_type:
-            qs = qs.filter(yield_type=yield_type)
-
-        monthly_yield = (
-            qs.annotate(month=TruncMonth('date'))
-              .values('month', 'unit', 'yield_type')
-              .annotate(total_qty=Sum('quantity'))
-              .order_by('month', 'yield_type')
-        )
-
-        months = []
-        current = start_date
-        while current <= end_date:
-            months.append(current.strftime('%Y-%m'))
-            current = (current.replace(day=1) + timedelta(days=32)).replace(day=1)
-
-
-        by_type = {}
-        unit = None
-        for row in monthly_yield:
-            month_key = row['month'].strftime('%Y-%m')
-            ytype = row['yield_type']
-            unit = unit or row['unit']
-            by_type.setdefault(ytype, {m: 0.0 for m in months})
-            by_type[ytype][month_key] = float(row['total_qty'] or 0)
+            filters['yield_type'] = yield_type
+        rows = list(YIELD_SOURCE.rows(window, ['yield_type', 'unit'], **filters))
+        unit = next((row[2] for row in rows), None)
+        by_type = dense_series(axis, rows, name=lambda row: row[1])
 
         colors = ['#36A2EB', '#FF6384', '#4BC0C0', '#9966FF', '#FF9F40']
         datasets = []
-        for i, (name, month_values) in enumerate(by_type.items()):
+        for i, (name, values) in enumerate(by_type.items()):
             datasets.append({
                 'label': f"{name} ({unit})" if unit else name,
-                'data': [month_values[m] for m in months],
+                'data': values,
                 'backgroundColor': colors[i % len(colors)],
                 'borderColor': colors[i % len(colors)],
                 'fill': False,
             })
 
-        formatted_labels = [datetime.strptime(m, '%Y-%m').strftime('%b %Y') for m in months]
+        formatted_labels = window.labels(axis)
 
         return Response({
             'labels': formatted_labels,
+            'buckets': [start.isoformat() for start in axis],
             'datasets': datasets,
             'summary': {
-                'total_yield': round(sum([sum(v.values()) for v in by_type.values()]), 2),
+                'total_yield': round(sum(sum(values) for values in by_type.values()), 2),
                 'types': list(by_type.keys()),
+                'window': window.as_dict(),
                 'time_period': f"{formatted_labels[0]} to {formatted_labels[-1]}"
             }
         })
+
+    @action(detail=False, methods=['GET'], url_path='farm-chart-data')
+    @versioned_cache('farm-yield', scope='farm')
+    def farm_chart_data(self, request):
+        yield_type = request.query_params.get('yield_type')
+        filters = {'yield_type': yield_type} if yield_type else {}
+        return farm_chart_data(request, YIELD_SOURCE, yield_type or 'Total Yield', **filters)
+
+    @action(detail=False, methods=['GET'], url_path='anomalies')
+    def anomalies(self, request):
+        """
+        Animals whose latest yield reading is an excursion (see
+        livestock.anomalies), most recently flagged first. Filter with
+        `yield_type` and `direction=drop|rise`.
+        """
+        farm_id = get_membership(request).approved_farm_id
+        if farm_id is None:
+            return Response({"detail": "You are not a member of a farm."}, status=status.HTTP_403_FORBIDDEN)
+
+        wanted = request.query_params.get('direction')
+        if wanted and wanted not in ('drop', 'rise'):
+            return Response({"error": "direction must be drop or rise"}, status=status.HTTP_400_BAD_REQUEST)
+
+        states = (
+            YieldAnomalyState.objects.filter(farm_id=farm_id, flagged=True)
+            .select_related('livestock')
+            .order_by('-flagged_since', 'livestock__tag_id')
+        )
+        yield_type = request.query_params.get('yield_type')
+        if yield_type:
+            states = states.filter(yield_type__iexact=yield_type)
+
+        results = []
+        for state in states:
+            state_direction = anomalies.direction(state)
+            if wanted and state_direction != wanted:
+                continue
+            results.append({
+                'livestock_id': state.livestock_id,
+                'tag_id': state.livestock.tag_id,
+                'species': state.livestock.species,
+                'yield_type': state.yield_type,
+                'unit': state.unit,
+                'direction': state_direction,
+                'flagged_since': state.flagged_since,
+                'last_date': state.last_date,
+                'last_quantity': state.last_quantity,
+                'mean': round(state.mean, 2),
+                'ewma': round(state.ewma, 2),
+                'z_score': round(state.z_score, 2) if state.z_score is not None else None,
+                'ewma_score': round(state.ewma_score, 2) if state.ewma_score is not None else None,
+                'readings': state.count,
+            })
+
+        return Response({
+            'count': len(results),
+            'thresholds': {
+                'z_score': anomalies.Z_THRESHOLD,
+                'ewma_score': anomalies.EWMA_THRESHOLD,
+                'min_history': anomalies.MIN_HISTORY,
+            },
+            'results': results,
+        })
+
+
+class ProfitabilityInsightsViewSet(viewsets.ViewSet):
+    permission_classes = [IsAuthenticated, IsFarmMember]
+
+    @action(detail=False, methods=['GET'], url_path='farm-data')
+    @versioned_cache('farm-profitability', scope='farm')
+    def farm_data(self, request):
+        """
+        Feed conversion, cost per unit and margins per animal, species and farm.
+
+        `start`/`end` set the window (default the last 365 days), `yield_type`
+        the yield counted (default Milk), `price` the revenue per unit of it
+        (default YIELD_PRICE_PER_UNIT) and `rolling_days` the trailing margin
+        window (default 30). See livestock.analytics.
+        """
+        farm_id = get_membership(request).approved_farm_id
+        if farm_id is None:
+            return Response({"detail": "You are not a member of a farm."}, status=status.HTTP_403_FORBIDDEN)
+
+        params = request.query_params
+        window = parse_window({'start': params.get('start'), 'end': params.get('end'), 'granularity': 'day'})
+        yield_type = params.get('yield_type') or 'Milk'
+        try:
+            price = float(params['price']) if params.get('price') else settings.YIELD_PRICE_PER_UNIT
+            rolling_days = int(params.get('rolling_days') or analytics.DEFAULT_ROLLING_DAYS)
+        except ValueError:
+            return Response({"error": "price and rolling_days must be numbers"}, status=status.HTTP_400_BAD_REQUEST)
+        if (price is not None and price < 0) or not 1 <= rolling_days <= 365:
+            return Response(
+                {"error": "price must not be negative and rolling_days must be 1-365"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        days = (window.end - window.start).days + 1
+        herd_size = Livestock.objects.filter(farm_id=farm_id).count()
+        if herd_size * days > analytics.MAX_CELLS:
+            return Response(
+                {"error": f"{herd_size} animals over {days} days is too much to load at once; narrow the window"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        series = analytics.load_series(farm_id, window.start, window.end, yield_type)
+        result = analytics.profitability(series, price, rolling_days)
+
+        active = (result.feed_kg > 0) | (result.yield_qty > 0)
+        animals = [
+            {'id': int(pk), 'tag_id': tag, 'species': name, **row}
+            for pk, tag, name, row, is_active in zip(
+                series.pks, series.tags, series.species,
+                analytics.rows(analytics.metric_columns(result), len(series.pks)),
+                active.tolist(),
+            )
+            if is_active
+        ]
+
+        labels, counts, by_species = analytics.group_totals(
+            result, [name if name else 'Unknown' for name in series.species]
+        )
+        species = [
+            {'species': name, 'animals': count, **row}
+            for name, count, row in zip(
+                labels, counts, analytics.rows(analytics.metric_columns(by_species), len(labels))
+            )
+        ]
+
+        _, _, farm = analytics.group_totals(result, ['farm'] * len(series.pks))
+        summary = analytics.rows(analytics.metric_columns(farm), 1)[0] if len(series.pks) else {}
+
+        dates = series.dates()
+        rolling = analytics.to_list(result.farm_rolling_margin, 2)
+        return Response({
+            'window': window.as_dict(),
+            'yield_type': yield_type,
+            'unit': series.unit,
+            'price_per_unit': price,
+            'rolling_days': rolling_days,
+            'summary': {**summary, 'animals': int(active.sum())},
+            'species': species,
+            'animals': animals,
+            'rolling_margin_chart': {
+                'labels': [day.strftime('%d %b %Y') for day in dates],
+                'buckets': [day.isoformat() for day in dates],
+                'datasets': [{
+                    'label': f'{rolling_days}-day margin (₦)',
+                    'data': rolling or [],
+                    'borderColor': '#2e7d32',
+                    'backgroundColor': '#2e7d32',
+                    'fill': False,
+                }],
+            },
+        })
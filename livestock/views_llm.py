@@ -0,0 +1,321 @@
+"""
+Async endpoints that wait on the LLM: AMU insight generation and voice parsing.
+
+These are plain Django async views rather than DRF actions, since DRF views
+are synchronous. Run under ASGI (``farm.asgi``) and a worker can keep many
+LLM calls in flight while it keeps serving CRUD requests. Authentication,
+parsing and ORM work go through sync_to_async and use the same DRF settings
+as the rest of the API.
+"""
+
+import json
+import re
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Prefetch
+from django.http import JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from . import jobs, llm, llm_cache, prompts, voice_rules
+from .membership import get_membership
+from .models import AMURecord, HealthRecord, Livestock
+
+
+def _authenticate(request):
+    drf_request = Request(
+        request,
+        parsers=[parser() for parser in api_settings.DEFAULT_PARSER_CLASSES],
+        authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES],
+    )
+    # Touch both lazily evaluated properties while still on a sync thread.
+    drf_request.user
+    drf_request.data
+    return drf_request
+
+
+def async_api_view(view_func):
+    """
+    POST-only async view that authenticates like an ``IsAuthenticated`` DRF
+    view and passes the view a DRF Request whose ``data`` is already parsed.
+    """
+
+    @csrf_exempt
+    @wraps(view_func)
+    async def wrapper(request, *args, **kwargs):
+        if request.method != "POST":
+            return JsonResponse(
+                {"detail": f'Method "{request.method}" not allowed.'},
+                status=status.HTTP_405_METHOD_NOT_ALLOWED,
+            )
+        try:
+            drf_request = await sync_to_async(_authenticate)(request)
+        except APIException as e:
+            data = e.detail if isinstance(e.detail, dict) else {"detail": e.detail}
+            return JsonResponse(data, status=e.status_code)
+        if not drf_request.user or not drf_request.user.is_authenticated:
+            return JsonResponse(
+                {"detail": "Authentication credentials were not provided."},
+                status=status.HTTP_401_UNAUTHORIZED,
+            )
+        return await view_func(drf_request, *args, **kwargs)
+
+    return wrapper
+
+
+def _truthy(value):
+    return str(value or "").lower() in ("1", "true", "yes")
+
+
+def load_amu_history(livestock):
+    """Newest health records for ``livestock`` with their AMU records and drugs."""
+    return list(
+        HealthRecord.objects.filter(livestock=livestock)
+        .prefetch_related(
+            Prefetch(
+                "amu_records", queryset=AMURecord.objects.select_related("drug")
+            )
+        )
+        .order_by("-event_date", "-id")[: prompts.HISTORY_LIMIT]
+    )
+
+
+class InsightRequest:
+    """The prepared chat request behind one generate call."""
+
+    def __init__(self, livestock, messages):
+        self.livestock = livestock
+        self.model = llm.model_name()
+        self.messages = messages
+        self.params = {"temperature": 0.7, "max_tokens": 1500}
+        # Same animal data, model and parameters -> same key, so repeat
+        # clicks are answered from the table instead of the API.
+        self.key = llm_cache.cache_key(self.model, self.messages, **self.params)
+
+
+async def _prepare_insight_request(request):
+    """Return an InsightRequest, or an error JsonResponse."""
+    livestock_id = request.data.get("livestock_id")
+
+    if not livestock_id:
+        return JsonResponse(
+            {"detail": "livestock_id is required."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    membership = await sync_to_async(get_membership)(request)
+    try:
+        livestock = await Livestock.objects.aget(
+            pk=livestock_id, farm_id=membership.owned_farm_id
+        )
+    except (Livestock.DoesNotExist, ValueError):
+        return JsonResponse(
+            {"detail": "Livestock not found or you don't own it."},
+            status=status.HTTP_404_NOT_FOUND,
+        )
+
+    history = await sync_to_async(load_amu_history)(livestock)
+    return InsightRequest(livestock, prompts.amu_messages(livestock, history))
+
+
+async def _cached_insights(request, insight):
+    if _truthy(request.data.get("force_refresh")):
+        return None
+    return await sync_to_async(llm_cache.get_cached_entry)(insight.key)
+
+
+@async_api_view
+async def generate_insights(request):
+    """
+    Generate AMU insights for ``livestock_id``. With ``async: true`` a cache
+    miss is queued as an InsightJob instead and answered with 202 and a URL
+    to poll. A cached answer (including one from ``precompute_insights``)
+    carries its ``generated_at`` time.
+    """
+    insight = await _prepare_insight_request(request)
+    if isinstance(insight, JsonResponse):
+        return insight
+
+    cached = await _cached_insights(request, insight)
+    if cached is not None:
+        return JsonResponse(
+            {
+                "insights": cached.response,
+                "cached": True,
+                "generated_at": cached.created_at.isoformat(),
+            }
+        )
+
+    if _truthy(request.data.get("async")):
+        job = await sync_to_async(jobs.enqueue_insight_job)(
+            insight.livestock,
+            insight.key,
+            insight.model,
+            insight.messages,
+            insight.params,
+            user=request.user,
+        )
+        return JsonResponse(
+            {
+                **jobs.job_data(job),
+                "status_url": request.build_absolute_uri(
+                    reverse("amu-insight-job", kwargs={"job_id": job.pk})
+                ),
+            },
+            status=status.HTTP_202_ACCEPTED,
+        )
+
+    try:
+        insights = await llm.chat_completion(
+            insight.messages, model=insight.model, **insight.params
+        )
+        await sync_to_async(llm_cache.store_response)(insight.key, insight.model, insights)
+    except llm.LLMEmptyResponse:
+        insights = "AI generated an empty response."
+    except Exception as e:
+        insights = f"Error generating insights: {str(e)}"
+
+    return JsonResponse({"insights": insights, "cached": False})
+
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@async_api_view
+async def generate_insights_stream(request):
+    """
+    Streaming variant of ``generate_insights`` as server-sent events.
+
+    Emits ``token`` events (``{"text": ...}``) as the model produces them and
+    ends with ``done`` (``{"cached": bool}``, plus ``generated_at`` when
+    cached) or ``error`` (``{"detail": ...}``). A cached answer arrives as a
+    single token event. Tokens are only relayed as they arrive when served
+    over ASGI; under WSGI the response is buffered.
+    """
+    insight = await _prepare_insight_request(request)
+    if isinstance(insight, JsonResponse):
+        return insight
+
+    cached = await _cached_insights(request, insight)
+
+    async def events():
+        if cached is not None:
+            yield _sse("token", {"text": cached.response})
+            yield _sse(
+                "done",
+                {"cached": True, "generated_at": cached.created_at.isoformat()},
+            )
+            return
+
+        chunks = []
+        try:
+            async for chunk in llm.stream_chat_completion(
+                insight.messages, model=insight.model, **insight.params
+            ):
+                chunks.append(chunk)
+                yield _sse("token", {"text": chunk})
+        except Exception as e:
+            yield _sse("error", {"detail": f"Error generating insights: {str(e)}"})
+            return
+
+        if not chunks:
+            yield _sse("error", {"detail": "AI generated an empty response."})
+            return
+        await sync_to_async(llm_cache.store_response)(
+            insight.key, insight.model, "".join(chunks)
+        )
+        yield _sse("done", {"cached": False})
+
+    response = StreamingHttpResponse(events(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    # Stop nginx from buffering the stream.
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+def _parse_json_object(content):
+    content = content.strip()
+    if content.startswith("```json"):
+        content = content.replace("```json", "").replace("```", "")
+    try:
+        return json.loads(content)
+    except json.JSONDecodeError:
+        json_match = re.search(r"\{.*\}", content, re.DOTALL)
+        if not json_match:
+            raise ValueError("Could not parse AI response as JSON")
+        return json.loads(json_match.group())
+
+
+def _parse_records(content):
+    parsed = _parse_json_object(content)
+    records = parsed.get("records") if isinstance(parsed, dict) else None
+    if not isinstance(records, list) or not all(isinstance(r, dict) for r in records):
+        raise ValueError("Expected a records list")
+    return {"records": records}
+
+
+@async_api_view
+async def parse_voice_input(request):
+    """
+    Parse voice transcript using Groq AI to extract form information
+    """
+    transcript = request.data.get("transcript", "")
+    form_type = request.data.get("form_type", "livestock")
+    language = request.data.get("language", "en")
+
+    if not transcript:
+        return JsonResponse(
+            {"error": "Transcript is required"}, status=status.HTTP_400_BAD_REQUEST
+        )
+
+    # With batch=true the transcript may cover several animals ("COW-001 12
+    # litres, COW-002 9 litres") and the answer is {"records": [...]}.
+    batch = _truthy(request.data.get("batch"))
+
+    # Formulaic English transcripts are handled locally in microseconds.
+    if language.lower().startswith("en"):
+        if batch:
+            result = voice_rules.parse_batch(transcript, form_type)
+            data = result and {"records": result.records}
+        else:
+            result = voice_rules.parse_transcript(transcript, form_type)
+            data = result and result.data
+        if result and result.confidence >= settings.VOICE_RULES_MIN_CONFIDENCE:
+            response = JsonResponse(data)
+            response["X-Parse-Source"] = "rules"
+            response["X-Parse-Confidence"] = str(result.confidence)
+            return response
+
+    messages = prompts.voice_messages(transcript, form_type, language, batch)
+
+    try:
+        parsed_data = await llm.chat_completion(
+            messages,
+            parse=_parse_records if batch else _parse_json_object,
+            temperature=0.1,
+            max_tokens=4000 if batch else 1000,
+            response_format={"type": "json_object"},
+        )
+    except llm.LLMNotConfigured as e:
+        return JsonResponse({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except llm.LLMEmptyResponse:
+        parsed_data = {"error": "AI returned empty response"}
+    except llm.LLMInvalidResponse:
+        parsed_data = {"error": "Could not parse AI response as JSON"}
+    except llm.LLMHTTPError as e:
+        parsed_data = {"error": f"API error: {str(e)}"}
+    except llm.LLMRequestError as e:
+        parsed_data = {"error": f"Request error: {str(e)}"}
+    except Exception as e:
+        parsed_data = {"error": f"Error processing voice input: {str(e)}"}
+
+    response = JsonResponse(parsed_data, safe=False)
+    response["X-Parse-Source"] = "llm"
+    return response
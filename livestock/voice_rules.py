@@ -0,0 +1,530 @@
+"""
+Rule-based parsing of formulaic voice transcripts.
+
+Most transcripts follow a handful of shapes ("cow 12 gave 14 litres of milk
+today", "fed cow 3 10 kg of hay at 40 per kg", "vaccinated cow 7 yesterday"),
+which a few regexes handle in microseconds. ``parse_transcript`` returns the
+fields in the same shape the LLM is asked for, plus a confidence score;
+parse_voice_input only falls back to the LLM when the score is below
+``VOICE_RULES_MIN_CONFIDENCE``.
+
+Extractors run in order over a working copy of the transcript and blank out
+the text they consume, so a tag number is never re-read as a quantity. The
+confidence is the share of the form's required fields that were found,
+discounted for every content word no rule accounted for, and halved when
+date-like text is left that the date rules could not read, when a number is
+left that no rule used, or when the transcript is negated ("did not give 14
+litres").
+"""
+
+import re
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+
+from django.utils import timezone
+
+# Spoken animal words -> tag prefix, matching tags like COW-001 and CHK-004.
+TAG_PREFIXES = {
+    "cow": "COW",
+    "cattle": "COW",
+    "heifer": "COW",
+    "chicken": "CHK",
+    "hen": "CHK",
+    "chk": "CHK",
+    "beef": "BEEF",
+    "bull": "BEEF",
+    "steer": "BEEF",
+    "goat": "GOAT",
+    "sheep": "SHEEP",
+    "pig": "PIG",
+    "buffalo": "BUF",
+}
+
+NUMBER_WORDS = {
+    "zero": 0, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6,
+    "seven": 7, "eight": 8, "nine": 9, "ten": 10, "eleven": 11, "twelve": 12,
+    "thirteen": 13, "fourteen": 14, "fifteen": 15, "sixteen": 16,
+    "seventeen": 17, "eighteen": 18, "nineteen": 19, "twenty": 20,
+    "thirty": 30, "forty": 40, "fifty": 50, "sixty": 60, "seventy": 70,
+    "eighty": 80, "ninety": 90,
+}
+
+MONTHS = {
+    name: i
+    for i, names in enumerate(
+        [
+            ("jan", "january"), ("feb", "february"), ("mar", "march"),
+            ("apr", "april"), ("may",), ("jun", "june"), ("jul", "july"),
+            ("aug", "august"), ("sep", "sept", "september"), ("oct", "october"),
+            ("nov", "november"), ("dec", "december"),
+        ],
+        start=1,
+    )
+    for name in names
+}
+
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+
+# Words that carry no field of their own and so never lower the confidence.
+FILLER_WORDS = {
+    "a", "an", "the", "of", "to", "for", "with", "on", "at", "in", "from", "and",
+    "was", "is", "were", "has", "had", "have", "been", "be", "got", "get", "gave",
+    "give", "given", "fed", "feed", "feeding", "produced", "produce", "laid",
+    "collected", "milked", "yielded", "yield", "her", "his", "its", "our", "my",
+    "we", "i", "per", "about", "around", "approximately", "today", "record",
+    "add", "log", "animal", "number", "no", "tag", "total", "worth", "costing",
+    "it", "they", "them", "this", "that", "which", "also", "some", "ate",
+    "eaten", "consumed", "morning", "afternoon", "evening", "night", "round",
+    "shed", "then", "next",
+}
+
+NUMBER = r"\d+(?:\.\d+)?"
+# Digit grouping as livestock.dosage reads it: "1,200" is one number.
+_GROUPED = re.compile(r"\b[1-9]\d{0,2}(?:,\d{3})+(?![\d,])")
+
+YIELD_UNITS = {
+    "l": "liters", "ltr": "liters", "ltrs": "liters", "litre": "liters",
+    "litres": "liters", "liter": "liters", "liters": "liters",
+    "kg": "kg", "kgs": "kg", "kilo": "kg", "kilos": "kg", "kilogram": "kg",
+    "kilograms": "kg",
+    "egg": "units", "eggs": "units", "unit": "units", "units": "units",
+    "piece": "units", "pieces": "units",
+}
+YIELD_TYPES = {"milk": "Milk", "egg": "Eggs", "eggs": "Eggs", "wool": "Wool", "meat": "Meat"}
+
+EVENT_TYPES = [
+    (r"vaccinat\w*|jab|shot", "vaccination"),
+    (r"check[- ]?up|checked|examin\w*|inspect\w*", "check-up"),
+    (r"treat\w*|medicat\w*|dosed|injected", "treatment"),
+    (r"sick\w*|ill|unwell|fever|limping|not eating", "sickness"),
+]
+OUTCOMES = {
+    "recovered": "recovered",
+    "recovering": "ongoing",
+    "ongoing": "ongoing",
+    "completed": "completed",
+    "complete": "completed",
+}
+
+# The fields a rule parse must find to be as good as the LLM's. Optional
+# details (price, grade, notes) are kept when said but never required: if the
+# transcript lacks them the LLM cannot supply them either.
+REQUIRED_FIELDS = {
+    "yield_record": ("livestock", "yield_type", "quantity", "unit", "date"),
+    "feed_record": ("livestock", "feed_type", "quantity_kg", "date"),
+    "health": ("livestock", "event_type", "event_date"),
+}
+
+# A date nobody mentioned defaults to today but only earns half credit.
+DEFAULTED_DATE_CREDIT = 0.5
+UNEXPLAINED_WORD_PENALTY = 0.1
+# Date-like text the rules could not read ("on the 3rd", "2 weeks ago")
+# means the date they return is likely wrong: the score is cut to well
+# under any sensible threshold so the LLM reads the date instead.
+UNPARSED_DATE_FACTOR = 0.5
+# Likewise for a number no rule used (it may be the real quantity) and for a
+# negated transcript, which the rules would otherwise record as said.
+STRAY_NUMBER_FACTOR = 0.5
+NEGATION_FACTOR = 0.5
+
+_NUMBER_WORD = "|".join(sorted(NUMBER_WORDS, key=len, reverse=True))
+_NUMBER_RUN = re.compile(rf"\b(?:{_NUMBER_WORD})(?:[\s-]+(?:{_NUMBER_WORD}))*\b")
+_DATE_HINT = re.compile(
+    r"\b(?:\d{1,2}(?:st|nd|rd|th)|\d{1,2}[/.]\d{1,2}(?:[/.]\d{2,4})?|"
+    + "|".join([*MONTHS, *WEEKDAYS])
+    + r"|tomorrow|ago|last|week|weeks|month|months|fortnight)\b"
+)
+# "no" only as a negation, not as in "cow no 5".
+_NEGATION = re.compile(
+    r"\b(?:not|never|none|nothing|without|no(?!\s+\d)|"
+    r"(?:did|does|do|was|is|has|had|could|would)n'?t|can'?t|won'?t)\b"
+)
+
+
+def spoken_numbers_to_digits(text):
+    """
+    Write lower-case number words as digits, merging compounds:
+    "cow twenty one" -> "cow 21", "twenty-five" -> "25", "two three" -> "2 3".
+    """
+
+    def digits(match):
+        values = []
+        for word in re.split(r"[\s-]+", match.group(0)):
+            value = NUMBER_WORDS[word]
+            if values and 0 < value < 10 and values[-1] in range(20, 100, 10):
+                values[-1] += value
+            else:
+                values.append(value)
+        return " ".join(str(value) for value in values)
+
+    return _NUMBER_RUN.sub(digits, text)
+
+
+@dataclass
+class ParseResult:
+    data: dict
+    confidence: float
+    defaulted: set = field(default_factory=set)
+
+
+class _Transcript:
+    """Normalized transcript text that extractors consume piece by piece."""
+
+    def __init__(self, text):
+        text = _GROUPED.sub(lambda m: m.group(0).replace(",", ""), text.lower())
+        text = text.replace(",", " ").replace("?", " ").replace("!", " ")
+        text = re.sub(r"\.(?!\d)", " ", text)
+        self.text = " ".join(spoken_numbers_to_digits(text).split())
+
+    def take(self, pattern, accept=None):
+        """
+        Return the first match of ``pattern`` (that ``accept`` approves, if
+        given) and blank it out, or None.
+        """
+        for match in re.finditer(pattern, self.text):
+            if accept is None or accept(match):
+                start, end = match.span()
+                self.text = self.text[:start] + " " * (end - start) + self.text[end:]
+                return match
+        return None
+
+    def has_unparsed_date(self):
+        return _DATE_HINT.search(self.text) is not None
+
+    def has_stray_number(self):
+        return re.search(r"\d", self.text) is not None
+
+    def is_negated(self):
+        return _NEGATION.search(self.text) is not None
+
+    def unexplained_words(self):
+        return [
+            word for word in re.findall(r"[a-z0-9.\-]+", self.text)
+            if word not in FILLER_WORDS
+        ]
+
+
+def _take_livestock(transcript):
+    explicit = transcript.take(
+        r"\b([a-z]{2,5})-(\d{1,5})\b",
+        accept=lambda m: m.group(1).upper() in set(TAG_PREFIXES.values()),
+    )
+    if explicit:
+        return f"{explicit.group(1).upper()}-{int(explicit.group(2)):03d}"
+    words = "|".join(TAG_PREFIXES)
+    spoken = transcript.take(
+        rf"\b({words})s?\s+(?:number\s+|no\s+|tag\s+|#\s*)?(\d{{1,5}})\b"
+    )
+    if spoken:
+        return f"{TAG_PREFIXES[spoken.group(1)]}-{int(spoken.group(2)):03d}"
+    return None
+
+
+def _take_date(transcript, today):
+    if transcript.take(r"\bday before yesterday\b"):
+        return today - timedelta(days=2)
+    if transcript.take(r"\byesterday\b"):
+        return today - timedelta(days=1)
+    if transcript.take(r"\b(?:today|tonight|this (?:morning|afternoon|evening))\b"):
+        return today
+    match = transcript.take(r"\b(\d{1,3}) days? ago\b")
+    if match:
+        return today - timedelta(days=int(match.group(1)))
+    match = transcript.take(r"\b(\d{4})-(\d{1,2})-(\d{1,2})\b")
+    if match:
+        return _safe_date(*(int(g) for g in match.groups()))
+
+    months = "|".join(MONTHS)
+    match = transcript.take(
+        rf"\b(?:on\s+)?(?:the\s+)?(\d{{1,2}})(?:st|nd|rd|th)?\s+(?:of\s+)?({months})\b(?:\s+(\d{{4}}))?"
+    )
+    if match:
+        day, month, year = match.groups()
+        return _safe_date(int(year) if year else today.year, MONTHS[month], int(day), today)
+    match = transcript.take(
+        rf"\b(?:on\s+)?({months})\s+(\d{{1,2}})(?:st|nd|rd|th)?\b(?:\s+(\d{{4}}))?"
+    )
+    if match:
+        month, day, year = match.groups()
+        return _safe_date(int(year) if year else today.year, MONTHS[month], int(day), today)
+
+    match = transcript.take(rf"\b(?:last|on)\s+({'|'.join(WEEKDAYS)})\b")
+    if match:
+        back = (today.weekday() - WEEKDAYS.index(match.group(1))) % 7 or 7
+        return today - timedelta(days=back)
+    return None
+
+
+def _safe_date(year, month, day, today=None):
+    try:
+        value = date(year, month, day)
+    except ValueError:
+        return None
+    # "15 March" said in January means last March.
+    if today is not None and value > today:
+        try:
+            value = value.replace(year=value.year - 1)
+        except ValueError:
+            return None
+    return value
+
+
+def _number(text):
+    value = float(text)
+    return int(value) if value.is_integer() else value
+
+
+def _parse_yield(transcript, in_batch):
+    units = "|".join(sorted(YIELD_UNITS, key=len, reverse=True))
+    types = "|".join(YIELD_TYPES)
+    # Within a dictated round a bare number is fine ("COW-001 12 litres,
+    # COW-002 9"): the unit comes from the neighbouring records.
+    match = transcript.take(
+        rf"\b({NUMBER})\s*({units})?\b\s*(?:of\s+)?({types})?\b",
+        accept=lambda m: in_batch or m.group(2) or m.group(3),
+    )
+    data = {}
+    yield_type = None
+    if match:
+        quantity, unit, yield_type = match.groups()
+        data["quantity"] = _number(quantity)
+        if unit:
+            data["unit"] = YIELD_UNITS[unit]
+            if YIELD_UNITS[unit] == "units" and unit.startswith("egg"):
+                yield_type = yield_type or "eggs"
+    if not yield_type:
+        other = transcript.take(rf"\b({types})\b")
+        yield_type = other.group(1) if other else None
+    if not yield_type and data.get("unit") == "liters":
+        yield_type = "milk"
+    if yield_type:
+        data["yield_type"] = YIELD_TYPES[yield_type]
+        if "unit" not in data and "quantity" in data and data["yield_type"] == "Eggs":
+            data["unit"] = "units"
+    grade = transcript.take(r"\bgrade\s+([abc])\b|\b([abc])\s+grade\b")
+    if grade:
+        data["quality_grade"] = (grade.group(1) or grade.group(2)).upper()
+    return data
+
+
+def _parse_feed(transcript, in_batch):
+    data = {}
+    price = transcript.take(
+        rf"\b(?:at|for|costing|cost)\s+(?:rs\.?\s*|rupees\s+|\$\s*)?({NUMBER})\s*"
+        rf"(?:rs|rupees|dollars)?\s*(?:per|a|/|each)\s*(?:kg|kilo|kilogram)s?\b"
+    )
+    if price:
+        data["price_per_kg"] = _number(price.group(1))
+    match = transcript.take(
+        rf"\b({NUMBER})\s*(?:kgs?|kilos?|kilograms?)\b(?:\s+(?:of\s+)?"
+        rf"([a-z][a-z ]*?)(?=\s+(?:to|for|on|at|in|from|and)\b|\s*$|\s{{2,}}))?",
+        accept=lambda m: in_batch or m.group(2),
+    )
+    if match:
+        data["quantity_kg"] = _number(match.group(1))
+        name = (match.group(2) or "").strip()
+        if name:
+            data["feed_type"] = name
+            data["feed"] = name.title()
+    return data
+
+
+def _parse_health(transcript, in_batch):
+    data = {}
+    for pattern, event_type in EVENT_TYPES:
+        if transcript.take(rf"\b(?:{pattern})\b"):
+            data["event_type"] = event_type
+            break
+    diagnosis = transcript.take(
+        r"\b(?:diagnosed with|with|for|has|suffering from)\s+"
+        r"([a-z][a-z \-]*?)(?=\s+(?:and|on|today|yesterday|now)\b|\s*$|\s{2,})"
+    )
+    if diagnosis:
+        data["diagnosis"] = diagnosis.group(1).strip()
+    outcome = transcript.take(r"\b(" + "|".join(OUTCOMES) + r")\b")
+    if outcome:
+        data["treatment_outcome"] = OUTCOMES[outcome.group(1)]
+    return data
+
+
+FORM_PARSERS = {
+    "yield_record": (_parse_yield, "date"),
+    "feed_record": (_parse_feed, "date"),
+    "health": (_parse_health, "event_date"),
+}
+
+# Fields one record of a dictated round passes on to the records after it.
+SHARED_FIELDS = {
+    "yield_record": ("yield_type", "unit"),
+    "feed_record": ("feed_type", "feed", "price_per_kg"),
+    "health": ("event_type",),
+}
+
+
+@dataclass
+class _Segment:
+    data: dict
+    when: date
+    unexplained: int
+    # Date-like text was left over after the date rules ran.
+    unparsed_date: bool
+    # A number was left over, or a negation, after the field rules ran.
+    stray_number: bool = False
+    negated: bool = False
+
+
+def _parse_segment(text, form_type, today, in_batch=False):
+    """Parse one record's worth of text into a _Segment."""
+    parse_fields, date_field = FORM_PARSERS[form_type]
+    transcript = _Transcript(text)
+    data = {}
+    livestock = _take_livestock(transcript)
+    if livestock:
+        data["livestock"] = livestock
+    when = _take_date(transcript, today)
+    data.update(parse_fields(transcript, in_batch))
+    return _Segment(
+        data,
+        when,
+        len(transcript.unexplained_words()),
+        transcript.has_unparsed_date(),
+        transcript.has_stray_number(),
+        transcript.is_negated(),
+    )
+
+
+def _score(
+    data,
+    form_type,
+    date_defaulted,
+    unexplained,
+    unparsed_date=False,
+    stray_number=False,
+    negated=False,
+):
+    date_field = FORM_PARSERS[form_type][1]
+    required = REQUIRED_FIELDS[form_type]
+    found = sum(
+        DEFAULTED_DATE_CREDIT if name == date_field and date_defaulted else 1
+        for name in required
+        if name in data
+    )
+    confidence = (found / len(required)) * max(
+        0.0, 1 - UNEXPLAINED_WORD_PENALTY * unexplained
+    )
+    if unparsed_date:
+        confidence *= UNPARSED_DATE_FACTOR
+    if stray_number:
+        confidence *= STRAY_NUMBER_FACTOR
+    if negated:
+        confidence *= NEGATION_FACTOR
+    return round(confidence, 3)
+
+
+def parse_transcript(transcript, form_type, today=None):
+    """
+    Extract ``form_type`` fields from an English transcript.
+
+    Returns a ParseResult, or None for form types the rules do not cover.
+    """
+    if form_type not in FORM_PARSERS:
+        return None
+    today = today or timezone.localdate()
+    date_field = FORM_PARSERS[form_type][1]
+
+    segment = _parse_segment(transcript, form_type, today)
+    data, when = segment.data, segment.when
+    defaulted = set()
+    if when is None:
+        when = today
+        defaulted.add(date_field)
+    data[date_field] = when.isoformat()
+    confidence = _score(
+        data,
+        form_type,
+        bool(defaulted),
+        segment.unexplained,
+        segment.unparsed_date,
+        segment.stray_number,
+        segment.negated,
+    )
+    return ParseResult(data=data, confidence=confidence, defaulted=defaulted)
+
+
+@dataclass
+class BatchParseResult:
+    records: list
+    confidence: float
+
+
+def parse_batch(transcript, form_type, today=None):
+    """
+    Extract one record per animal from a dictated round such as
+    "COW-001 12 litres, COW-002 9 litres, COW-003 14".
+
+    The transcript is split at each tag. Text before the first tag
+    ("milk round this morning") and a date said only once apply to every
+    record, and unit/type style fields carry over to the records that omit
+    them. The batch confidence is that of its weakest record. Returns None
+    when the rules do not cover ``form_type`` or no tag is found.
+    """
+    if form_type not in FORM_PARSERS:
+        return None
+    today = today or timezone.localdate()
+    date_field = FORM_PARSERS[form_type][1]
+    shared = SHARED_FIELDS[form_type]
+
+    text = _Transcript(transcript).text
+    tags = "|".join(TAG_PREFIXES)
+    starts = [
+        m.start()
+        for m in re.finditer(
+            rf"\b(?:[a-z]{{2,5}}-\d{{1,5}}|(?:{tags})s?\s+(?:number\s+|no\s+|tag\s+|#\s*)?\d{{1,5}})\b",
+            text,
+        )
+    ]
+    if not starts:
+        return None
+
+    preamble = _parse_segment(text[: starts[0]], form_type, today, in_batch=True)
+    context = {name: preamble.data[name] for name in shared if name in preamble.data}
+    parsed = []
+    for start, end in zip(starts, starts[1:] + [len(text)]):
+        segment = _parse_segment(text[start:end], form_type, today, in_batch=True)
+        for name in shared:
+            if name in segment.data:
+                context[name] = segment.data[name]
+            elif name in context:
+                segment.data[name] = context[name]
+        parsed.append(segment)
+
+    # Fill shared fields backwards too: "COW-001 12, COW-002 9 litres".
+    later = {}
+    for segment in reversed(parsed):
+        for name in shared:
+            if name in segment.data:
+                later[name] = segment.data[name]
+            elif name in later:
+                segment.data[name] = later[name]
+
+    dates = {segment.when for segment in parsed if segment.when is not None}
+    common_date = preamble.when or (dates.pop() if len(dates) == 1 else None)
+    records = []
+    scores = []
+    for segment in parsed:
+        when = segment.when or common_date
+        segment.data[date_field] = (when or today).isoformat()
+        scores.append(
+            _score(
+                segment.data,
+                form_type,
+                when is None,
+                segment.unexplained,
+                segment.unparsed_date or preamble.unparsed_date,
+                segment.stray_number or preamble.stray_number,
+                segment.negated or preamble.negated,
+            )
+        )
+        records.append(segment.data)
+    confidence = min(scores) * max(0.0, 1 - UNEXPLAINED_WORD_PENALTY * preamble.unexplained)
+    return BatchParseResult(records=records, confidence=round(confidence, 3))
@@ -0,0 +1,167 @@
+"""
+Withdrawal-period compliance.
+
+A treatment (AMURecord) with ``withdrawal_period`` N days, given on its
+health record's ``event_date``, makes the animal's milk and meat unsafe for
+N days. Each such treatment has a WithdrawalInterval row covering
+[event_date, event_date + N). The signals in livestock.signals keep that row
+in step with the AMU record and its health record. "Which animals are under
+withdrawal on D" is then a range scan on the (farm, ends_on, start) index.
+
+YieldRecord.under_withdrawal is set when a yield is written, and re-derived
+for the yields an interval covers whenever that interval is created, moved
+or removed. The audit_withdrawals command re-checks every yield in bulk.
+"""
+
+from datetime import timedelta
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+
+from .models import AMURecord, WithdrawalInterval, YieldRecord
+
+
+def interval_bounds(event_date, withdrawal_period):
+    """(start, ends_on) of a treatment's interval, or None without a period."""
+    if not withdrawal_period:
+        return None
+    return event_date, event_date + timedelta(days=withdrawal_period)
+
+
+def active_intervals(farm_id, day):
+    """The farm's intervals covering ``day``: one indexed query."""
+    return WithdrawalInterval.objects.filter(farm_id=farm_id, ends_on__gt=day, start__lte=day)
+
+
+def covering_intervals(livestock=OuterRef("livestock_id"), day=OuterRef("date")):
+    """Intervals of ``livestock`` covering ``day``; correlated to a yield by default."""
+    return WithdrawalInterval.objects.filter(livestock_id=livestock, ends_on__gt=day, start__lte=day)
+
+
+def is_under_withdrawal(livestock_id, day):
+    return covering_intervals(livestock_id, day).exists()
+
+
+def flag_yields(yields):
+    """Re-derive ``under_withdrawal`` for these saved YieldRecords in one UPDATE."""
+    yields = [obj for obj in yields if obj.pk is not None]
+    if not yields:
+        return
+    YieldRecord.objects.filter(pk__in=[obj.pk for obj in yields]).update(
+        under_withdrawal=Exists(covering_intervals())
+    )
+    flagged = set(
+        YieldRecord.objects.filter(
+            pk__in=[obj.pk for obj in yields], under_withdrawal=True
+        ).values_list("pk", flat=True)
+    )
+    for obj in yields:
+        obj.under_withdrawal = obj.pk in flagged
+
+
+def reflag_ranges(ranges):
+    """Re-derive ``under_withdrawal`` for yields in (livestock_id, start, ends_on) ranges."""
+    ranges = set(ranges)
+    if not ranges:
+        return 0
+    covered = reduce(
+        or_,
+        (
+            Q(livestock_id=livestock_id, date__gte=start, date__lt=ends_on)
+            for livestock_id, start, ends_on in ranges
+        ),
+    )
+    return YieldRecord.objects.filter(covered).update(
+        under_withdrawal=Exists(covering_intervals())
+    )
+
+
+def _range(interval):
+    return interval.livestock_id, interval.start, interval.ends_on
+
+
+def sync_intervals(amu_records, reflag=True):
+    """
+    Create, move or remove the intervals of the AMU records in the
+    ``amu_records`` queryset to match them, then re-flag the yields whose
+    cover changed. Returns the number of intervals written or removed.
+    """
+    existing = {
+        interval.amu_record_id: interval
+        for interval in WithdrawalInterval.objects.filter(amu_record__in=amu_records.values("pk"))
+    }
+    rows = amu_records.values_list(
+        "pk",
+        "farm_id",
+        "drug_id",
+        "withdrawal_period",
+        "health_record__livestock_id",
+        "health_record__event_date",
+    )
+
+    created, updated, removed, ranges = [], [], [], []
+    for pk, farm_id, drug_id, period, livestock_id, event_date in rows.iterator():
+        interval = existing.get(pk)
+        bounds = interval_bounds(event_date, period)
+        if bounds is None:
+            if interval is not None:
+                removed.append(interval.pk)
+            continue
+        values = {
+            "farm_id": farm_id,
+            "livestock_id": livestock_id,
+            "drug_id": drug_id,
+            "start": bounds[0],
+            "ends_on": bounds[1],
+        }
+        if interval is None:
+            interval = WithdrawalInterval(amu_record_id=pk, **values)
+            created.append(interval)
+        elif any(getattr(interval, name) != value for name, value in values.items()):
+            ranges.append(_range(interval))
+            for name, value in values.items():
+                setattr(interval, name, value)
+            updated.append(interval)
+        else:
+            continue
+        ranges.append(_range(interval))
+
+    with transaction.atomic():
+        WithdrawalInterval.objects.bulk_create(created, batch_size=1000)
+        WithdrawalInterval.objects.bulk_update(
+            updated, ["farm_id", "livestock_id", "drug_id", "start", "ends_on"], batch_size=1000
+        )
+        # Removed intervals re-flag their own range on post_delete.
+        WithdrawalInterval.objects.filter(pk__in=removed).delete()
+        if reflag:
+            reflag_ranges(ranges)
+    return len(created) + len(updated) + len(removed)
+
+
+def sync_for_health_records(health_record_ids):
+    sync_intervals(AMURecord.objects.filter(health_record_id__in=health_record_ids))
+
+
+def audit(farm_id=None):
+    """
+    The farm's (or every) yields annotated with ``in_window``, and those
+    whose stored ``under_withdrawal`` disagrees with it.
+    """
+    yields = YieldRecord.objects.all()
+    if farm_id is not None:
+        yields = yields.filter(farm_id=farm_id)
+    yields = yields.annotate(in_window=Exists(covering_intervals()))
+    mismatched = yields.filter(
+        Q(in_window=True, under_withdrawal=False) | Q(in_window=False, under_withdrawal=True)
+    )
+    return yields, mismatched
+
+
+def reflag_all(farm_id=None):
+    """Re-derive ``under_withdrawal`` for every yield of ``farm_id`` (or all)."""
+    yields = YieldRecord.objects.all()
+    if farm_id is not None:
+        yields = yields.filter(farm_id=farm_id)
+    return yields.update(under_withdrawal=Exists(covering_intervals()))